@@ -1,9 +1,19 @@
-import time, statistics, hashlib, re, sys, signal, random
+import time, statistics, hashlib, re, sys, os, signal, random, socket, ssl, threading, json, heapq, argparse
+import bisect, ipaddress, logging, gzip, io, math
+from collections import OrderedDict
 import requests
 from bs4 import BeautifulSoup
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
-from urllib.parse import urlparse, urlunparse
+from requests.adapters import HTTPAdapter, BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NameResolutionError, NewConnectionError, ConnectTimeoutError
+from urllib3.util.connection import create_connection
+from email.utils import parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, urlunparse, urljoin
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
@@ -12,2622 +22,9539 @@ from rich.align import Align
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
 from rich.prompt import Prompt, Confirm
 
+try:
+    import dns.resolver as dns_resolver
+except ImportError:
+    dns_resolver = None
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
 # ----------------------------- CONFIG ---------------------------------
 TIMING_SAMPLES = 9
+PATH_TIMING_SAMPLES = 3
+BASELINE_SAMPLES = 5
 JITTER_THRESHOLD = 0.40
+METHOD_GAP_THRESHOLD = 0.6
+PAIRED_T_CRITICAL = {
+    1: 12.71, 2: 4.30, 3: 3.18, 4: 2.78, 5: 2.57,
+    6: 2.45, 7: 2.36, 8: 2.31, 9: 2.26, 10: 2.23,
+    12: 2.18, 15: 2.13, 20: 2.09, 30: 2.04, 60: 2.00,
+}
+PAIRED_T_LIMIT = 1.96
+LATENCY_HIST_LOWEST = 0.0001
+LATENCY_HIST_HIGHEST = 3600
+LATENCY_HIST_PRECISION = 0.01
+LATENCY_TRIM = 0.10
+CALIBRATION_SAMPLES = 9
+CALIBRATION_INTERVAL = 60
+LOAD_CURVE = False
+LOAD_LEVELS = (1, 2, 4, 8)
+LOAD_BURSTS = 3
+LOAD_REQUEST_BUDGET = 48
+LOAD_ONSET_FACTOR = 1.5
+LOAD_SATURATION_GAIN = 1.25
+BACKEND_TIMING = False
+BACKEND_SAMPLES = 5
+BACKEND_MAX_ADDRESSES = 8
+BACKEND_SPREAD_FACTOR = 1.5
+TTFB_BODY_POLICY = "auto"
+TTFB_DRAIN_LIMIT = 65536
 RETRIES = 2
+RETRY_BACKOFF = 0.35
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRY_AFTER_MAX = 300
 TIMEOUT = 10
-console = Console()
-
-# ----------------------------- SESSION --------------------------------
-def build_session():
+PRIORITY_BANDS = (6, 10)
+GATE_PARTIAL_THRESHOLD = 3
+SWEEP_WORKERS = 256
+SWEEP_TIMEOUT = 3
+BATCH_WORKERS = 4
+MAX_REQUEUES = 3
+DRAIN_GRACE = 15
+STOP_POLL = 0.5
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN = 30
+AIMD_INITIAL = 2
+AIMD_MAX = 16
+AIMD_WINDOW = 10
+AIMD_LATENCY_FACTOR = 2.0
+AIMD_ERROR_RATE = 0.10
+AIMD_BASELINE_RECOVERY = 0.2
+SCOPE_REQUEST_BUDGET = None
+SCOPE_ALLOWLIST = None
+PLAN_LATENCY = 0.35
+PHASE_BUDGETS = {
+    "http": 0.25,
+    "timing": 0.40,
+    "surface": 0.35,
+    "load": 0.20,
+}
+TRANSPORT = "h1"
+SCANNER_POOL_SIZE = 8
+SCANNER_POOL_HOSTS = 64
+SCANNER_POOL_MAXSIZE = 16
+SCANNER_REGISTRY_SIZE = 4096
+SCANNER_REGISTRY_TTL = 3600
+SCANNER_PINNED_SIZE = 64
+SCANNER_PINNED_TTL = 300
+REDIRECT_MAX_HOPS = 10
+DNS_DEFAULT_TTL = 300
+DNS_NEGATIVE_TTL = 30
+DNS_RETAIN = 600
+DNS_PURGE_INTERVAL = 60
+DNS_PREFETCH_DEPTH = 64
+DNS_PREFETCH_WORKERS = 8
+INGEST_WINDOW = 10000
+INGEST_EXACT_CAPACITY = 1000000
+INGEST_BLOOM_CAPACITY = 10000000
+INGEST_BLOOM_ERROR = 0.001
+log = logging.getLogger("osintsignals")
+
+
+class LazyConsole:
+    """
+    Console de rich creada en el primer uso:
+    importar el módulo no toca la terminal.
     """
-    Construye una sesión HTTP consistente para observación.
 
-    Objetivos:
-        • Cliente estable.
-        • Headers coherentes.
-        • Reintentos controlados.
-        • Lectura reproducible.
+    def __init__(self):
+        self._console = None
 
-    No modifica el comportamiento del escáner.
-    Solo mejora la calidad de las observaciones.
+    def __getattr__(self, name):
+
+        if self._console is None:
+            self._console = Console()
+
+        return getattr(self._console, name)
+
+
+console = LazyConsole()
+
+
+def scanner_defaults():
+    """
+    Ajustes por defecto de un Scanner, leídos de la CONFIG
+    del módulo en el momento de cada scan.
     """
 
-    # ---------------------------------------------------------
-    # Perfiles simples y coherentes
-    # ---------------------------------------------------------
-    profiles = [
-        {
-            "name": "chrome",
-            "user_agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/124.0.0.0 Safari/537.36"
-            ),
-        },
-        {
-            "name": "firefox",
-            "user_agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) "
-                "Gecko/20100101 Firefox/124.0"
-            ),
-        },
-        {
-            "name": "mobile",
-            "user_agent": (
-                "Mozilla/5.0 (Linux; Android 14) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/123.0 Mobile Safari/537.36"
-            ),
-        },
-    ]
+    return {
+        "timing_samples": TIMING_SAMPLES,
+        "path_timing_samples": PATH_TIMING_SAMPLES,
+        "baseline_samples": BASELINE_SAMPLES,
+        "jitter_threshold": JITTER_THRESHOLD,
+        "ttfb_body_policy": TTFB_BODY_POLICY,
+        "ttfb_drain_limit": TTFB_DRAIN_LIMIT,
+        "calibration_samples": CALIBRATION_SAMPLES,
+        "calibration_interval": CALIBRATION_INTERVAL,
+        "load_curve": LOAD_CURVE,
+        "load_levels": LOAD_LEVELS,
+        "load_bursts": LOAD_BURSTS,
+        "load_request_budget": LOAD_REQUEST_BUDGET,
+        "backend_timing": BACKEND_TIMING,
+        "backend_samples": BACKEND_SAMPLES,
+        "retries": RETRIES,
+        "retry_backoff": RETRY_BACKOFF,
+        "timeout": TIMEOUT,
+        "breaker_threshold": BREAKER_THRESHOLD,
+        "breaker_cooldown": BREAKER_COOLDOWN,
+        "phase_budgets": PHASE_BUDGETS,
+        "scope_request_budget": SCOPE_REQUEST_BUDGET,
+        "allowlist": SCOPE_ALLOWLIST,
+        "transport": TRANSPORT,
+    }
 
-    # ---------------------------------------------------------
-    # Rotación ligera
-    # ---------------------------------------------------------
-    profile = random.choice(profiles)
+# ----------------------------- CIRCUIT BREAKER --------------------------
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Petición cortada sin tocar la red: el breaker del host está abierto.
+    """
 
-    session = requests.Session()
 
-    session.headers.update({
+class CircuitBreaker:
+    """
+    Breaker por origen (esquema, host, puerto) compartido por todas las fases.
+
+    Estados:
+        closed     → tráfico normal
+        open       → N fallos de conexión/lectura seguidos,
+                     las peticiones fallan al instante
+        half_open  → tras el cool-down, una única sonda decide
+                     si el host se recuperó
+    """
 
-        "User-Agent": profile["user_agent"],
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
 
-        "Accept": (
-            "text/html,"
-            "application/xhtml+xml,"
-            "application/xml;q=0.9,"
-            "image/avif,"
-            "image/webp,"
-            "*/*;q=0.8"
-        ),
+        self.threshold = threshold
+        self.cooldown = cooldown
 
-        "Accept-Language": "en-US,en;q=0.9",
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.trips = 0
+        self.rejected = 0
 
-        "Accept-Encoding": "gzip, deflate, br",
+        self._probing = False
+        self._lock = threading.Lock()
 
-        "Connection": "keep-alive",
 
-        "Upgrade-Insecure-Requests": "1",
+    def allow(self):
 
-        "DNT": "1",
+        with self._lock:
 
-    })
+            if self.state == "closed":
+                return True
 
-    # ---------------------------------------------------------
-    # Adaptador resiliente
-    # ---------------------------------------------------------
-    retry = Retry(
+            if (
+                self.state == "open"
+                and time.time() - self.opened_at >= self.cooldown
+            ):
+                self.state = "half_open"
 
-        total=RETRIES,
+            if (
+                self.state == "half_open"
+                and not self._probing
+            ):
+                self._probing = True
+                return True
 
-        connect=RETRIES,
+            self.rejected += 1
 
-        read=RETRIES,
+            return False
 
-        backoff_factor=0.35,
 
-        status_forcelist=(
-            429,
-            500,
-            502,
-            503,
-            504,
-        ),
+    def release(self):
+        """
+        Libera la sonda half-open sin veredicto
+        (la petición se abortó por causas propias).
+        """
 
-        allowed_methods=frozenset({
-            "GET",
-            "HEAD",
-            "OPTIONS",
-            "POST",
-        }),
+        with self._lock:
 
-        raise_on_status=False,
+            self._probing = False
 
-    )
 
-    adapter = HTTPAdapter(
+    def record_success(self):
 
-        max_retries=retry,
+        with self._lock:
 
-        pool_connections=10,
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
 
-        pool_maxsize=10,
 
-    )
+    def record_failure(self):
 
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
+        with self._lock:
 
-    # ---------------------------------------------------------
-    # Metadatos útiles para el resto del motor
-    # ---------------------------------------------------------
-    session.profile = profile["name"]
+            self.failures += 1
+            self._probing = False
 
-    session.created_at = time.time()
+            if (
+                self.state == "half_open"
+                or self.failures >= self.threshold
+            ):
+                if self.state != "open":
+                    self.trips += 1
 
-    return session
+                self.state = "open"
+                self.opened_at = time.time()
 
 
+    def snapshot(self):
 
-# ----------------------------- UTILS ----------------------------------
-def safe(fn, default=None):
-    try:
-        return fn()
-    except Exception as e:
-        return default
+        with self._lock:
 
-def hash_body(text):
-    return hashlib.sha256(text.encode(errors="ignore")).hexdigest()
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "trips": self.trips,
+                "rejected": self.rejected
+            }
 
-# ------------------------ HTTP SEMANTICS -------------------------------
-def http_semantics(session, url):
+
+# ----------------------------- CONCURRENCIA AIMD -----------------------
+class ConcurrencyController:
     """
-    Lectura semántica HTTP avanzada.
+    Límite adaptativo de peticiones simultáneas por origen (AIMD).
 
-    Filosofía:
-    - Activo quirúrgico
-    - Pasivo contextual
-    - Sin explotación
-    - Orientado a observación, coherencia y comportamiento
+    - additive increase: +1 por ventana con latencia y errores en base
+    - multiplicative decrease: ×0.5 cuando el p95 de la ventana supera
+      AIMD_LATENCY_FACTOR × p95 base o sube la tasa de 429/5xx
 
-    Analiza:
-    - estabilidad de respuesta
-    - identidad temporal
-    - consistencia semántica
-    - cache behavior
-    - fingerprints operativos
+    Evita que nuestra propia carga se convierta
+    en la latencia que intentamos medir.
     """
 
-    responses = []
-    errors = []
-
-    timestamps = []
+    def __init__(self, initial=AIMD_INITIAL, ceiling=AIMD_MAX, window=AIMD_WINDOW):
 
-    # =====================================================
-    # OBSERVACIÓN REPETIDA CONTROLADA
-    # =====================================================
+        self.limit = float(initial)
+        self.ceiling = ceiling
+        self.window_size = window
 
-    for _ in range(3):
-        try:
-            start = time.time()
+        self.in_flight = 0
+        self.peak = 0
 
-            response = session.get(
-                url,
-                timeout=TIMEOUT
-            )
+        self.baseline_p95 = None
+        self.last_p95 = None
+        self.last_error_rate = 0.0
+        self.last_decision = None
 
-            elapsed = int(
-                (time.time() - start) * 1000
-            )
+        self.increases = 0
+        self.decreases = 0
+        self.waits = 0
 
-            responses.append(response)
-            timestamps.append(elapsed)
+        self._window = []
+        self._cond = threading.Condition()
 
-        except Exception as e:
-            errors.append(str(e))
 
+    def acquire(self, timeout=None, force=False):
+        """
+        Reserva un hueco; devuelve las peticiones en vuelo (incluida esta)
+        o None si `timeout` vence antes.
 
-    if not responses:
-        raise RuntimeError(
-            "No HTTP responses obtained"
-        )
+        `force` cuenta la petición sin esperar al límite
+        (ráfagas con tope propio, ver load_curve).
+        """
 
+        with self._cond:
 
-    r1 = responses[0]
-    h = r1.headers
+            if not force and self.in_flight >= int(self.limit):
 
+                self.waits += 1
 
-    # =====================================================
-    # DERIVA SEMÁNTICA DEL CONTENIDO
-    # =====================================================
+                if not self._cond.wait_for(
+                    lambda: self.in_flight < int(self.limit),
+                    timeout
+                ):
+                    return None
 
-    body_hashes = [
-        hash_body(r.text)
-        for r in responses
-    ]
 
-    hash_change = (
-        len(set(body_hashes)) > 1
-    )
+            self.in_flight += 1
 
+            self.peak = max(
+                self.peak,
+                self.in_flight
+            )
 
-    body_sizes = [
-        len(r.text)
-        for r in responses
-    ]
+            return self.in_flight
 
 
-    size_variation = (
-        max(body_sizes) -
-        min(body_sizes)
-    )
+    def release(self, latency=None, overloaded=False):
 
+        with self._cond:
 
-    # =====================================================
-    # LATENCIA Y COMPORTAMIENTO
-    # =====================================================
+            self.in_flight -= 1
 
-    avg_latency = (
-        sum(timestamps) / len(timestamps)
-        if timestamps
-        else None
-    )
+            self._window.append(
+                (latency, overloaded)
+            )
 
+            if len(self._window) >= self.window_size:
+                self._adjust()
 
-    latency_variance = (
-        max(timestamps) -
-        min(timestamps)
-        if timestamps
-        else 0
-    )
+            self._cond.notify_all()
 
 
-    # =====================================================
-    # HEAD VS GET
-    # =====================================================
+    def _adjust(self):
 
-    try:
+        latencies = sorted(
+            latency
+            for latency, _ in self._window
+            if latency is not None
+        )
 
-        r_head = session.head(
-            url,
-            timeout=TIMEOUT
+        error_rate = (
+            sum(1 for _, overloaded in self._window if overloaded)
+            / len(self._window)
         )
 
-        head_len = int(
-            r_head.headers.get(
-                "Content-Length",
-                -1
-            )
+        p95 = (
+            latencies[int(0.95 * (len(latencies) - 1))]
+            if latencies
+            else None
         )
 
-        head_mismatch = (
-            head_len != -1
-            and abs(head_len - len(r1.text)) > 128
+        self._window = []
+
+        self.last_p95 = p95
+        self.last_error_rate = round(error_rate, 3)
+
+
+        slowed = (
+            p95 is not None
+            and self.baseline_p95 is not None
+            and p95 > self.baseline_p95 * AIMD_LATENCY_FACTOR
         )
 
+        if error_rate > AIMD_ERROR_RATE or slowed:
 
-    except Exception:
+            self.limit = max(1.0, self.limit * 0.5)
 
-        head_mismatch = False
+            self.decreases += 1
 
+            self.last_decision = "decrease"
 
+        else:
 
-    # =====================================================
-    # CACHE / DELIVERY SEMANTICS
-    # =====================================================
+            self.limit = min(float(self.ceiling), self.limit + 1)
 
-    etag = h.get("ETag")
+            self.increases += 1
 
-    cache_control = (
-        h.get(
-            "Cache-Control",
-            ""
-        )
-    )
+            self.last_decision = "increase"
 
-    vary = (
-        h.get(
-            "Vary",
-            ""
-        )
-    )
 
+        #
+        # La base baja al instante y sube poco a poco
+        # (AIMD_BASELINE_RECOVERY): si el host se vuelve más lento
+        # de forma estable, el límite acaba recuperándose.
+        #
 
-    age = h.get("Age")
+        if p95 is not None:
 
-    cache_signals = {
+            if self.baseline_p95 is None or p95 < self.baseline_p95:
 
-        "etag_present":
-            bool(etag),
+                self.baseline_p95 = p95
 
-        "cache_control":
-            cache_control,
+            else:
 
-        "vary_present":
-            bool(vary),
+                self.baseline_p95 += (
+                    (p95 - self.baseline_p95) * AIMD_BASELINE_RECOVERY
+                )
 
-        "age_present":
-            bool(age),
 
-        "cdn_cache_hint":
-            bool(age),
+    def snapshot(self):
 
-        "cache_ambiguous":
-            (
-                "no-cache" not in cache_control.lower()
-                and
-                "no-store" not in cache_control.lower()
-                and
-                not etag
-            )
-    }
+        with self._cond:
 
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak,
+                "baseline_p95": (
+                    round(self.baseline_p95, 3)
+                    if self.baseline_p95 is not None
+                    else None
+                ),
+                "last_p95": (
+                    round(self.last_p95, 3)
+                    if self.last_p95 is not None
+                    else None
+                ),
+                "last_error_rate": self.last_error_rate,
+                "last_decision": self.last_decision,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "waits": self.waits
+            }
 
 
-    # =====================================================
-    # COHERENCIA DE CONTENIDO
-    # =====================================================
+# ----------------------------- SCOPE ----------------------------------
+class ScopeViolation(requests.exceptions.RequestException):
+    """
+    Destino fuera del scope autorizado: no se emite.
+    """
 
-    content_type = (
-        h.get(
-            "Content-Type",
-            ""
-        )
-    )
 
+class ScopeAllowlist:
+    """
+    Allowlist de scope compilada.
 
-    text_sample = (
-        r1.text.strip()[:50]
-    )
+    Entradas (una por línea, `#` comenta):
+        example.com                 → host exacto
+        *.example.com               → cualquier subdominio
+        10.0.0.0/8, 2001:db8::/32   → rangos CIDR (hosts IP literales)
+        https://example.com/app/    → prefijo de URL
 
+    Dominios → trie de sufijos por etiquetas invertidas, O(etiquetas).
+    CIDR     → intervalos fusionados + bisect, O(log n).
+    Prefijos → índice por host.
+    """
 
-    semantic_mismatch = (
+    def __init__(self, entries=()):
 
-        "json" in content_type.lower()
+        self._trie = {}
 
-        and
+        self._starts = {4: [], 6: []}
+        self._ends = {4: [], 6: []}
 
-        not text_sample.startswith(
-            (
-                "{",
-                "["
+        self._prefixes = {}
+
+        self.rejected = 0
+
+        self._lock = threading.Lock()
+
+
+        ranges = {4: [], 6: []}
+
+        for entry in entries:
+            self._add(entry, ranges)
+
+
+        for version, spans in ranges.items():
+
+            for start, end in sorted(spans):
+
+                if (
+                    self._ends[version]
+                    and start <= self._ends[version][-1] + 1
+                ):
+                    self._ends[version][-1] = max(
+                        self._ends[version][-1],
+                        end
+                    )
+
+                else:
+                    self._starts[version].append(start)
+                    self._ends[version].append(end)
+
+
+    @classmethod
+    def from_file(cls, path):
+
+        with open(path, encoding="utf-8") as fh:
+            return cls(fh)
+
+
+    def _add(self, entry, ranges):
+
+        entry = entry.split("#", 1)[0].strip().lower()
+
+        if not entry:
+            return
+
+
+        # =====================================================
+        # PREFIJO DE URL
+        # =====================================================
+
+        if "://" in entry:
+
+            parsed = urlparse(entry)
+
+            self._prefixes.setdefault(
+                (parsed.hostname or "").rstrip("."),
+                []
+            ).append((
+                parsed.scheme,
+                parsed.port or default_port(parsed.scheme),
+                parsed.path or "/"
+            ))
+
+            return
+
+
+        # =====================================================
+        # CIDR / IP
+        # =====================================================
+
+        try:
+
+            network = ipaddress.ip_network(
+                entry,
+                strict=False
+            )
+
+            ranges[network.version].append((
+                int(network.network_address),
+                int(network.broadcast_address)
+            ))
+
+            return
+
+        except ValueError:
+            pass
+
+
+        # =====================================================
+        # DOMINIO / WILDCARD
+        # =====================================================
+
+        wildcard = entry.startswith("*.")
+
+        labels = (
+            entry[2:]
+            if wildcard
+            else entry
+        ).rstrip(".").split(".")
+
+        node = self._trie
+
+        for label in reversed(labels):
+            node = node.setdefault(label, {})
+
+        node["*" if wildcard else "$"] = True
+
+
+    def _in_trie(self, host):
+
+        node = self._trie
+
+        labels = host.split(".")
+
+        for depth, label in enumerate(reversed(labels), 1):
+
+            node = node.get(label)
+
+            if node is None:
+                return False
+
+            if node.get("*") and depth < len(labels):
+                return True
+
+
+        return bool(node.get("$"))
+
+
+    def _in_ranges(self, ip):
+
+        starts = self._starts[ip.version]
+
+        value = int(ip)
+
+        i = bisect.bisect_right(starts, value) - 1
+
+        return (
+            i >= 0
+            and value <= self._ends[ip.version][i]
+        )
+
+
+    def contains(self, url):
+
+        parsed = urlparse(url)
+
+        host = (parsed.hostname or "").lower().rstrip(".")
+
+        if not host:
+            return False
+
+
+        try:
+            ip = ipaddress.ip_address(host)
+
+        except ValueError:
+            ip = None
+
+
+        if ip is not None and self._in_ranges(ip):
+            return True
+
+        if ip is None and self._in_trie(host):
+            return True
+
+
+        port = parsed.port or default_port(parsed.scheme)
+
+        path = parsed.path or "/"
+
+        return any(
+            parsed.scheme == scheme
+            and port == prefix_port
+            and path.startswith(prefix)
+            for scheme, prefix_port, prefix in self._prefixes.get(host, ())
+        )
+
+
+    def allows(self, url):
+        """
+        Igual que contains(), registrando los rechazos.
+        """
+
+        if self.contains(url):
+            return True
+
+        with self._lock:
+            self.rejected += 1
+
+        log.warning(
+            "scope: rejected %s",
+            url
+        )
+
+        return False
+
+
+def in_scope(targets, scanner=None):
+    """
+    Filtra un flujo de targets contra la allowlist del Scanner
+    (por defecto, SCOPE_ALLOWLIST), antes de cualquier E/S de red.
+    """
+
+    allowlist = (scanner or default_scanner()).settings["allowlist"]
+
+    for target in targets:
+
+        if allowlist is None or allowlist.allows(target):
+            yield target
+
+
+# ----------------------------- TRÁFICO ---------------------------------
+class QuotaExhausted(requests.exceptions.RequestException):
+    """
+    Petición no emitida: el presupuesto de peticiones del scope se agotó.
+    """
+
+
+class RequestQuota:
+    """
+    Tope duro de peticiones por scope (cliente / contrato).
+
+    Compartido por todos los scans del scope;
+    cada petición en el cable consume una unidad.
+    """
+
+    def __init__(self, limit):
+
+        self.limit = limit
+        self.used = 0
+        self.refused = 0
+
+        self._lock = threading.Lock()
+
+
+    def consume(self):
+
+        with self._lock:
+
+            if self.used >= self.limit:
+
+                self.refused += 1
+
+                return False
+
+            self.used += 1
+
+            return True
+
+
+    def snapshot(self):
+
+        with self._lock:
+
+            return {
+                "limit": self.limit,
+                "used": self.used,
+                "remaining": max(0, self.limit - self.used),
+                "refused": self.refused
+            }
+
+
+def scope_quota(scope, limit=None):
+    """
+    Cuota del scope en el Scanner por defecto.
+
+    Sin `limit` ni SCOPE_REQUEST_BUDGET no hay tope: devuelve None.
+    """
+
+    return default_scanner().quota(scope, limit)
+
+
+class TrafficMeter:
+    """
+    Contabilidad de tráfico de un scan, a nivel de cable
+    (cada salto de redirección cuenta).
+
+    Las cabeceras cuentan al llegar; el cuerpo de una respuesta
+    en streaming, al consumirse o cerrarse (MeteredRaw). Lo leído
+    de cuerpos aún abiertos entra en snapshot().
+    """
+
+    def __init__(self):
+
+        self.requests = {}
+        self.bytes_sent = 0
+        self.bytes_received_wire = 0
+        self.bytes_received_decoded = 0
+
+        self._open = set()
+
+        self._lock = threading.Lock()
+
+
+    def record_request(self, request):
+
+        body = request.body or b""
+
+        size = (
+            len(f"{request.method} {request.path_url} HTTP/1.1\r\n")
+            + sum(
+                len(k) + len(v) + 4
+                for k, v in request.headers.items()
+            )
+            + 2
+            + len(body)
+        )
+
+        with self._lock:
+
+            self.requests[request.method] = (
+                self.requests.get(request.method, 0) + 1
+            )
+
+            self.bytes_sent += size
+
+
+    def record_response(self, response):
+
+        headers = (
+            len(f"HTTP/1.1 {response.status_code} {response.reason}\r\n")
+            + sum(
+                len(k) + len(v) + 4
+                for k, v in response.headers.items()
             )
+            + 2
+        )
+
+        #
+        # Cuerpo aún sin leer (stream=True): se contabiliza después.
+        #
+
+        if not response._content_consumed:
+
+            response.raw = MeteredRaw(response.raw, self)
+
+            with self._lock:
+
+                self.bytes_received_wire += headers
+
+                self._open.add(response.raw)
+
+            return
+
+
+        body_wire = safe(
+            lambda: response.raw.tell(),
+            0
+        )
+
+        with self._lock:
+
+            self.bytes_received_wire += headers + (body_wire or 0)
+
+            self.bytes_received_decoded += len(response.content or b"")
+
+
+    def settle(self, raw):
+        """
+        Cuerpo en streaming consumido o cerrado: suma sus bytes.
+        """
+
+        with self._lock:
+
+            if raw not in self._open:
+                return
+
+            self._open.discard(raw)
+
+            self.bytes_received_wire += raw.wire()
+
+            self.bytes_received_decoded += raw.decoded
+
+
+    def merge(self, snapshot):
+        """
+        Suma el snapshot de otro meter (tráfico previo al scan).
+        """
+
+        with self._lock:
+
+            for method, n in snapshot["requests"].items():
+                self.requests[method] = self.requests.get(method, 0) + n
+
+            self.bytes_sent += snapshot["bytes_sent"]
+
+            self.bytes_received_wire += snapshot["bytes_received_wire"]
+
+            self.bytes_received_decoded += snapshot["bytes_received_decoded"]
+
+
+    def snapshot(self):
+
+        with self._lock:
+
+            return {
+                "requests": dict(self.requests),
+                "requests_total": sum(self.requests.values()),
+                "bytes_sent": self.bytes_sent,
+                "bytes_received_wire": (
+                    self.bytes_received_wire
+                    + sum(raw.wire() for raw in self._open)
+                ),
+                "bytes_received_decoded": (
+                    self.bytes_received_decoded
+                    + sum(raw.decoded for raw in self._open)
+                )
+            }
+
+
+class MeteredRaw:
+    """
+    `raw` de una respuesta en streaming que avisa al TrafficMeter
+    cuando el cuerpo se agota o se cierra. El resto se delega.
+    """
+
+    def __init__(self, raw, meter):
+
+        self._raw = raw
+
+        self._meter = meter
+
+        self.decoded = 0
+
+
+    def __getattr__(self, name):
+
+        return getattr(self._raw, name)
+
+
+    def wire(self):
+
+        return safe(lambda: self._raw.tell(), 0) or 0
+
+
+    def read(self, *args, **kwargs):
+
+        data = self._raw.read(*args, **kwargs) or b""
+
+        self.decoded += len(data)
+
+        if not data:
+            self._meter.settle(self)
+
+        return data
+
+
+    def stream(self, amt=2 ** 16, decode_content=None):
+
+        chunks = (
+            self._raw.stream(amt, decode_content=decode_content)
+            if hasattr(self._raw, "stream")
+            else iter(lambda: self._raw.read(amt), b"")
+        )
+
+        for chunk in chunks:
+
+            self.decoded += len(chunk)
+
+            yield chunk
+
+
+        self._meter.settle(self)
+
+
+    def close(self):
+
+        try:
+            self._raw.close()
+
+        finally:
+            self._meter.settle(self)
+
+
+    def release_conn(self):
+
+        try:
+            self._raw.release_conn()
+
+        finally:
+            self._meter.settle(self)
+
+
+# ----------------------------- DNS ----------------------------------
+class DNSCache:
+    """
+    Cache DNS en proceso, compartida por todas las sesiones de un Scanner.
+
+    - TTL real con dnspython (si está instalado);
+      sin él, resolver del sistema y TTL fijo (DNS_DEFAULT_TTL)
+    - caché negativa: un fallo se recuerda DNS_NEGATIVE_TTL segundos
+    - una sola resolución en vuelo por host (el resto espera)
+    - las entradas caducadas hace más de DNS_RETAIN segundos se
+      purgan (como mucho una vez cada DNS_PURGE_INTERVAL): el
+      report de un scan aún lee la suya aunque haya caducado
+
+    Por host se registra tiempo de resolución y direcciones usadas
+    en las conexiones (report → meta.dns).
+    """
+
+    def __init__(self, ttl=DNS_DEFAULT_TTL, negative_ttl=DNS_NEGATIVE_TTL):
+
+        self.ttl = ttl
+
+        self.negative_ttl = negative_ttl
+
+        self._entries = {}
+
+        self._locks = {}
+
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+        self._purged_at = time.time()
+
+        self._pools = None
+
+
+    def _lookup(self, host):
+
+        t0 = time.time()
+
+
+        if dns_resolver is not None:
+
+            try:
+
+                addresses = []
+                ttls = []
+
+                for rdtype in ("A", "AAAA"):
+
+                    try:
+                        answer = dns_resolver.resolve(host, rdtype)
+
+                    except dns_resolver.NoAnswer:
+                        continue
+
+                    addresses += [record.to_text() for record in answer]
+
+                    ttls.append(answer.rrset.ttl)
+
+
+                if addresses:
+
+                    return {
+                        "addresses": addresses,
+                        "ttl": min(ttls),
+                        "source": "dnspython",
+                        "resolution_sec": round(time.time() - t0, 4)
+                    }
+
+            except Exception:
+
+                #
+                # /etc/hosts, mDNS, search domains…:
+                # el resolver del sistema tiene la última palabra.
+                #
+
+                pass
+
+
+        infos = socket.getaddrinfo(
+            host,
+            None,
+            type=socket.SOCK_STREAM
+        )
+
+        return {
+            "addresses": list(dict.fromkeys(
+                info[4][0]
+                for info in infos
+            )),
+            "ttl": self.ttl,
+            "source": "system",
+            "resolution_sec": round(time.time() - t0, 4)
+        }
+
+
+    def resolve(self, host):
+        """
+        Direcciones de `host` (cache con TTL).
+        Un fallo en cache se relanza como socket.gaierror.
+        """
+
+        host = host.lower().rstrip(".")
+
+        try:
+
+            ipaddress.ip_address(host)
+
+            return [host]
+
+        except ValueError:
+            pass
+
+
+        with self._lock:
+
+            entry = self._entries.get(host)
+
+            if entry and entry["expires_at"] > time.time():
+
+                self.hits += 1
+
+                return self._unwrap(entry)
+
+            lock = self._locks.setdefault(host, threading.Lock())
+
+
+        with lock:
+
+            entry = self._entries.get(host)
+
+            if entry and entry["expires_at"] > time.time():
+
+                with self._lock:
+                    self.hits += 1
+
+                return self._unwrap(entry)
+
+
+            try:
+
+                entry = self._lookup(host)
+
+                entry["error"] = None
+
+            except OSError as e:
+
+                entry = {
+                    "addresses": [],
+                    "ttl": self.negative_ttl,
+                    "source": "negative",
+                    "resolution_sec": None,
+                    "error": str(e)
+                }
+
+
+            entry["resolved_at"] = time.time()
+
+            entry["expires_at"] = entry["resolved_at"] + entry["ttl"]
+
+            entry["connected"] = set()
+
+
+            with self._lock:
+
+                self.misses += 1
+
+                self.failures += bool(entry["error"])
+
+                self._entries[host] = entry
+
+                self._locks.pop(host, None)
+
+                self._purge(entry["resolved_at"])
+
+
+            return self._unwrap(entry)
+
+
+    def _purge(self, now):
+        """
+        Descarta entradas caducadas hace más de DNS_RETAIN.
+        Con el lock tomado.
+        """
+
+        if now - self._purged_at < DNS_PURGE_INTERVAL:
+            return
+
+        self._purged_at = now
+
+        for host in [
+            host
+            for host, entry in self._entries.items()
+            if entry["expires_at"] + DNS_RETAIN < now
+        ]:
+            del self._entries[host]
+
+
+    def _unwrap(self, entry):
+
+        if entry["error"]:
+            raise socket.gaierror(entry["error"])
+
+        return entry["addresses"]
+
+
+    def connected(self, host, address):
+
+        entry = self._entries.get(host.lower().rstrip("."))
+
+        if entry:
+            entry["connected"].add(address)
+
+
+    def report(self, host, since=None):
+        """
+        Estado DNS de `host` para el report de un scan.
+        `cached` indica que ya estaba resuelto antes de `since`.
+        """
+
+        entry = self._entries.get((host or "").lower().rstrip("."))
+
+        if entry is None:
+            return None
+
+        return {
+            "host": host,
+            "addresses": entry["addresses"],
+            "connected": sorted(entry["connected"]),
+            "ttl": entry["ttl"],
+            "source": entry["source"],
+            "resolution_sec": entry["resolution_sec"],
+            "error": entry["error"],
+            "cached": (
+                since is not None
+                and entry["resolved_at"] < since
+            )
+        }
+
+
+    def snapshot(self):
+
+        with self._lock:
+
+            return {
+                "hosts": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "failures": self.failures
+            }
+
+
+    def pool_classes(self):
+        """
+        Pools de urllib3 cuyas conexiones resuelven con esta cache.
+        """
+
+        if self._pools is None:
+
+            self._pools = {
+                "http": type(
+                    "CachedDNSHTTPConnectionPool",
+                    (HTTPConnectionPool,),
+                    {"ConnectionCls": type(
+                        "CachedDNSHTTPConnection",
+                        (CachedDNSConnection, TrackedConnection, HTTPConnection),
+                        {"dns": self}
+                    )}
+                ),
+                "https": type(
+                    "CachedDNSHTTPSConnectionPool",
+                    (HTTPSConnectionPool,),
+                    {"ConnectionCls": type(
+                        "CachedDNSHTTPSConnection",
+                        (CachedDNSConnection, TrackedConnection, HTTPSConnection),
+                        {"dns": self}
+                    )}
+                )
+            }
+
+        return self._pools
+
+
+class CachedDNSConnection:
+    """
+    Mixin para conexiones urllib3: _new_conn() resuelve por DNSCache
+    y prueba las direcciones en orden. SNI y Host no cambian.
+    """
+
+    dns = None
+
+    def _new_conn(self):
+
+        try:
+            addresses = self.dns.resolve(self._dns_host)
+
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+
+
+        error = None
+
+        for address in addresses:
+
+            t0 = time.time()
+
+            try:
+
+                sock = create_connection(
+                    (address, self.port),
+                    self.timeout,
+                    source_address=self.source_address,
+                    socket_options=self.socket_options
+                )
+
+            except socket.timeout:
+
+                error = ConnectTimeoutError(
+                    self,
+                    f"Connection to {self.host} timed out. (connect timeout={self.timeout})"
+                )
+
+                continue
+
+            except OSError as e:
+
+                error = NewConnectionError(
+                    self,
+                    f"Failed to establish a new connection: {e}"
+                )
+
+                continue
+
+
+            self.connected_at = time.time()
+
+            self.tcp_sec = self.connected_at - t0
+
+            self.dns.connected(self._dns_host, address)
+
+            return sock
+
+
+        raise error or NewConnectionError(
+            self,
+            "Failed to establish a new connection: no addresses"
+        )
+
+
+class TLSSessionCache:
+    """
+    Sesiones TLS por (host, puerto), reutilizadas en conexiones nuevas.
+
+    Vive en el Scanner: sobrevive entre scans y sesiones HTTP,
+    no entre procesos (ssl.SSLSession no es serializable).
+    """
+
+    def __init__(self):
+
+        self._sessions = {}
+
+        self._lock = threading.Lock()
+
+        self.handshakes = {}
+
+        self._context = None
+
+
+    def get(self, key):
+
+        with self._lock:
+            return self._sessions.get(key)
+
+
+    def put(self, key, session):
+
+        if session is None:
+            return
+
+        with self._lock:
+            self._sessions[key] = session
+
+
+    def count(self, kind):
+
+        with self._lock:
+            self.handshakes[kind] = self.handshakes.get(kind, 0) + 1
+
+
+    @property
+    def context(self):
+        """
+        Contexto TLS compartido que inyecta la sesión cacheada.
+
+        Verificación de certificado igual que requests; el hostname
+        lo comprueba urllib3 (así verify=False sigue funcionando).
+        """
+
+        with self._lock:
+
+            if self._context is None:
+
+                context = ResumingSSLContext(ssl.PROTOCOL_TLS_CLIENT)
+
+                context.minimum_version = ssl.TLSVersion.TLSv1_2
+
+                context.options |= ssl.OP_NO_COMPRESSION
+
+                context.check_hostname = False
+
+                context.verify_mode = ssl.CERT_REQUIRED
+
+                context.set_alpn_protocols(["http/1.1"])
+
+                context.tickets = self
+
+                self._context = context
+
+            return self._context
+
+
+    def snapshot(self):
+
+        with self._lock:
+
+            return {
+                "hosts": len(self._sessions),
+                "handshakes": dict(self.handshakes)
+            }
+
+
+class ResumingSSLContext(ssl.SSLContext):
+    """
+    SSLContext cuyo wrap_socket() retoma la sesión TLS cacheada
+    para ese host y puerto.
+    """
+
+    tickets = None
+
+    def wrap_socket(self, sock, *args, server_hostname=None, session=None, **kwargs):
+
+        if session is None and self.tickets is not None and server_hostname:
+
+            session = self.tickets.get((
+                server_hostname,
+                safe(lambda: sock.getpeername()[1])
+            ))
+
+
+        return super().wrap_socket(
+            sock,
+            *args,
+            server_hostname=server_hostname,
+            session=session,
+            **kwargs
+        )
+
+
+class TrackedConnection:
+    """
+    Mixin para conexiones urllib3: tipo de handshake por petición.
+
+        full / resumed  → primera petición de una conexión TLS nueva
+        tcp             → primera petición de una conexión en claro
+        keepalive       → conexión reutilizada
+
+    En la primera petición de una conexión nueva, `connect_timing`
+    lleva el connect TCP (sin la resolución DNS) y el handshake TLS.
+
+    Tras la primera respuesta guarda la sesión TLS en la cache
+    (en TLS 1.3 el ticket llega después del handshake).
+    """
+
+    handshake = None
+
+    connect_timing = None
+
+    def connect(self):
+
+        super().connect()
+
+        reused = getattr(self.sock, "session_reused", None)
+
+        tcp = getattr(self, "tcp_sec", None)
+
+        connected_at = getattr(self, "connected_at", None)
+
+        if reused is None:
+
+            self.handshake = "tcp"
+
+            self.connect_timing = {"tcp": tcp, "tls": None}
+
+            return
+
+
+        self.handshake = "resumed" if reused else "full"
+
+        self.connect_timing = {
+            "tcp": tcp,
+            "tls": (
+                time.time() - connected_at
+                if connected_at is not None
+                else None
+            )
+        }
+
+        tickets = getattr(self.ssl_context, "tickets", None)
+
+        if tickets is not None:
+            tickets.count(self.handshake)
+
+
+    def getresponse(self, *args, **kwargs):
+
+        response = super().getresponse(*args, **kwargs)
+
+        response.handshake = self.handshake or "keepalive"
+
+        response.connect_timing = self.connect_timing
+
+
+        tickets = getattr(
+            getattr(self, "ssl_context", None),
+            "tickets",
+            None
+        )
+
+        if tickets is not None and self.handshake in ("full", "resumed"):
+
+            tickets.put(
+                (self.server_hostname or self.host, self.port),
+                getattr(self.sock, "session", None)
+            )
+
+
+        self.handshake = None
+
+        self.connect_timing = None
+
+        return response
+
+
+class DNSCacheAdapter(HTTPAdapter):
+    """
+    HTTPAdapter cuyas conexiones pasan por una DNSCache y,
+    con `tls`, retoman sesiones TLS de una TLSSessionCache.
+    """
+
+    def __init__(self, dns, tls=None, **kwargs):
+
+        self.dns = dns
+
+        self.tls = tls
+
+        super().__init__(**kwargs)
+
+
+    def init_poolmanager(self, *args, **kwargs):
+
+        if self.tls is not None:
+            kwargs.setdefault("ssl_context", self.tls.context)
+
+        super().init_poolmanager(*args, **kwargs)
+
+        self.poolmanager.pool_classes_by_scheme = self.dns.pool_classes()
+
+
+class PinnedDNS(DNSCache):
+    """
+    Resolución fijada a una sola dirección (un backend del pool).
+
+    Con DNSCacheAdapter, todas las conexiones van a `address`;
+    SNI, Host y verificación siguen usando el hostname.
+    Las conexiones se anotan en la cache de origen (meta.dns).
+    """
+
+    def __init__(self, cache, address):
+
+        super().__init__()
+
+        self.cache = cache
+
+        self.address = address
+
+
+    def resolve(self, host):
+
+        return [self.address]
+
+
+    def connected(self, host, address):
+
+        self.cache.connected(host, address)
+
+
+# ----------------------------- TRANSPORTE HTTP/2 ------------------------------
+HOP_BY_HOP = frozenset({
+    "connection",
+    "keep-alive",
+    "proxy-connection",
+    "transfer-encoding",
+    "upgrade",
+})
+
+
+class H2Raw:
+    """
+    `raw` de una respuesta servida por HTTP2Adapter.
+
+    Entrega el cuerpo ya decodificado (httpx descomprime);
+    tell() devuelve los bytes recibidos del cable.
+    """
+
+    def __init__(self, response):
+
+        self._response = response
+
+        self._chunks = response.iter_bytes()
+
+        self._buffer = b""
+
+        self.protocol = response.http_version
+
+        self.handshake = None
+
+
+    def read(self, amt=None, decode_content=True):
+
+        while amt is None or len(self._buffer) < amt:
+
+            chunk = next(self._chunks, None)
+
+            if chunk is None:
+                break
+
+            self._buffer += chunk
+
+
+        if amt is None:
+            data, self._buffer = self._buffer, b""
+
+        else:
+            data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+
+        return data
+
+
+    def tell(self):
+        return self._response.num_bytes_downloaded
+
+
+    def close(self):
+        self._response.close()
+
+    release_conn = close
+
+
+class HTTP2Adapter(BaseAdapter):
+    """
+    Transporte HTTP/2 opcional (httpx[http2]).
+
+    ALPN negocia h2 sobre TLS; si el servidor no lo ofrece,
+    o la URL es http://, la conexión habla HTTP/1.1.
+    Las peticiones simultáneas al mismo host se multiplexan
+    sobre una única conexión.
+
+    La respuesta lleva `raw.protocol` ("HTTP/2" / "HTTP/1.1").
+    Este transporte no pasa por DNSCache ni por TLSSessionCache.
+    """
+
+    def __init__(self):
+
+        if httpx is None:
+            raise ImportError("HTTP2Adapter requires httpx[http2]")
+
+        super().__init__()
+
+        self._clients = {}
+
+        self._lock = threading.Lock()
+
+
+    def _client(self, verify, cert):
+
+        key = (
+            verify if isinstance(verify, str) else bool(verify),
+            tuple(cert) if isinstance(cert, (list, tuple)) else cert
+        )
+
+        with self._lock:
+
+            if key not in self._clients:
+
+                #
+                # Ruta de CA (REQUESTS_CA_BUNDLE, verify="…"): httpx
+                # espera un SSLContext.
+                #
+
+                if isinstance(verify, str):
+                    verify = (
+                        ssl.create_default_context(capath=verify)
+                        if os.path.isdir(verify)
+                        else ssl.create_default_context(cafile=verify)
+                    )
+
+
+                self._clients[key] = httpx.Client(
+                    http2=True,
+                    verify=verify,
+                    cert=cert,
+                    trust_env=False,
+                    follow_redirects=False,
+                    limits=httpx.Limits(
+                        max_connections=SCANNER_POOL_HOSTS * SCANNER_POOL_MAXSIZE,
+                        max_keepalive_connections=SCANNER_POOL_HOSTS
+                    )
+                )
+
+            return self._clients[key]
+
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None,
+             proxies=None):
+
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+
+        else:
+            timeout = httpx.Timeout(timeout)
+
+
+        client = self._client(verify, cert)
+
+        body = request.body
+
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+
+
+        #
+        # Sin cuerpo, el encuadre lo pone httpx: el Content-Length: 0
+        # que requests añade a OPTIONS / DELETE cierra la conexión h2.
+        #
+
+        skip = (
+            HOP_BY_HOP | {"content-length"}
+            if body is None
+            else HOP_BY_HOP
+        )
+
+
+        try:
+
+            upstream = client.send(
+                client.build_request(
+                    request.method,
+                    request.url,
+                    headers=[
+                        (k, v)
+                        for k, v in request.headers.items()
+                        if k.lower() not in skip
+                    ],
+                    content=body,
+                    timeout=timeout
+                ),
+                stream=True
+            )
+
+        except httpx.ConnectTimeout as e:
+            raise requests.exceptions.ConnectTimeout(e, request=request)
+
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.ReadTimeout(e, request=request)
+
+        except httpx.HTTPError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+
+
+        response = requests.models.Response()
+
+        response.status_code = upstream.status_code
+
+        response.reason = upstream.reason_phrase
+
+        response.headers = CaseInsensitiveDict(upstream.headers.items())
+
+        response.encoding = get_encoding_from_headers(response.headers)
+
+        response.url = request.url
+
+        response.request = request
+
+        response.connection = self
+
+        response.raw = H2Raw(upstream)
+
+
+        if not stream:
+
+            try:
+                response._content = response.raw.read()
+
+            except httpx.HTTPError as e:
+                raise requests.exceptions.ConnectionError(e, request=request)
+
+            finally:
+                upstream.close()
+
+            response._content_consumed = True
+
+
+        return response
+
+
+    def close(self):
+
+        with self._lock:
+
+            clients, self._clients = self._clients, {}
+
+
+        for client in clients.values():
+            client.close()
+
+
+def prefetch_dns(targets, dns, depth=DNS_PREFETCH_DEPTH, workers=DNS_PREFETCH_WORKERS):
+    """
+    Look-ahead DNS sobre un flujo de targets: los próximos `depth`
+    se resuelven en segundo plano antes de llegar al consumidor.
+    Los fallos quedan en la caché negativa; el flujo no cambia.
+    """
+
+    window = []
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+
+        for target in targets:
+
+            host = urlparse(target).hostname
+
+            if host:
+                pool.submit(safe, lambda host=host: dns.resolve(host))
+
+            window.append(target)
+
+            if len(window) > depth:
+                yield window.pop(0)
+
+
+        yield from window
+
+
+# ----------------------------- SESSION --------------------------------
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    Petición cancelada: el presupuesto de tiempo de la fase se agotó.
+    """
+
+
+class RetryAfterDeferred(requests.exceptions.RequestException):
+    """
+    El host pidió esperar (429/503 + Retry-After):
+    el trabajo restante del target se re-encola.
+    """
+
+
+def retry_after_seconds(response):
+    """
+    Retry-After en segundos (entero o fecha HTTP), o None.
+    """
+
+    value = response.headers.get("Retry-After")
+
+    if not value:
+        return None
+
+    try:
+        delay = float(value)
+
+    except ValueError:
+
+        try:
+            delay = (
+                parsedate_to_datetime(value).timestamp()
+                - time.time()
+            )
+
+        except Exception:
+            return None
+
+
+    return min(
+        max(delay, 0.0),
+        RETRY_AFTER_MAX
+    )
+
+
+class ObservedSession(requests.Session):
+    """
+    Sesión de observación: punto de paso único de todas las fases.
+
+    Cada petición:
+    - respeta `expires_at` (presupuesto de la fase en curso):
+      el timeout se recorta al tiempo restante y, agotado,
+      la petición se cancela sin tocar la red
+    - consulta el breaker del host
+    - reintenta de forma visible (no dentro del adaptador):
+      la respuesta lleva `attempts` y los reintentos se cuentan por capa
+    - ante 429/503 con Retry-After no duerme: marca `deferred`
+      y corta el resto del trabajo del target
+    - pasa por el controlador AIMD del host; la respuesta lleva
+      `in_flight` (peticiones simultáneas al host al emitirla);
+      con `burst` (fase load) el AIMD cuenta pero no retiene
+      y no hay reintentos: cada petición es una sola en el cable
+    - en el cable (send) se valida contra la allowlist de scope
+      (también cada redirección), consume la cuota del scope
+      y queda contabilizada en `meter`; la respuesta lleva
+      `handshake` (full / resumed / tcp / keepalive)
+      y `protocol` (HTTP/1.1, HTTP/2)
+
+    `layer` indica la capa en curso para poder reportar
+    qué capas quedaron cortadas, expiradas o diferidas.
+
+    La sesión pertenece a un Scanner (ajustes y registros por host)
+    y vuelve a su pool entre scans: reset() limpia el estado
+    del scan anterior y conserva las conexiones abiertas.
+    """
+
+    def __init__(self, scanner=None):
+
+        super().__init__()
+
+        #
+        # Contadores por capa, handshakes, protocolos y pico en vuelo:
+        # los actualizan a la vez los hilos de una ráfaga (load)
+        # y las hijas de fork() al volver.
+        #
+
+        self._counters = threading.Lock()
+
+        self.reset(scanner)
+
+
+    def reset(self, scanner=None):
+
+        self.scanner = scanner or default_scanner()
+
+        self.settings = self.scanner.settings
+
+        self.cookies.clear()
+
+        self.layer = None
+
+        self.expires_at = None
+
+        self.cancel = None
+
+        self.deferred = None
+
+        self.cut_short = {}
+
+        self.expired = {}
+
+        self.retries = {}
+
+        self.peak_in_flight = 0
+
+        self.meter = TrafficMeter()
+
+        self.quota = None
+
+        self.over_quota = {}
+
+        self.allowlist = self.settings["allowlist"]
+
+        self.scope_blocked = []
+
+        self.handshakes = {}
+
+        self.protocols = {}
+
+        self.burst = False
+
+
+    def fork(self, adapter):
+        """
+        Sesión hija sobre otro adaptador (p. ej. fijado a un backend),
+        para usarla en paralelo con esta.
+
+        Comparte presupuesto, cancelación, cuota, contabilidad
+        y allowlist; sus contadores vuelven con join().
+        """
+
+        child = ObservedSession(self.scanner)
+
+        child.settings = self.settings
+
+        child.headers = self.headers.copy()
+
+        child.cookies.update(self.cookies)
+
+        child.profile = getattr(self, "profile", None)
+
+
+        for attr in ("layer", "expires_at", "cancel", "quota", "meter", "allowlist",
+                     "verify"):
+            setattr(child, attr, getattr(self, attr))
+
+
+        child.mount("http://", adapter)
+        child.mount("https://", adapter)
+
+        return child
+
+
+    def join(self, child):
+        """
+        Suma a esta sesión los contadores de una hija de fork().
+        """
+
+        with self._counters:
+
+            for registry in ("cut_short", "expired", "retries", "over_quota",
+                             "handshakes", "protocols"):
+
+                mine = getattr(self, registry)
+
+                for key, n in getattr(child, registry).items():
+                    mine[key] = mine.get(key, 0) + n
+
+
+            self.scope_blocked += child.scope_blocked
+
+            self.peak_in_flight = max(
+                self.peak_in_flight,
+                child.peak_in_flight
+            )
+
+            self.deferred = self.deferred or child.deferred
+
+
+    def _mark(self, registry):
+
+        self._count(registry, self.layer)
+
+
+    def _count(self, registry, key):
+
+        with self._counters:
+            registry[key] = registry.get(key, 0) + 1
+
+
+    def remaining(self, timeout=None):
+        """
+        Timeout efectivo dentro del presupuesto actual.
+        """
+
+        timeout = timeout or self.settings["timeout"]
+
+        if self.expires_at is None:
+            return timeout
+
+        return max(
+            0.0,
+            min(timeout, self.expires_at - time.time())
+        )
+
+
+    def _expire(self):
+
+        self._mark(self.expired)
+
+        return DeadlineExceeded(
+            f"phase budget exhausted ({self.layer})"
+        )
+
+
+    def _attempt(self, method, url, args, kwargs):
+        """
+        Un intento sobre la red: presupuesto + breaker.
+        """
+
+        # =====================================================
+        # PRESUPUESTO DE TIEMPO
+        # =====================================================
+
+        if self.cancel is not None and self.cancel.is_set():
+            raise self._expire()
+
+        if self.expires_at is not None:
+
+            left = self.expires_at - time.time()
+
+            if left <= 0:
+                raise self._expire()
+
+            timeout = kwargs.get("timeout")
+
+            if isinstance(timeout, tuple):
+                kwargs["timeout"] = tuple(
+                    min(t, left) if t else left
+                    for t in timeout
+                )
+
+            else:
+                kwargs["timeout"] = (
+                    min(timeout, left)
+                    if timeout
+                    else left
+                )
+
+
+        # =====================================================
+        # CIRCUIT BREAKER
+        # =====================================================
+
+        breaker = self.scanner.breaker(url)
+
+        if not breaker.allow():
+
+            self._mark(self.cut_short)
+
+            raise CircuitOpenError(
+                f"circuit open for {urlparse(url).hostname}"
+            )
+
+
+        # =====================================================
+        # CONCURRENCIA ADAPTATIVA
+        # =====================================================
+
+        limiter = self.scanner.limiter(url)
+
+        in_flight = limiter.acquire(
+            timeout=(
+                max(0.0, self.expires_at - time.time())
+                if self.expires_at is not None
+                else None
+            ),
+            force=self.burst
+        )
+
+        if in_flight is None:
+
+            breaker.release()
+
+            raise self._expire()
+
+        with self._counters:
+
+            self.peak_in_flight = max(
+                self.peak_in_flight,
+                in_flight
+            )
+
+
+        t0 = time.time()
+
+        try:
+
+            response = super().request(
+                method,
+                url,
+                *args,
+                **kwargs
+            )
+
+        except (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout
+        ) as e:
+
+            limiter.release(
+                overloaded=True
+            )
+
+            #
+            # Un timeout recortado por nuestro presupuesto
+            # no es culpa del host.
+            #
+
+            if (
+                self.expires_at is not None
+                and time.time() >= self.expires_at
+            ):
+
+                breaker.release()
+
+                raise self._expire() from e
+
+
+            breaker.record_failure()
+
+            raise
+
+        except BaseException:
+
+            limiter.release()
+
+            breaker.release()
+
+            raise
+
+
+        limiter.release(
+            latency=time.time() - t0,
+            overloaded=(
+                response.status_code == 429
+                or response.status_code >= 500
+            )
+        )
+
+        breaker.record_success()
+
+        response.in_flight = in_flight
+
+        return response
+
+
+    def send(self, request, **kwargs):
+        """
+        Salida al cable (también cada salto de redirección):
+        allowlist de scope, cuota y contabilidad de tráfico.
+        """
+
+        if (
+            self.allowlist is not None
+            and not self.allowlist.allows(request.url)
+        ):
+
+            self.scope_blocked.append(request.url)
+
+            raise ScopeViolation(
+                f"{request.url} outside authorized scope"
+            )
+
+
+        if self.quota is not None and not self.quota.consume():
+
+            self._mark(self.over_quota)
+
+            raise QuotaExhausted(
+                "scope request budget exhausted"
+            )
+
+
+        self.meter.record_request(request)
+
+        response = super().send(
+            request,
+            **kwargs
+        )
+
+        self.meter.record_response(response)
+
+        response.handshake = getattr(response.raw, "handshake", None)
+
+        response.connect_timing = getattr(response.raw, "connect_timing", None)
+
+        if response.handshake:
+            self._count(self.handshakes, response.handshake)
+
+
+        response.protocol = (
+            getattr(response.raw, "protocol", None)
+            or {10: "HTTP/1.0", 11: "HTTP/1.1"}.get(
+                getattr(response.raw, "version", None)
+            )
+        )
+
+        if response.protocol:
+            self._count(self.protocols, response.protocol)
+
+        return response
+
+
+    def _backoff(self, attempt):
+        """
+        Espera entre intentos, dentro del presupuesto.
+        """
+
+        delay = self.settings["retry_backoff"] * (2 ** (attempt - 1))
+
+        if (
+            self.expires_at is not None
+            and time.time() + delay >= self.expires_at
+        ):
+            raise self._expire()
+
+        self._mark(self.retries)
+
+        time.sleep(delay)
+
+
+    def request(self, method, url, *args, **kwargs):
+
+        if self.deferred:
+
+            raise RetryAfterDeferred(
+                f"deferred until {self.deferred['not_before']:.0f}"
+            )
+
+
+        retryable = (
+            method.upper() in RETRY_METHODS
+            and not self.burst
+        )
+
+        attempt = 0
+
+
+        while True:
+
+            attempt += 1
+
+            try:
+
+                response = self._attempt(
+                    method,
+                    url,
+                    args,
+                    dict(kwargs)
+                )
+
+            except (
+                CircuitOpenError,
+                DeadlineExceeded
+            ):
+
+                raise
+
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout
+            ):
+
+                if not retryable or attempt > self.settings["retries"]:
+                    raise
+
+                self._backoff(attempt)
+
+                continue
+
+
+            response.attempts = attempt
+
+
+            if response.status_code not in RETRY_STATUSES:
+                return response
+
+
+            # =================================================
+            # RETRY-AFTER → RE-ENCOLAR, NO DORMIR
+            # =================================================
+
+            delay = (
+                retry_after_seconds(response)
+                if response.status_code in (429, 503)
+                else None
+            )
+
+            if delay is not None:
+
+                self.deferred = {
+                    "status": response.status_code,
+                    "layer": self.layer,
+                    "retry_after": round(delay, 3),
+                    "not_before": time.time() + delay
+                }
+
+                return response
+
+
+            if not retryable or attempt > self.settings["retries"]:
+                return response
+
+
+            #
+            # La respuesta descartada libera su conexión
+            # (con stream=True quedaría retenida).
+            #
+
+            response.close()
+
+            self._backoff(attempt)
+
+
+
+def build_session(scanner=None):
+    """
+    Construye una sesión HTTP consistente para observación.
+
+    Objetivos:
+        • Cliente estable.
+        • Headers coherentes.
+        • Reintentos controlados.
+        • Lectura reproducible.
+
+    No modifica el comportamiento del escáner.
+    Solo mejora la calidad de las observaciones.
+    """
+
+    # ---------------------------------------------------------
+    # Perfiles simples y coherentes
+    # ---------------------------------------------------------
+    profiles = [
+        {
+            "name": "chrome",
+            "user_agent": (
+                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+                "AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/124.0.0.0 Safari/537.36"
+            ),
+        },
+        {
+            "name": "firefox",
+            "user_agent": (
+                "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:124.0) "
+                "Gecko/20100101 Firefox/124.0"
+            ),
+        },
+        {
+            "name": "mobile",
+            "user_agent": (
+                "Mozilla/5.0 (Linux; Android 14) "
+                "AppleWebKit/537.36 (KHTML, like Gecko) "
+                "Chrome/123.0 Mobile Safari/537.36"
+            ),
+        },
+    ]
+
+    # ---------------------------------------------------------
+    # Rotación ligera
+    # ---------------------------------------------------------
+    profile = random.choice(profiles)
+
+    session = ObservedSession(scanner)
+
+    session.headers.update({
+
+        "User-Agent": profile["user_agent"],
+
+        "Accept": (
+            "text/html,"
+            "application/xhtml+xml,"
+            "application/xml;q=0.9,"
+            "image/avif,"
+            "image/webp,"
+            "*/*;q=0.8"
+        ),
+
+        "Accept-Language": "en-US,en;q=0.9",
+
+        "Accept-Encoding": "gzip, deflate, br",
+
+        "Connection": "keep-alive",
+
+        "Upgrade-Insecure-Requests": "1",
+
+        "DNT": "1",
+
+    })
+
+    # ---------------------------------------------------------
+    # Adaptador del Scanner, compartido por todas sus sesiones:
+    # keep-alive entre scans, DNS y sesiones TLS cacheadas.
+    # Sin reintentos internos (los programa ObservedSession).
+    # ---------------------------------------------------------
+    adapter = session.scanner.adapter
+
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    # ---------------------------------------------------------
+    # Metadatos útiles para el resto del motor
+    # ---------------------------------------------------------
+    session.profile = profile["name"]
+
+    session.created_at = time.time()
+
+    return session
+
+
+
+# ----------------------------- UTILS ----------------------------------
+def safe(fn, default=None):
+    try:
+        return fn()
+    except Exception as e:
+        return default
+
+def default_port(scheme):
+    return 443 if scheme == "https" else 80
+
+def origin(url):
+    """
+    (esquema, host, puerto) de `url`, con el puerto por defecto explícito.
+    """
+
+    parsed = urlparse(url)
+
+    scheme = parsed.scheme.lower()
+
+    return (
+        scheme,
+        (parsed.hostname or "").lower(),
+        safe(lambda: parsed.port) or default_port(scheme)
+    )
+
+def hash_body(text):
+    return hashlib.sha256(text.encode(errors="ignore")).hexdigest()
+
+def t_critical(df):
+    """
+    t crítica bilateral al 95 % para `df` grados de libertad.
+
+    Entre filas de PAIRED_T_CRITICAL toma la del df inferior
+    (más exigente); por encima de la última, PAIRED_T_LIMIT.
+    """
+
+    if df < 1:
+        return None
+
+    if df > max(PAIRED_T_CRITICAL):
+        return PAIRED_T_LIMIT
+
+    return PAIRED_T_CRITICAL[
+        max(n for n in PAIRED_T_CRITICAL if n <= df)
+    ]
+
+def latency_sample(response):
+    """
+    La latencia de `response` vale como muestra: un solo intento
+    (sin backoff) y sin 429/5xx (reintento o Retry-After diferido).
+    """
+
+    return (
+        getattr(response, "attempts", 1) == 1
+        and response.status_code not in RETRY_STATUSES
+    )
+
+def drain_body(response, limit):
+    """
+    Lee y descarta el cuerpo hasta `limit` bytes (con o sin
+    Content-Length). True si cabía y la conexión queda reutilizable;
+    False si era mayor y la conexión se cerró.
+    """
+
+    length = response.headers.get("Content-Length", "")
+
+    if length.isdigit() and int(length) > limit:
+
+        response.close()
+
+        return False
+
+
+    read = 0
+
+    for chunk in response.iter_content(16384):
+
+        read += len(chunk)
+
+        if read > limit:
+
+            response.close()
+
+            return False
+
+    return True
+
+def parse_server_timing(value):
+    """
+    Cabecera Server-Timing → [{"name", "dur" (ms | None), "desc"}].
+
+        db;dur=53, cache;desc="hit";dur=0.2
+
+    Comas y ';' dentro de comillas no separan. Métricas mal formadas se ignoran.
+    """
+
+    metrics = []
+
+    for item in re.findall(r'(?:[^,"]|"(?:\\.|[^"\\])*")+', value or ""):
+
+        parts = re.findall(r'(?:[^;"]|"(?:\\.|[^"\\])*")+', item)
+
+        name = parts[0].strip() if parts else ""
+
+        if not name or not re.fullmatch(r"[!#$%&'*+.^_`|~0-9A-Za-z-]+", name):
+            continue
+
+
+        metric = {"name": name, "dur": None, "desc": None}
+
+        for param in parts[1:]:
+
+            key, _, raw = param.partition("=")
+
+            key = key.strip().lower()
+
+            raw = raw.strip()
+
+            if raw.startswith('"') and raw.endswith('"') and len(raw) > 1:
+                raw = re.sub(r"\\(.)", r"\1", raw[1:-1])
+
+
+            #
+            # Solo cuenta la primera aparición de cada parámetro.
+            #
+
+            if key == "dur" and metric["dur"] is None:
+                metric["dur"] = safe(lambda: float(raw))
+
+            elif key == "desc" and metric["desc"] is None:
+                metric["desc"] = raw
+
+
+        metrics.append(metric)
+
+    return metrics
+
+# ------------------------ HISTOGRAMA DE LATENCIA -------------------------------
+class LatencyHistogram:
+    """
+    Histograma de latencias (segundos) al estilo HDR.
+
+    Cubetas logarítmicas de ancho relativo `precision` entre
+    `lowest` y `highest`: memoria acotada sea cual sea el número
+    de muestras y error relativo ≤ precision / 2 en cada cuantil.
+
+    Se funde con merge() (muestras, runs, workers) y viaja
+    serializado con to_dict() / from_dict().
+
+    Estadísticos robustos: mediana, p90, p99, MAD y media recortada.
+    """
+
+    def __init__(self, lowest=LATENCY_HIST_LOWEST, highest=LATENCY_HIST_HIGHEST,
+                 precision=LATENCY_HIST_PRECISION):
+
+        self.lowest = lowest
+        self.highest = highest
+        self.precision = precision
+
+        self._base = math.log1p(precision)
+
+        self.counts = {}
+
+        self.count = 0
+        self.total = 0.0
+
+        self.min = None
+        self.max = None
+
+
+    def __len__(self):
+
+        return self.count
+
+
+    def _index(self, value):
+
+        value = min(max(value, self.lowest), self.highest)
+
+        return int(math.log(value / self.lowest) / self._base)
+
+
+    def _value(self, index):
+
+        #
+        # Centro geométrico de la cubeta, dentro del rango observado.
+        #
+
+        value = self.lowest * math.exp((index + 0.5) * self._base)
+
+        return min(max(value, self.min), self.max)
+
+
+    # =====================================================
+    # REGISTRO / FUSIÓN
+    # =====================================================
+
+    def record(self, value, n=1):
+
+        index = self._index(value)
+
+        self.counts[index] = self.counts.get(index, 0) + n
+
+        self.count += n
+        self.total += value * n
+
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        return self
+
+
+    def extend(self, values):
+
+        for value in values:
+            self.record(value)
+
+        return self
+
+
+    def merge(self, other):
+        """
+        Suma `other` a este histograma (misma geometría de cubetas).
+        """
+
+        if (other.lowest, other.highest, other.precision) != (
+            self.lowest, self.highest, self.precision
+        ):
+            raise ValueError("histogram geometry mismatch")
+
+
+        if not other.count:
+            return self
+
+
+        for index, n in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + n
+
+        self.count += other.count
+        self.total += other.total
+
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+        return self
+
+
+    def copy(self):
+
+        return LatencyHistogram.from_dict(self.to_dict())
+
+
+    def to_dict(self):
+
+        return {
+            "lowest": self.lowest,
+            "highest": self.highest,
+            "precision": self.precision,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "counts": {
+                str(index): n
+                for index, n in sorted(self.counts.items())
+            }
+        }
+
+
+    @classmethod
+    def from_dict(cls, data):
+
+        hist = cls(
+            data["lowest"],
+            data["highest"],
+            data["precision"]
+        )
+
+        hist.counts = {
+            int(index): n
+            for index, n in data["counts"].items()
+        }
+
+        hist.count = data["count"]
+        hist.total = data["total"]
+
+        hist.min = data["min"]
+        hist.max = data["max"]
+
+        return hist
+
+
+    # =====================================================
+    # ESTADÍSTICOS
+    # =====================================================
+
+    def _items(self):
+
+        return [
+            (self._value(index), n)
+            for index, n in sorted(self.counts.items())
+        ]
+
+
+    @staticmethod
+    def _rank(items, rank):
+        """
+        Valor en la posición `rank` (base 0) de la serie ordenada.
+        """
+
+        seen = 0
+
+        for value, n in items:
+
+            seen += n
+
+            if rank < seen:
+                return value
+
+        return items[-1][0]
+
+
+    @classmethod
+    def _quantile(cls, items, count, q):
+
+        #
+        # Interpolación lineal entre rangos (como statistics.median
+        # con un número par de muestras).
+        #
+
+        position = q * (count - 1)
+
+        low = cls._rank(items, math.floor(position))
+        high = cls._rank(items, math.ceil(position))
+
+        return low + (high - low) * (position - math.floor(position))
+
+
+    def quantile(self, q):
+
+        if not self.count:
+            return None
+
+        return self._quantile(self._items(), self.count, q)
+
+
+    def median(self):
+
+        return self.quantile(0.5)
+
+
+    def mean(self):
+
+        return self.total / self.count if self.count else None
+
+
+    def mad(self):
+        """
+        Mediana de las desviaciones absolutas respecto a la mediana.
+        """
+
+        if not self.count:
+            return None
+
+
+        median = self.median()
+
+        deviations = {}
+
+        for value, n in self._items():
+
+            deviation = abs(value - median)
+
+            deviations[deviation] = deviations.get(deviation, 0) + n
+
+
+        return self._quantile(
+            sorted(deviations.items()),
+            self.count,
+            0.5
+        )
+
+
+    def sigma(self):
+        """
+        MAD escalada: estima σ con ruido normal, sin que un
+        outlier aislado la domine.
+        """
+
+        mad = self.mad()
+
+        return 1.4826 * mad if mad is not None else None
+
+
+    def trimmed_mean(self, trim=LATENCY_TRIM):
+        """
+        Media sin la fracción `trim` de cada cola.
+        """
+
+        if not self.count:
+            return None
+
+
+        cut = trim * self.count
+
+        keep = self.count - 2 * cut
+
+        if keep <= 0:
+            return self.median()
+
+
+        seen = 0
+        total = 0.0
+
+        for value, n in self._items():
+
+            #
+            # Parte de la cubeta [seen, seen + n) dentro de [cut, count - cut).
+            #
+
+            weight = (
+                min(seen + n, self.count - cut)
+                - max(seen, cut)
+            )
+
+            if weight > 0:
+                total += value * weight
+
+            seen += n
+
+
+        return total / keep
+
+
+    def summary(self):
+
+        if not self.count:
+            return {"count": 0}
+
+
+        def r(value):
+            return round(value, 4)
+
+
+        return {
+            "count": self.count,
+            "min": r(self.min),
+            "median": r(self.median()),
+            "p90": r(self.quantile(0.90)),
+            "p99": r(self.quantile(0.99)),
+            "max": r(self.max),
+            "mad": r(self.mad()),
+            "trimmed_mean": r(self.trimmed_mean())
+        }
+
+
+# ------------------------ AUTOCALIBRACIÓN -------------------------------
+class LoopbackHandler(BaseHTTPRequestHandler):
+    """
+    Respuesta fija y mínima: el servidor apenas suma tiempo
+    a lo que mide el cliente.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    body = b"x" * 512
+
+
+    def _reply(self, body=True):
+
+        self.send_response(200)
+
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.send_header("Allow", "GET, HEAD, OPTIONS")
+
+        self.end_headers()
+
+        if body:
+            self.wfile.write(self.body)
+
+
+    def do_GET(self):
+        self._reply()
+
+    def do_HEAD(self):
+        self._reply(body=False)
+
+    def do_OPTIONS(self):
+        self._reply()
+
+    def log_message(self, *args):
+        pass
+
+
+class LoopbackServer:
+    """
+    Servidor HTTP en 127.0.0.1 (puerto libre) en un hilo daemon.
+    Sustituto local del target para la calibración.
+    """
+
+    def __init__(self):
+
+        self._server = ThreadingHTTPServer(
+            ("127.0.0.1", 0),
+            LoopbackHandler
+        )
+
+        self._server.daemon_threads = True
+
+        self.url = f"http://127.0.0.1:{self._server.server_port}/"
+
+        threading.Thread(
+            target=self._server.serve_forever,
+            daemon=True
+        ).start()
+
+
+    def close(self):
+
+        self._server.shutdown()
+
+        self._server.server_close()
+
+
+def calibrate(adapter, url, samples=CALIBRATION_SAMPLES, active=0, timeout=TIMEOUT):
+    """
+    Overhead propio por petición contra el servidor loopback `url`.
+
+    Mide lo mismo que una muestra de timing_diff (TTFB vía
+    response.elapsed, mismo adaptador) donde la red y el servidor
+    son despreciables: lo que queda es construcción de la petición,
+    parseo de cabeceras y contención del GIL con la carga actual
+    del proceso (`active` = scans en curso).
+
+    None si no se obtuvo ninguna muestra.
+    """
+
+    session = requests.Session()
+
+    session.trust_env = False
+
+    session.mount("http://", adapter)
+
+
+    overhead = LatencyHistogram()
+
+    errors = 0
+
+    for _ in range(samples):
+
+        try:
+
+            response = session.get(
+                url,
+                timeout=timeout,
+                stream=True
+            )
+
+            dt = response.elapsed.total_seconds()
+
+            response.content
+
+            overhead.record(dt)
+
+        except Exception:
+
+            errors += 1
+
+
+    if not overhead.count:
+        return None
+
+
+    return {
+        "median":
+            overhead.median(),
+
+        "sigma":
+            overhead.sigma(),
+
+        "p90":
+            overhead.quantile(0.90),
+
+        "samples":
+            overhead.count,
+
+        "errors":
+            errors,
+
+        "active_scans":
+            active,
+
+        "measured_at":
+            time.time()
+    }
+
+
+# ------------------------ HTTP SEMANTICS -------------------------------
+def http_semantics(session, url):
+    """
+    Lectura semántica HTTP avanzada.
+
+    Filosofía:
+    - Activo quirúrgico
+    - Pasivo contextual
+    - Sin explotación
+    - Orientado a observación, coherencia y comportamiento
+
+    Analiza:
+    - estabilidad de respuesta
+    - identidad temporal
+    - consistencia semántica
+    - cache behavior
+    - fingerprints operativos
+    """
+
+    responses = []
+    errors = []
+
+    timestamps = []
+
+    # =====================================================
+    # OBSERVACIÓN REPETIDA CONTROLADA
+    # =====================================================
+
+    for _ in range(3):
+        try:
+            start = time.time()
+
+            response = session.get(
+                url,
+                timeout=session.settings["timeout"]
+            )
+
+            elapsed = int(
+                (time.time() - start) * 1000
+            )
+
+            responses.append(response)
+
+            # reintentos y 429/5xx fuera de la latencia
+            if latency_sample(response):
+                timestamps.append(elapsed)
+
+        except Exception as e:
+            errors.append(str(e))
+
+
+    if not responses:
+        raise RuntimeError(
+            "No HTTP responses obtained"
+        )
+
+
+    r1 = responses[0]
+    h = r1.headers
+
+
+    # =====================================================
+    # DERIVA SEMÁNTICA DEL CONTENIDO
+    # =====================================================
+
+    body_hashes = [
+        hash_body(r.text)
+        for r in responses
+    ]
+
+    hash_change = (
+        len(set(body_hashes)) > 1
+    )
+
+
+    body_sizes = [
+        len(r.text)
+        for r in responses
+    ]
+
+
+    size_variation = (
+        max(body_sizes) -
+        min(body_sizes)
+    )
+
+
+    # =====================================================
+    # LATENCIA Y COMPORTAMIENTO
+    # =====================================================
+
+    #
+    # Estadística robusta: una muestra lenta aislada no
+    # mueve la media recortada ni la dispersión (MAD).
+    #
+
+    latency = LatencyHistogram().extend(
+        ms / 1000
+        for ms in timestamps
+    )
+
+    avg_latency = (
+        round(latency.trimmed_mean() * 1000)
+        if timestamps
+        else None
+    )
+
+
+    latency_variance = (
+        max(timestamps) -
+        min(timestamps)
+        if timestamps
+        else 0
+    )
+
+    latency_spread = (
+        round(latency.sigma() * 1000)
+        if timestamps
+        else 0
+    )
+
+
+    # =====================================================
+    # HEAD VS GET
+    # =====================================================
+
+    try:
+
+        r_head = session.head(
+            url,
+            timeout=session.settings["timeout"]
+        )
+
+        head_len = int(
+            r_head.headers.get(
+                "Content-Length",
+                -1
+            )
+        )
+
+        head_mismatch = (
+            head_len != -1
+            and abs(head_len - len(r1.text)) > 128
+        )
+
+
+    except Exception:
+
+        head_mismatch = False
+
+
+
+    # =====================================================
+    # CACHE / DELIVERY SEMANTICS
+    # =====================================================
+
+    etag = h.get("ETag")
+
+    cache_control = (
+        h.get(
+            "Cache-Control",
+            ""
+        )
+    )
+
+    vary = (
+        h.get(
+            "Vary",
+            ""
+        )
+    )
+
+
+    age = h.get("Age")
+
+    cache_signals = {
+
+        "etag_present":
+            bool(etag),
+
+        "cache_control":
+            cache_control,
+
+        "vary_present":
+            bool(vary),
+
+        "age_present":
+            bool(age),
+
+        "cdn_cache_hint":
+            bool(age),
+
+        "cache_ambiguous":
+            (
+                "no-cache" not in cache_control.lower()
+                and
+                "no-store" not in cache_control.lower()
+                and
+                not etag
+            )
+    }
+
+
+
+    # =====================================================
+    # COHERENCIA DE CONTENIDO
+    # =====================================================
+
+    content_type = (
+        h.get(
+            "Content-Type",
+            ""
+        )
+    )
+
+
+    text_sample = (
+        r1.text.strip()[:50]
+    )
+
+
+    semantic_mismatch = (
+
+        "json" in content_type.lower()
+
+        and
+
+        not text_sample.startswith(
+            (
+                "{",
+                "["
+            )
+        )
+    )
+
+
+    # =====================================================
+    # IDENTIDAD OPERATIVA
+    # =====================================================
+
+    server = h.get(
+        "Server"
+    )
+
+    powered = h.get(
+        "X-Powered-By"
+    )
+
+
+    exposure_signals = {
+
+        "server_visible":
+            bool(server),
+
+        "framework_visible":
+            bool(powered),
+
+        "technology_disclosure":
+            bool(
+                server
+                or powered
+            )
+
+    }
+
+
+
+    # =====================================================
+    # LECTURA INVERSA
+    # =====================================================
+
+    behavioral = {
+
+        "dynamic_content":
+            hash_change,
+
+        "unstable_size":
+            size_variation > 512,
+
+        "slow_backend":
+            avg_latency is not None
+            and avg_latency > 2000,
+
+        "response_variance":
+            latency_spread > 250,
+
+        "possible_edge_layer":
+            bool(age)
+            or bool(vary)
+
+    }
+
+
+
+    # =====================================================
+    # RETORNO COMPATIBLE
+    # =====================================================
+
+    return {
+
+        # originales
+        "status":
+            r1.status_code,
+
+        "len":
+            len(r1.text),
+
+        "hash_change":
+            hash_change,
+
+        "etag":
+            bool(etag),
+
+        "cache":
+            cache_control,
+
+
+        # existentes enriquecidos
+
+        "head_mismatch":
+            head_mismatch,
+
+        "semantic_mismatch":
+            semantic_mismatch,
+
+        "cache_signals":
+            cache_signals,
+
+        "vary":
+            vary,
+
+        "errors":
+            errors,
+
+
+        # nuevas capas SOC
+
+        "behavior":
+
+            behavioral,
+
+
+        "performance":
+
+            {
+                "samples":
+                    len(responses),
+
+                "latencies_ms":
+                    timestamps,
+
+                "average_ms":
+                    avg_latency,
+
+                "variance_ms":
+                    latency_variance,
+
+                "median_ms":
+                    round(latency.median() * 1000)
+                    if timestamps
+                    else None,
+
+                "spread_ms":
+                    latency_spread
+            },
+
+
+        "delivery_identity":
+
+            exposure_signals,
+
+
+        "metadata":
+
+            {
+                "body_hashes":
+                    body_hashes,
+
+                "size_variation":
+                    size_variation,
+
+                "content_type":
+                    content_type,
+
+                "age_header":
+                    age
+            }
+
+    }, r1
+
+
+# ------------------------ DOM PROFUNDO --------------------------------
+def dom_deep(html):
+    """
+    Análisis DOM profundo con lectura semántica avanzada.
+
+    Filosofía:
+    - Pasivo
+    - Lectura estructural
+    - Sin ejecución JavaScript
+    - Sin interacción destructiva
+
+    Observa:
+    - arquitectura frontend
+    - exposición de lógica
+    - estado cliente
+    - comunicación web
+    - madurez tecnológica
+    """
+
+    try:
+        soup = BeautifulSoup(
+            html,
+            "html.parser"
+        )
+
+    except Exception:
+
+        return {
+            "scripts": 0,
+            "hidden_inputs": 0,
+            "data_actions": 0,
+            "js_network": False,
+            "signals": [
+                "html_parse_error"
+            ]
+        }
+
+
+    # =====================================================
+    # ELEMENTOS BASE
+    # =====================================================
+
+    scripts = soup.find_all(
+        "script"
+    )
+
+    hidden = soup.select(
+        "input[type=hidden]"
+    )
+
+    actions = soup.find_all(
+        attrs={
+            "data-action": True
+        }
+    )
+
+
+    forms = soup.find_all(
+        "form"
+    )
+
+
+    links = soup.find_all(
+        "a",
+        href=True
+    )
+
+
+    # =====================================================
+    # JAVASCRIPT REAL
+    # =====================================================
+
+    inline_js = [
+
+        s.string
+
+        for s in scripts
+
+        if s.string
+        and len(s.string.strip()) > 40
+
+    ]
+
+
+    external_scripts = [
+
+        s.get("src")
+
+        for s in scripts
+
+        if s.get("src")
+
+    ]
+
+
+    # =====================================================
+    # COMUNICACIÓN CLIENTE ↔ SERVIDOR
+    # =====================================================
+
+    network_patterns = (
+
+        "fetch(",
+        "axios",
+        "XMLHttpRequest",
+        "WebSocket",
+        ".send(",
+        "navigator.sendBeacon",
+        "graphql",
+        "/api/",
+        "socket.io"
+    )
+
+
+    js_network = any(
+
+        pattern in js
+
+        for js in inline_js
+
+        for pattern in network_patterns
+
+    )
+
+
+    # =====================================================
+    # FRAMEWORK INTELLIGENCE
+    # =====================================================
+
+    framework_hints = {
+
+        "react":
+
+            bool(
+                soup.find(
+                    attrs={
+                        "data-reactroot": True
+                    }
+                )
+            )
+
+            or
+
+            "__REACT_DEVTOOLS_GLOBAL_HOOK__"
+            in html,
+
+
+        "vue":
+
+            "data-v-" in html
+
+            or
+
+            "__VUE_DEVTOOLS_GLOBAL_HOOK__"
+            in html,
+
+
+        "angular":
+
+            "ng-version" in html
+
+            or
+
+            "angular.module"
+            in html,
+
+
+        "next":
+
+            "__NEXT_DATA__"
+            in html,
+
+
+        "svelte":
+
+            "svelte"
+            in html.lower()
+
+    }
+
+
+    spa_detected = any(
+        framework_hints.values()
+    )
+
+
+    # =====================================================
+    # ESTADO OCULTO
+    # =====================================================
+
+    hidden_sensitive = [
+
+        i.get("name","").lower()
+
+        for i in hidden
+
+        if any(
+
+            key in (
+
+                i.get("name","")
+                +
+                i.get("id","")
+
+            ).lower()
+
+            for key in (
+
+                "token",
+                "csrf",
+                "auth",
+                "session",
+                "state",
+                "nonce"
+
+            )
+
+        )
+
+    ]
+
+
+    # =====================================================
+    # INTERACTIVIDAD CLIENTE
+    # =====================================================
+
+    event_attrs = sum(
+
+        1
+
+        for tag in soup.find_all()
+
+        for attr in tag.attrs
+
+        if attr.startswith("on")
+
+    )
+
+
+    # =====================================================
+    # RECURSOS EXTERNOS
+    # =====================================================
+
+    external_domains = []
+
+    for src in external_scripts:
+
+        if src:
+
+            external_domains.append(
+                src.split("/")[2]
+                if "//" in src
+                else src
+            )
+
+
+    # =====================================================
+    # DENSIDAD FRONTEND
+    # =====================================================
+
+    dom_complexity = {
+
+        "html_size":
+
+            len(html),
+
+
+        "tag_count":
+
+            len(
+                soup.find_all()
+            ),
+
+
+        "script_ratio":
+
+            len(scripts)
+            /
+            max(
+                len(soup.find_all()),
+                1
+            )
+
+    }
+
+
+
+    # =====================================================
+    # SEÑALES INTERPRETADAS
+    # =====================================================
+
+    signals = []
+
+
+    if js_network:
+        signals.append(
+            "active_js_network"
+        )
+
+
+    if spa_detected:
+        signals.append(
+            "spa_frontend"
+        )
+
+
+    if hidden_sensitive:
+        signals.append(
+            "hidden_state_tokens"
+        )
+
+
+    if event_attrs > 20:
+        signals.append(
+            "high_client_interactivity"
+        )
+
+
+    if len(external_scripts) > len(inline_js):
+        signals.append(
+            "logic_externalized"
+        )
+
+
+    if len(forms) > 5:
+        signals.append(
+            "form_heavy_application"
+        )
+
+
+    if len(external_domains) > 5:
+        signals.append(
+            "third_party_dependency_heavy"
+        )
+
+
+
+    # =====================================================
+    # LECTURA INVERSA
+    # =====================================================
+
+    architecture = {
+
+        "client_heavy":
+
+            len(scripts)
+            >
+            len(forms),
+
+
+        "backend_hidden":
+
+            js_network
+            and spa_detected,
+
+
+        "simple_site":
+
+            len(scripts) < 3
+            and not spa_detected,
+
+
+        "complex_frontend":
+
+            len(scripts) > 10
+            or event_attrs > 30
+
+    }
+
+
+
+    # =====================================================
+    # RETORNO COMPATIBLE
+    # =====================================================
+
+    return {
+
+        # originales
+
+        "scripts":
+            len(scripts),
+
+        "hidden_inputs":
+            len(hidden),
+
+        "data_actions":
+            len(actions),
+
+        "js_network":
+            js_network,
+
+
+        # profundidad añadida
+
+        "inline_js_blocks":
+            len(inline_js),
+
+        "external_scripts":
+            len(external_scripts),
+
+        "hidden_sensitive":
+            hidden_sensitive,
+
+        "event_handlers":
+            event_attrs,
+
+        "framework_hints":
+            framework_hints,
+
+        "signals":
+            signals,
+
+
+        # nueva lectura SOC
+
+        "forms":
+            len(forms),
+
+
+        "external_domains":
+            external_domains,
+
+
+        "dom_complexity":
+            dom_complexity,
+
+
+        "architecture":
+
+            architecture,
+
+
+        "meta":
+
+            {
+                "analysis":
+                    "passive_dom_semantics",
+
+                "execution":
+                    False,
+
+                "correlation_ready":
+                    True
+
+            }
+
+    }
+
+# ------------------------ CADENA DE REDIRECCIONES ---------------------------
+def resolve_redirects(session, url, max_hops=REDIRECT_MAX_HOPS):
+    """
+    Resuelve la cadena de redirecciones de `url` salto a salto.
+
+    Cada salto: estado, Location y latencia hasta cabeceras.
+    Solo se leen cabeceras (stream), el cuerpo no se descarga.
+
+    Las fases posteriores apuntan a `final_url` directamente:
+    sus muestras ya no mezclan saltos con la respuesta final.
+    """
+
+    chain = []
+
+    seen = set()
+
+    current = url
+
+    loop = False
+
+
+    for _ in range(max_hops + 1):
+
+        seen.add(current)
+
+        response = session.get(
+            current,
+            timeout=session.settings["timeout"],
+            allow_redirects=False,
+            stream=True
+        )
+
+        response.close()
+
+
+        location = response.headers.get("Location")
+
+        hop = {
+            "url": current,
+            "status": response.status_code,
+            "location": (
+                urljoin(current, location)
+                if response.is_redirect and location
+                else None
+            ),
+            "latency": round(
+                response.elapsed.total_seconds(),
+                4
+            )
+        }
+
+        chain.append(hop)
+
+
+        if not hop["location"]:
+            break
+
+        if hop["location"] in seen:
+
+            loop = True
+
+            break
+
+        current = hop["location"]
+
+
+    return {
+        "final_url": current,
+        "hops": len(chain) - 1,
+        "chain": chain,
+        "loop": loop,
+        "redirect_latency": round(
+            sum(hop["latency"] for hop in chain[:-1]),
+            4
+        )
+    }
+
+
+# ------------------------ BASELINE DE HOST ---------------------------
+def host_key(url):
+    """
+    Identidad de host para caches por ejecución.
+
+    Esquema + netloc normalizados:
+    dos rutas del mismo origen comparten clave.
+    """
+
+    parsed = urlparse(url)
+
+    return (
+        f"{parsed.scheme.lower()}://"
+        f"{parsed.netloc.lower()}"
+    )
+
+
+def measure_host_baseline(session, url):
+    """
+    Línea base temporal del host.
+
+    Mide una sola vez lo que todas las rutas comparten:
+    - RTT de conexión TCP
+    - handshake TLS
+    - distribución de latencia del edge (HEAD a la raíz)
+
+    Las rutas individuales se leen después como
+    delta sobre esta base.
+
+    Sin muestras del edge devuelve None (no se cachea).
+    """
+
+    parsed = urlparse(url)
+
+    root = urlunparse((
+        parsed.scheme,
+        parsed.netloc,
+        "/",
+        "",
+        "",
+        ""
+    ))
+
+
+    # =====================================================
+    # RTT + TLS
+    # =====================================================
+
+    #
+    # Un HEAD por una conexión nueva (adaptador propio, sin
+    # reanudación TLS): pasa por breaker, cuota, allowlist y
+    # contabilidad como cualquier petición. La dirección sale
+    # de la DNSCache, fuera del tiempo de connect.
+    #
+
+    connect = None
+    tls = None
+
+    probe = DNSCacheAdapter(
+        session.scanner.dns,
+        max_retries=0
+    )
+
+    child = session.fork(probe)
+
+    try:
+
+        response = child.head(
+            root,
+            timeout=session.settings["timeout"]
+        )
+
+        timing = response.connect_timing or {}
+
+        connect = timing.get("tcp")
+
+        tls = timing.get("tls")
+
+    except Exception:
+
+        pass
+
+    finally:
+
+        session.join(child)
+
+        probe.close()
+
+
+
+    # =====================================================
+    # DISTRIBUCIÓN DEL EDGE
+    # =====================================================
+
+    #
+    # TTFB (response.elapsed), como las muestras de timing_diff
+    # que se comparan con esta base; reintentos y 429/5xx fuera.
+    #
+
+    edge = []
+    errors = 0
+    discarded = 0
+
+    for _ in range(session.settings["baseline_samples"]):
+
+        try:
+
+            response = session.head(
+                root,
+                timeout=session.settings["timeout"]
+            )
+
+        except Exception:
+
+            errors += 1
+
+            continue
+
+
+        dt = response.elapsed.total_seconds()
+
+        if (
+            0 < dt < session.settings["timeout"]
+            and latency_sample(response)
+        ):
+            edge.append(dt)
+
+        else:
+            discarded += 1
+
+
+    if not edge:
+
+        return None
+
+
+    ordered = sorted(edge)
+
+    return {
+
+        "host":
+            host_key(url),
+
+        "connect":
+            round(connect, 3) if connect is not None else None,
+
+        "tls":
+            round(tls, 3) if tls is not None else None,
+
+        "edge":
+
+            {
+                "median":
+                    round(statistics.median(ordered), 3),
+
+                "min":
+                    round(ordered[0], 3),
+
+                "p90":
+                    round(ordered[int(0.9 * (len(ordered) - 1))], 3),
+
+                "stdev":
+                    round(statistics.pstdev(ordered), 3),
+
+                "samples":
+                    len(ordered),
+
+                "errors":
+                    errors,
+
+                "discarded":
+                    discarded
+            },
+
+        "measured_at":
+            time.time()
+    }
+
+
+def host_baseline(session, url):
+    """
+    Línea base del host, medida una vez por Scanner.
+
+    El primer scan de un host la mide;
+    los siguientes la reutilizan desde cache.
+    """
+
+    return session.scanner.baseline(session, url)
+
+
+# ------------------------ TIMING DIFERENCIAL (ADVANCED) ---------------------------
+def timing_diff(session, url, baseline=None):
+    """
+    Análisis temporal diferencial GET / HEAD / OPTIONS.
+
+    Muestreo en rondas intercaladas (orden aleatorio por ronda);
+    method_gap sale de las diferencias pareadas GET − OPTIONS.
+
+    Latencias por método en LatencyHistogram: medias recortadas,
+    jitter = MAD escalada; el Scanner funde los histogramas de
+    la misma URL entre scans (`history`).
+
+    El overhead propio del cliente (Scanner.calibration) se resta
+    del jitter y se reporta junto a las latencias (`client_overhead`):
+    jitter_high refleja al target, no la carga del worker.
+
+    Con `backend_timing` y varias direcciones, cada backend se mide
+    aparte (`backends`, ver backend_timing) junto a las cifras
+    mezcladas; un pool heterogéneo añade heterogeneous_pool.
+
+    Server-Timing se lee en cada muestra, sin peticiones extra:
+    `server_timing` agrega por métrica mediana, p95 y peso sobre
+    el TTFB de las muestras que la traen.
+
+    Lectura forense de comportamiento HTTP.
+
+    Filosofía:
+    - activo controlado
+    - no intrusivo
+    - orientado a señales
+    - sin explotación
+
+    Observa:
+    - diferencias entre métodos
+    - estabilidad temporal
+    - posibles capas intermedias
+    - coherencia del backend
+
+    Con `baseline` (ver host_baseline) la ruta solo necesita
+    unas pocas muestras: la latencia se reporta como delta
+    sobre la base del host.
+
+    Cada muestra es un probe TTFB: la petición va en streaming
+    y el tiempo se para al llegar las cabeceras (tiempo de
+    respuesta del servidor, sin ancho de banda). Después,
+    según `ttfb_body_policy`:
+
+        drain → se descarga el cuerpo (conexión reutilizable)
+        close → se cierra la conexión sin descargarlo
+        auto  → se lee hasta ttfb_drain_limit bytes (también cuerpos
+                chunked sin Content-Length); si el cuerpo cabe, la
+                conexión se reutiliza, si no se cierra
+
+    Tras cerrar, un HEAD sin medir recalienta la conexión
+    (`download.rewarmed`): la muestra siguiente no paga handshake.
+
+    get_avg, jitter y gap salen del TTFB; la descarga completa
+    de las muestras drenadas se reporta aparte (`download`).
+
+    Una muestra que abrió conexión nueva (handshake TCP/TLS en su
+    TTFB) queda fuera de la estadística si el servidor mantiene
+    keep-alive; si no lo mantiene, se conserva y se marca
+    (`connections.reused=False`).
+    """
+
+    samples = (
+        session.settings["path_timing_samples"]
+        if baseline
+        else session.settings["timing_samples"]
+    )
+
+    policy = session.settings["ttfb_body_policy"]
+
+    drain_limit = session.settings["ttfb_drain_limit"]
+
+
+    loads = []
+
+    downloads = {
+        "drained": 0,
+        "closed": 0,
+        "rewarmed": 0,
+        "get": []
+    }
+
+    server_timing = []
+
+
+    def finish_body(method, response, t0):
+        """
+        Política de cuerpo tras el TTFB.
+        """
+
+        #
+        # HEAD no tiene cuerpo: drenar es gratis y conserva la conexión.
+        #
+
+        if policy == "drain" or method == "HEAD":
+
+            response.content
+
+        elif policy == "close" or not drain_body(response, drain_limit):
+
+            response.close()
+
+            downloads["closed"] += 1
+
+            #
+            # El cierre es nuestro: sin recalentar, la muestra
+            # siguiente llevaría handshake y caería por drop_fresh.
+            # Un HEAD sin medir abre la conexión nueva.
+            # (handshake None: h2, el cierre no toca la conexión.)
+            #
+
+            if response.handshake is not None:
+
+                try:
+
+                    session.head(
+                        url,
+                        timeout=session.settings["timeout"]
+                    )
+
+                    downloads["rewarmed"] += 1
+
+                except Exception:
+
+                    pass
+
+            return
+
+
+        downloads["drained"] += 1
+
+        if method == "GET":
+            downloads["get"].append(time.time() - t0)
+
+
+    def sample(method):
+        """
+        Una muestra TTFB: (segundos | None, intentos, conexión nueva).
+        None si falló o quedó fuera del filtro de ruido.
+        """
+
+        t0 = time.time()
+
+        response = session.request(
+            method,
+            url,
+            timeout=session.settings["timeout"],
+            stream=True
+        )
+
+        #
+        # TTFB: envío → cabeceras parseadas.
+        #
+
+        dt = response.elapsed.total_seconds()
+
+        finish_body(method, response, t0)
+
+        tries = getattr(response, "attempts", 1)
+
+        #
+        # handshake None: transporte sin esa información (h2).
+        #
+
+        fresh = response.handshake not in (None, "keepalive")
+
+        loads.append(
+            getattr(response, "in_flight", 1)
+        )
+
+
+        # =========================
+        # FILTRO SUAVE DE RUIDO
+        # =========================
+
+        #
+        # Una muestra reintentada incluye backoff, y un 429/503
+        # diferido no es latencia del backend: fuera de la estadística.
+        #
+
+        if (
+            0 < dt < session.settings["timeout"]
+            and latency_sample(response)
+        ):
+
+            metrics = parse_server_timing(
+                response.headers.get("Server-Timing")
+            )
+
+            if metrics:
+                server_timing.append((dt, metrics))
+
+            return dt, tries, fresh
+
+        return None, tries, fresh
+
+
+
+    # =====================================================
+    # WARM-UP
+    # =====================================================
+
+    #
+    # Con base de host la conexión ya llega caliente
+    # (fase HTTP y medición de la base).
+    #
+
+    if not baseline:
+
+        try:
+
+            session.get(
+                url,
+                timeout=session.settings["timeout"]
+            )
+
+        except Exception:
+
+            pass
+
+
+
+    # =====================================================
+    # MEDICIÓN MULTIMÉTODO (RONDAS INTERCALADAS)
+    # =====================================================
+
+    #
+    # Cada ronda mide GET, HEAD y OPTIONS una vez, en orden
+    # aleatorio y sobre la misma conexión: la deriva durante
+    # el muestreo afecta a los tres métodos por igual y se
+    # cancela en las diferencias pareadas por ronda.
+    #
+
+    methods = ("GET", "HEAD", "OPTIONS")
+
+    rounds = []
+
+    errors = dict.fromkeys(methods, 0)
+
+    tries_by_method = {method: [] for method in methods}
+
+    fresh = dict.fromkeys(methods, 0)
+
+    fresh_rounds = []
+
+    reused = 0
+
+
+    for _ in range(samples):
+
+        order = random.sample(methods, len(methods))
+
+        current = {}
+
+        current_fresh = set()
+
+        for method in order:
+
+            try:
+
+                current[method], tries, new_connection = sample(method)
+
+                tries_by_method[method].append(tries)
+
+            except Exception:
+
+                current[method] = None
+
+                errors[method] += 1
+
+                continue
+
+
+            if new_connection:
+
+                fresh[method] += 1
+
+                current_fresh.add(method)
+
+            else:
+
+                reused += 1
+
+
+        rounds.append(current)
+
+        fresh_rounds.append(current_fresh)
+
+
+    #
+    # Con keep-alive, una muestra con handshake en su TTFB no
+    # es comparable con las demás: fuera (también de las pareadas).
+    #
+
+    drop_fresh = reused > 0
+
+    if drop_fresh:
+
+        for current, current_fresh in zip(rounds, fresh_rounds):
+
+            for method in current_fresh:
+                current[method] = None
+
+
+    def series(method):
+
+        return [
+            r[method]
+            for r in rounds
+            if r[method] is not None
+        ]
+
+
+    g, h, o = (
+        series(method)
+        for method in methods
+    )
+
+    hists = {
+        method.lower(): LatencyHistogram().extend(series(method))
+        for method in methods
+    }
+
+    g_errors, h_errors, o_errors = (
+        errors[method]
+        for method in methods
+    )
+
+    g_attempts, h_attempts, o_attempts = (
+        tries_by_method[method]
+        for method in methods
+    )
+
+
+    def paired(a, b):
+        """
+        Diferencias a − b por ronda (solo rondas con ambas muestras).
+        """
+
+        diffs = [
+            r[a] - r[b]
+            for r in rounds
+            if r[a] is not None and r[b] is not None
+        ]
+
+        if not diffs:
+            return None
+
+
+        mean = statistics.mean(diffs)
+
+        stdev = (
+            statistics.stdev(diffs)
+            if len(diffs) > 1
+            else 0.0
+        )
+
+        #
+        # t pareado: media / error estándar de la media.
+        #
+
+        t = (
+            mean / (stdev / math.sqrt(len(diffs)))
+            if stdev
+            else None
+        )
+
+        return {
+            "rounds": len(diffs),
+            "mean": round(mean, 4),
+            "median": round(statistics.median(diffs), 4),
+            "stdev": round(stdev, 4),
+            "t": round(t, 2) if t is not None else None,
+            "t_critical": t_critical(len(diffs) - 1)
+        }
+
+
+    pairs = {
+
+        "get_minus_options":
+            paired("GET", "OPTIONS"),
+
+        "get_minus_head":
+            paired("GET", "HEAD")
+    }
+
+
+
+    attempts = {
+
+        "get":
+            g_attempts,
+
+        "head":
+            h_attempts,
+
+        "options":
+            o_attempts
+    }
+
+    retried = {
+        method: sum(1 for a in counts if a > 1)
+        for method, counts in attempts.items()
+    }
+
+
+
+    # =====================================================
+    # FALLBACK SEGURO
+    # =====================================================
+
+    if not g or not o:
+
+        return {
+
+            "get_avg": None,
+
+            "head_avg": None,
+
+            "opt_avg": None,
+
+            "jitter": None,
+
+            "jitter_high": False,
+
+            "method_gap": False,
+
+            "attempts": attempts,
+
+            "retried": retried,
+
+            "signals": [
+                "insufficient_samples"
+            ]
+
+        }
+
+
+
+    # =====================================================
+    # MÉTRICAS BASE
+    # =====================================================
+
+    #
+    # Medias recortadas y jitter robusto (MAD escalada):
+    # un outlier aislado no dispara timing_instability.
+    #
+
+    get_avg = hists["get"].trimmed_mean()
+
+    opt_avg = hists["options"].trimmed_mean()
+
+    head_avg = (
+        hists["head"].trimmed_mean()
+        if h
+        else 0
+    )
+
+
+    jitter = (
+
+        hists["get"].sigma()
+
+        if len(g) > 1
+
+        else 0
+
+    )
+
+
+    #
+    # Overhead del cliente: con varianzas independientes,
+    # σ²(medida) = σ²(target) + σ²(cliente).
+    #
+
+    calibration = session.scanner.calibration()
+
+    jitter_raw = jitter
+
+    if calibration:
+
+        jitter = math.sqrt(
+            max(0.0, jitter ** 2 - calibration["sigma"] ** 2)
+        )
+
+
+    #
+    # Gap GET–OPTIONS: media de las diferencias pareadas por ronda.
+    # Es gap de método solo si supera el umbral y la t pareada
+    # lo distingue del ruido entre rondas (t crítica al 95 % para
+    # rondas − 1 grados de libertad: con 3 rondas, 4.30).
+    #
+    # Con menos de 2 rondas pareadas no hay contraste posible:
+    # el gap queda como no concluyente, no como señal.
+    #
+
+    gap_pairs = pairs["get_minus_options"]
+
+    gap = abs(
+        gap_pairs["mean"]
+        if gap_pairs
+        else get_avg - opt_avg
+    )
+
+    testable = (
+        gap_pairs is not None
+        and gap_pairs["rounds"] >= 2
+    )
+
+    method_gap = (
+        gap > METHOD_GAP_THRESHOLD
+        and testable
+        and (
+            gap_pairs["t"] is None
+            or abs(gap_pairs["t"]) >= gap_pairs["t_critical"]
+        )
+    )
+
+    gap_inconclusive = (
+        gap > METHOD_GAP_THRESHOLD
+        and not testable
+    )
+
+
+
+    edge = (
+        baseline["edge"]["median"]
+        if baseline
+        else 0
+    )
+
+
+
+    # =====================================================
+    # DISPERSIÓN TEMPORAL
+    # =====================================================
+
+    get_range = (
+
+        max(g) -
+        min(g)
+
+        if g
+
+        else 0
+
+    )
+
+    #
+    # Rango intercuartílico: dispersión sin las colas.
+    #
+
+    get_iqr = (
+        hists["get"].quantile(0.75)
+        - hists["get"].quantile(0.25)
+    )
+
+
+    method_latency = {
+
+        "GET_vs_HEAD":
+
+            abs(
+                get_avg -
+                head_avg
+            )
+            if head_avg
+            else None,
+
+
+        "GET_vs_OPTIONS":
+
+            gap
+
+    }
+
+
+
+    # =====================================================
+    # LECTURA SEMÁNTICA
+    # =====================================================
+
+    signals = []
+
+
+    if jitter > session.settings["jitter_threshold"]:
+
+        signals.append(
+            "timing_instability"
+        )
+
+
+    if method_gap:
+
+        signals.append(
+            "method_processing_gap"
+        )
+
+    elif gap_inconclusive:
+
+        signals.append(
+            "method_gap_inconclusive"
+        )
+
+
+    if (
+        head_avg
+        and
+        head_avg < get_avg * 0.5
+    ):
+
+        signals.append(
+            "head_optimized"
+        )
+
+
+    if opt_avg > get_avg * 1.3:
+
+        signals.append(
+            "options_heavy_logic"
+        )
+
+
+    if (
+        jitter < 0.15
+        and
+        gap < 0.2
+    ):
+
+        signals.append(
+            "uniform_backend_path"
+        )
+
+
+
+    # =====================================================
+    # NUEVAS SEÑALES SOC
+    # =====================================================
+
+    behavior = {
+
+        "stable_response":
+
+            jitter < session.settings["jitter_threshold"],
+
+
+        "high_variance":
+
+            get_iqr > 0.5,
+
+
+        "method_divergence":
+
+            method_gap,
+
+
+        "possible_cache_layer":
+
+            (
+                head_avg
+                and
+                head_avg < get_avg * 0.5
+            ),
+
+
+        "backend_consistent":
+
+            (
+                jitter < 0.15
+                and
+                gap < 0.2
+            )
+
+    }
+
+
+
+    # =====================================================
+    # PERFIL TEMPORAL
+    # =====================================================
+
+    if (
+        jitter < 0.15
+        and gap < 0.2
+    ):
+
+        profile = "predictable"
+
+
+    elif jitter > session.settings["jitter_threshold"]:
+
+        profile = "dynamic"
+
+
+    else:
+
+        profile = "mixed"
+
+
+
+    # =====================================================
+    # SERVER-TIMING
+    # =====================================================
+
+    #
+    # Por métrica: duración declarada (ms) y su peso sobre el TTFB
+    # de las muestras que la traen. Las métricas pueden solaparse
+    # (p. ej. "total"): los pesos no tienen por qué sumar 1.
+    #
+
+    breakdown = None
+
+    if server_timing:
+
+        durations = {}
+        ttfb = {}
+        descs = {}
+
+        for dt, metrics in server_timing:
+
+            #
+            # Una métrica repetida en la misma respuesta suma.
+            #
+
+            sample_durations = {}
+
+            for metric in metrics:
+
+                name = metric["name"]
+
+                descs.setdefault(name, metric["desc"])
+
+                if metric["dur"] is not None and metric["dur"] >= 0:
+                    sample_durations[name] = (
+                        sample_durations.get(name, 0.0) + metric["dur"]
+                    )
+
+
+            for name, dur in sample_durations.items():
+
+                durations.setdefault(name, LatencyHistogram()).record(dur / 1000)
+
+                ttfb[name] = ttfb.get(name, 0.0) + dt
+
+
+        breakdown = {
+
+            "samples":
+                len(server_timing),
+
+            "metrics":
+
+                {
+                    name: {
+                        "count":
+                            hist.count,
+
+                        "median_ms":
+                            round(hist.median() * 1000, 2),
+
+                        "p95_ms":
+                            round(hist.quantile(0.95) * 1000, 2),
+
+                        "share":
+                            round(hist.total / ttfb[name], 3)
+                            if ttfb[name]
+                            else None,
+
+                        "desc":
+                            descs.get(name)
+                    }
+
+                    for name, hist in sorted(durations.items())
+                },
+
+            "names":
+                sorted(descs)
+        }
+
+
+
+    # =====================================================
+    # BACKENDS DEL POOL
+    # =====================================================
+
+    backends = (
+        backend_timing(session, url)
+        if session.settings["backend_timing"]
+        else None
+    )
+
+    if backends and backends["heterogeneous_pool"]:
+
+        signals.append(
+            "heterogeneous_pool"
+        )
+
+
+
+    # =====================================================
+    # RETORNO COMPATIBLE
+    # =====================================================
+
+    return {
+
+
+        # originales
+
+        "get_avg":
+            round(get_avg, 3),
+
+
+        "head_avg":
+            round(head_avg, 3),
+
+
+        "opt_avg":
+            round(opt_avg, 3),
+
+
+        "jitter":
+            round(jitter, 3),
+
+
+        "jitter_raw":
+            round(jitter_raw, 3),
+
+
+        "jitter_high":
+            jitter > session.settings["jitter_threshold"],
+
+
+        "client_overhead":
+
+            {
+                "median":
+                    round(calibration["median"], 4),
+
+                "sigma":
+                    round(calibration["sigma"], 4),
+
+                "p90":
+                    round(calibration["p90"], 4),
+
+                "active_scans":
+                    calibration["active_scans"],
+
+                "age_sec":
+                    round(time.time() - calibration["measured_at"], 1),
+
+                "get_avg_net":
+                    round(max(0.0, get_avg - calibration["median"]), 3)
+            }
+
+            if calibration
+
+            else None,
+
+
+        "method_gap":
+            method_gap,
+
+
+        "paired":
+
+            dict(
+                pairs,
+                schedule="interleaved_random",
+                rounds=len(rounds)
+            ),
+
+
+        #
+        # Muestras que abrieron conexión (handshake en el TTFB).
+        #
+
+        "connections":
+
+            {
+                "new": {
+                    method.lower(): n
+                    for method, n in fresh.items()
+                },
+
+                "reused": drop_fresh,
+
+                "dropped": (
+                    sum(fresh.values())
+                    if drop_fresh
+                    else 0
+                )
+            },
+
+
+
+        "samples":
+
+            {
+
+                "get":
+                    len(g),
+
+
+                "head":
+                    len(h),
+
+
+                "options":
+                    len(o)
+
+            },
+
+
+        #
+        # Distribución por método y acumulado de la URL en el Scanner.
+        #
+
+        "robust":
+
+            {
+                method: hist.summary()
+                for method, hist in hists.items()
+            },
+
+
+        "histograms":
+
+            {
+                method: hist.to_dict()
+                for method, hist in hists.items()
+            },
+
+
+        "history":
+
+            session.scanner.record_latency(url, hists),
+
+
+        "backends":
+
+            backends,
+
+
+        "server_timing":
+
+            breakdown,
+
+
+        "signals":
+            signals,
+
+
+        "attempts":
+            attempts,
+
+
+        "retried":
+            retried,
+
+
+        #
+        # Métricas de arriba: TTFB. Descarga completa, aparte.
+        #
+
+        "download":
+
+            {
+                "policy":
+                    policy,
+
+                "get_avg":
+                    (
+                        round(statistics.mean(downloads["get"]), 3)
+                        if downloads["get"]
+                        else None
+                    ),
+
+                "drained":
+                    downloads["drained"],
+
+                "closed":
+                    downloads["closed"],
+
+                "rewarmed":
+                    downloads["rewarmed"]
+            },
+
+
+        #
+        # Carga propia durante el muestreo: muestras emitidas con
+        # otras peticiones nuestras en vuelo contra el mismo host.
+        #
+
+        "scanner_load":
+
+            {
+                "max_in_flight":
+                    max(loads, default=0),
+
+                "concurrent_samples":
+                    sum(1 for n in loads if n > 1)
+            },
+
+
+
+        # nuevas capas
+
+        "statistics":
+
+            {
+
+                "get_range":
+                    round(get_range, 3),
+
+
+                "get_iqr":
+                    round(get_iqr, 3),
+
+
+                "method_latency":
+
+                    method_latency
+
+            },
+
+
+        "errors":
+
+            {
+
+                "get":
+                    g_errors,
+
+
+                "head":
+                    h_errors,
+
+
+                "options":
+                    o_errors
+
+            },
+
+
+        "behavior":
+
+            behavior,
+
+
+        "profile":
+
+            profile,
+
+
+        "baseline":
+
+            baseline,
+
+
+        "delta_vs_baseline":
+
+            {
+
+                "get":
+                    round(get_avg - edge, 3),
+
+
+                "head":
+                    round(head_avg - edge, 3)
+                    if head_avg
+                    else None,
+
+
+                "options":
+                    round(opt_avg - edge, 3)
+
+            }
+
+            if baseline
+
+            else None,
+
+
+        "meta":
+
+            {
+
+                "analysis":
+                    "http_timing_behavior",
+
+
+                "correlation_ready":
+                    True,
+
+
+                "execution":
+                    "controlled"
+
+            }
+
+    }
+# ------------------------ TIMING POR BACKEND ---------------------------
+def backend_timing(session, url):
+    """
+    Latencia por dirección del host (opt-in: `backend_timing`).
+
+    Resuelve todos los A/AAAA (hasta BACKEND_MAX_ADDRESSES) y mide
+    cada dirección en paralelo, con conexiones fijadas a ella
+    (Scanner.pinned): `backend_samples` GET TTFB tras un warm-up.
+
+    heterogeneous_pool → la mediana del backend más lento supera
+    BACKEND_SPREAD_FACTOR × la del más rápido y la diferencia
+    sale del ruido de ambos (2 × MAD escalada). Un jitter alto
+    puede ser entonces un nodo lento, no el backend entero.
+
+    None si el host tiene una sola dirección.
+    """
+
+    host = urlparse(url).hostname
+
+    try:
+        addresses = session.scanner.dns.resolve(host)
+
+    except OSError:
+        return None
+
+
+    if len(addresses) < 2:
+        return None
+
+
+    addresses = addresses[:BACKEND_MAX_ADDRESSES]
+
+    samples = session.settings["backend_samples"]
+
+    drain_limit = session.settings["ttfb_drain_limit"]
+
+
+    def measure(address):
+
+        child = session.fork(
+            session.scanner.pinned(address)
+        )
+
+        latency = LatencyHistogram()
+
+        errors = 0
+
+        try:
+
+            #
+            # Warm-up: conexión (TCP/TLS) fuera de la muestra.
+            #
+
+            try:
+                child.get(url, timeout=session.settings["timeout"])
+
+            except Exception:
+                errors += 1
+
+
+            for _ in range(samples):
+
+                try:
+
+                    response = child.get(
+                        url,
+                        timeout=session.settings["timeout"],
+                        stream=True
+                    )
+
+                    dt = response.elapsed.total_seconds()
+
+                    drain_body(response, drain_limit)
+
+
+                    if latency_sample(response):
+                        latency.record(dt)
+
+                except Exception:
+
+                    errors += 1
+
+        finally:
+
+            session.join(child)
+
+
+        return latency, errors
+
+
+    with ThreadPoolExecutor(max_workers=len(addresses)) as pool:
+
+        results = dict(zip(
+            addresses,
+            pool.map(measure, addresses)
+        ))
+
+
+
+    # =====================================================
+    # COMPARACIÓN ENTRE BACKENDS
+    # =====================================================
+
+    blended = LatencyHistogram()
+
+    backends = {}
+
+    for address, (latency, errors) in results.items():
+
+        blended.merge(latency)
+
+        backends[address] = dict(
+            latency.summary(),
+            sigma=(
+                round(latency.sigma(), 4)
+                if latency.count
+                else None
+            ),
+            errors=errors
+        )
+
+
+    measured = {
+        address: latency
+        for address, (latency, _) in results.items()
+        if latency.count
+    }
+
+    heterogeneous = False
+
+    slowest = fastest = None
+
+    if len(measured) >= 2:
+
+        slowest = max(measured, key=lambda a: measured[a].median())
+        fastest = min(measured, key=lambda a: measured[a].median())
+
+        slow = measured[slowest]
+        fast = measured[fastest]
+
+        heterogeneous = (
+            slow.median() > fast.median() * BACKEND_SPREAD_FACTOR
+            and slow.median() - fast.median()
+            > 2 * max(slow.sigma(), fast.sigma())
+        )
+
+
+    return {
+
+        "addresses":
+            addresses,
+
+        "backends":
+            backends,
+
+        "blended":
+            blended.summary(),
+
+        "slowest":
+            slowest,
+
+        "fastest":
+            fastest,
+
+        "heterogeneous_pool":
+            heterogeneous
+    }
+
+
+# ------------------------ CURVA DE CARGA ---------------------------
+def load_curve(session, url):
+    """
+    Curva latencia / concurrencia (fase opt-in: `load_curve`).
+
+    Ráfagas cortas de GET simultáneos a niveles crecientes
+    (`load_levels`, por defecto 1, 2, 4, 8), `load_bursts`
+    ráfagas por nivel, con tope duro `load_request_budget`:
+    un nivel que no cabe entero en el tope no se lanza.
+    Sin reintentos (sesión en `burst`): una petición por sonda.
+
+    La escalada se detiene en el primer nivel con errores
+    o respuestas 429/5xx: no se empuja a un backend saturado.
+
+    Por nivel: mediana / p90 del TTFB y throughput (respuestas
+    por segundo de ráfaga). Sobre la curva:
+
+        queueing_onset        → primer nivel cuya mediana supera
+                                LOAD_ONSET_FACTOR × la del nivel 1
+        throughput_saturation → primer nivel en que doblar la
+                                concurrencia no multiplica el
+                                throughput por LOAD_SATURATION_GAIN
+
+    Un Retry-After provocado por la ráfaga no difiere el scan:
+    se reporta aquí (`retry_after`) y la escalada se detiene.
+    """
+
+    settings = session.settings
+
+    levels = sorted(settings["load_levels"])
+
+    bursts = settings["load_bursts"]
+
+    budget = settings["load_request_budget"]
+
+    drain_limit = settings["ttfb_drain_limit"]
+
+
+    def probe():
+        """
+        Un GET de la ráfaga: (TTFB, en vuelo, sobrecarga).
+        """
+
+        response = session.get(
+            url,
+            timeout=settings["timeout"],
+            stream=True
+        )
+
+        dt = response.elapsed.total_seconds()
+
+        drain_body(response, drain_limit)
+
+
+        overloaded = (
+            response.status_code == 429
+            or response.status_code >= 500
+        )
+
+        return dt, getattr(response, "in_flight", 1), overloaded
+
+
+
+    # =====================================================
+    # RÁFAGAS POR NIVEL
+    # =====================================================
+
+    deferred_before = session.deferred
+
+    session.burst = True
+
+    curve = []
+
+    used = 0
+
+    stopped = None
+
+
+    try:
+
+        with ThreadPoolExecutor(max_workers=max(levels)) as pool:
+
+            for level in levels:
+
+                if used + level * bursts > budget:
+
+                    stopped = "budget"
+
+                    break
+
+
+                latency = LatencyHistogram()
+
+                achieved = 0
+                overloaded = 0
+                errors = 0
+                wall = 0.0
+
+
+                for _ in range(bursts):
+
+                    t0 = time.time()
+
+                    futures = [
+                        pool.submit(probe)
+                        for _ in range(level)
+                    ]
+
+                    used += level
+
+
+                    for future in futures:
+
+                        try:
+
+                            dt, in_flight, over = future.result()
+
+                        except Exception:
+
+                            errors += 1
+
+                            continue
+
+
+                        achieved = max(achieved, in_flight)
+
+                        if over:
+                            overloaded += 1
+                        else:
+                            latency.record(dt)
+
+
+                    wall += time.time() - t0
+
+
+                curve.append({
+
+                    "concurrency":
+                        level,
+
+                    "achieved":
+                        achieved,
+
+                    "requests":
+                        level * bursts,
+
+                    "median":
+                        round(latency.median(), 4)
+                        if latency.count
+                        else None,
+
+                    "p90":
+                        round(latency.quantile(0.90), 4)
+                        if latency.count
+                        else None,
+
+                    "throughput_rps":
+                        round(latency.count / wall, 2)
+                        if wall
+                        else None,
+
+                    "overloaded":
+                        overloaded,
+
+                    "errors":
+                        errors
+                })
+
+
+                if overloaded:
+
+                    stopped = "overload"
+
+                    break
+
+
+                if errors:
+
+                    stopped = "errors"
+
+                    break
+
+    finally:
+
+        session.burst = False
+
+
+    retry_after = None
+
+    if session.deferred and not deferred_before:
+
+        retry_after = session.deferred["retry_after"]
+
+        session.deferred = None
+
+
+
+    # =====================================================
+    # AJUSTE DE LA CURVA
+    # =====================================================
+
+    points = [
+        (level["concurrency"], level["median"])
+        for level in curve
+        if level["median"] is not None
+    ]
+
+    fit = None
+
+    if len(points) >= 2:
+
+        xs, ys = zip(*points)
+
+        mx = statistics.mean(xs)
+        my = statistics.mean(ys)
+
+        sxx = sum((x - mx) ** 2 for x in xs)
+        sxy = sum((x - mx) * (y - my) for x, y in points)
+        syy = sum((y - my) ** 2 for y in ys)
+
+        slope = sxy / sxx
+
+        fit = {
+            "model": "linear",
+            "intercept": round(my - slope * mx, 4),
+            "slope": round(slope, 4),
+            "r2": round(sxy * sxy / (sxx * syy), 3) if syy else 1.0
+        }
+
+
+    onset = None
+
+    if points:
+
+        base = points[0][1]
+
+        onset = next(
+            (
+                level
+                for level, median in points[1:]
+                if median > base * LOAD_ONSET_FACTOR
+            ),
+            None
+        )
+
+
+    saturation = None
+
+    for previous, current in zip(curve, curve[1:]):
+
+        if (
+            previous["throughput_rps"]
+            and current["throughput_rps"] is not None
+            and current["throughput_rps"]
+            < previous["throughput_rps"] * LOAD_SATURATION_GAIN
+        ):
+
+            saturation = current["concurrency"]
+
+            break
+
+
+
+    # =====================================================
+    # SEÑALES
+    # =====================================================
+
+    signals = []
+
+    if onset is not None:
+        signals.append("queueing_onset")
+
+    if saturation is not None:
+        signals.append("throughput_saturation")
+
+    if stopped == "overload" or retry_after is not None:
+        signals.append("overload_under_burst")
+
+    if (
+        len(curve) >= 2
+        and onset is None
+        and saturation is None
+        and stopped is None
+    ):
+        signals.append("parallel_scaling")
+
+
+    return {
+
+        "curve":
+            curve,
+
+        "fit":
+            fit,
+
+        "queueing_onset":
+            onset,
+
+        "saturation":
+            saturation,
+
+        "peak_throughput_rps":
+            max(
+                (
+                    level["throughput_rps"]
+                    for level in curve
+                    if level["throughput_rps"] is not None
+                ),
+                default=None
+            ),
+
+        "stopped":
+            stopped,
+
+        "retry_after":
+            retry_after,
+
+        "requests":
+            used,
+
+        "budget":
+            budget,
+
+        "signals":
+            signals
+    }
+
+
+# ------------------------ SUPERFICIE BACKEND---------------------
+def backend_surface(session, url):
+    """
+    Análisis avanzado de superficie backend.
+
+    Filosofía:
+    - activo controlado
+    - pasivo contextual
+    - sin modificación de estado
+
+    Observa:
+    - métodos declarados
+    - comportamiento real
+    - capas intermedias
+    - coherencia backend
+    - exposición operativa
+    """
+
+    signals = []
+    methods = []
+    unusual = []
+
+    observations = {}
+    stimuli = []
+
+
+    # =====================================================
+    # OPTIONS PRIMARIO
+    # =====================================================
+
+    try:
+
+        opt = session.options(
+            url,
+            timeout=session.settings["timeout"]
+        )
+
+        allow = (
+            opt.headers.get("Allow", "")
+            or
+            opt.headers.get("allow", "")
+        )
+
+        observations["options_status"] = (
+            opt.status_code
+        )
+
+        observations["allow_header"] = (
+            allow
+        )
+
+
+    except Exception:
+
+        return {
+
+            "methods": [],
+            "unusual": [],
+
+            "risk_profile":
+                "unknown",
+
+            "signals":
+                [
+                    "options_unavailable"
+                ]
+
+        }
+
+
+
+    # =====================================================
+    # NORMALIZACIÓN
+    # =====================================================
+
+    methods = sorted({
+
+        m.strip().upper()
+
+        for m in allow.split(",")
+
+        if m.strip()
+
+    })
+
+
+    safe_methods = {
+
+        "GET",
+        "HEAD",
+        "OPTIONS"
+
+    }
+
+
+    common_methods = {
+
+        "POST",
+        "PUT",
+        "DELETE",
+        "PATCH"
+
+    }
+
+
+    exotic_methods = {
+
+        "TRACE",
+        "CONNECT",
+        "DEBUG",
+        "PROPFIND",
+        "PROPPATCH",
+        "MKCOL",
+        "COPY",
+        "MOVE",
+        "LOCK",
+        "UNLOCK"
+
+    }
+
+
+    unusual = [
+
+        m
+
+        for m in methods
+
+        if m not in (
+            safe_methods
+            |
+            common_methods
+        )
+
+    ]
+
+
+
+    # =====================================================
+    # LECTURA DE MÉTODOS EXPUESTOS
+    # =====================================================
+
+    if "TRACE" in methods:
+
+        signals.append(
+            "trace_enabled"
+        )
+
+
+    if (
+        common_methods
+        &
+        set(methods)
+    ):
+
+        signals.append(
+            "state_changing_methods"
+        )
+
+
+    if any(
+        m in exotic_methods
+        for m in methods
+    ):
+
+        signals.append(
+            "exotic_methods_exposed"
+        )
+
+
+    if not methods:
+
+        signals.append(
+            "allow_header_empty"
+        )
+
+
+    if "OPTIONS" not in methods:
+
+        signals.append(
+            "options_not_advertised"
+        )
+
+
+
+    # =====================================================
+    # ESTÍMULO HEAD VS GET
+    # =====================================================
+
+    r_get = None
+
+    try:
+
+        stimuli.append(
+            "HEAD_GET_COMPARISON"
+        )
+
+        r_head = session.head(
+            url,
+            timeout=session.settings["timeout"]
+        )
+
+
+        r_get = session.get(
+            url,
+            timeout=session.settings["timeout"]
+        )
+
+
+        observations["head_status"] = (
+            r_head.status_code
+        )
+
+        observations["get_status"] = (
+            r_get.status_code
+        )
+
+
+        if (
+            r_head.status_code
+            !=
+            r_get.status_code
+        ):
+
+            signals.append(
+                "method_status_divergence"
+            )
+
+
+    except Exception:
+
+        pass
+
+
+
+    # =====================================================
+    # ESTÍMULO METHOD OVERRIDE
+    # =====================================================
+
+    try:
+
+        stimuli.append(
+            "METHOD_OVERRIDE_CHECK"
+        )
+
+
+        r_override = session.post(
+
+            url,
+
+            headers={
+
+                "X-HTTP-Method-Override":
+                    "DELETE"
+
+            },
+
+            timeout=session.settings["timeout"]
+
+        )
+
+
+        observations["override_status"] = (
+            r_override.status_code
+        )
+
+
+        if r_override.status_code not in (
+            400,
+            405
+        ):
+
+            signals.append(
+                "method_override_accepted"
+            )
+
+
+    except Exception:
+
+        pass
+
+
+
+    # =====================================================
+    # DETECCIÓN CAPAS INTERMEDIAS
+    # =====================================================
+
+    proxy_headers = (
+
+        "Via",
+        "X-Forwarded-For",
+        "X-Proxy",
+        "X-Gateway",
+        "X-Cache",
+        "CF-Ray",
+        "Server-Timing"
+
+    )
+
+
+    try:
+
+        if r_get:
+
+            detected = [
+
+                h
+
+                for h in proxy_headers
+
+                if h in r_get.headers
+
+            ]
+
+
+            if detected:
+
+                signals.append(
+                    "gateway_or_proxy_detected"
+                )
+
+
+                observations[
+                    "proxy_headers"
+                ] = detected
+
+
+    except Exception:
+
+        pass
+
+
+
+    # =====================================================
+    # DECLARACIÓN VS REALIDAD
+    # =====================================================
+
+    try:
+
+        if (
+
+            "GET" not in methods
+
+            and
+
+            r_get
+
+            and
+
+            r_get.status_code < 400
+
+        ):
+
+            signals.append(
+                "allow_mismatch_real_behavior"
+            )
+
+
+    except Exception:
+
+        pass
+
+
+
+    # =====================================================
+    # PERFIL SEMÁNTICO
+    # =====================================================
+
+    if (
+
+        any(
+            m in exotic_methods
+            for m in methods
+        )
+
+        or
+
+        "method_override_accepted"
+        in signals
+
+    ):
+
+        risk_profile = (
+            "elevated"
+        )
+
+
+    elif (
+
+        common_methods
+        &
+        set(methods)
+
+    ):
+
+        risk_profile = (
+            "moderate"
+        )
+
+
+    elif methods:
+
+        risk_profile = (
+            "low"
+        )
+
+
+    else:
+
+        risk_profile = (
+            "unknown"
+        )
+
+
+
+    # =====================================================
+    # LECTURA INVERSA BACKEND
+    # =====================================================
+
+    backend_profile = {
+
+        "method_surface":
+
+            len(methods),
+
+
+        "declared_complexity":
+
+            (
+                "high"
+                if len(methods) > 6
+                else
+                "normal"
+            ),
+
+
+        "stateful_behavior":
+
+            bool(
+                common_methods
+                &
+                set(methods)
+            ),
+
+
+        "intermediate_layer_hint":
+
+            (
+                "possible"
+                if
+                "gateway_or_proxy_detected"
+                in signals
+
+                else
+                "unknown"
+            )
+
+    }
+
+
+
+    # =====================================================
+    # RETORNO COMPATIBLE
+    # =====================================================
+
+    return {
+
+
+        # originales
+
+        "methods":
+            methods,
+
+
+        "unusual":
+            unusual,
+
+
+        "risk_profile":
+            risk_profile,
+
+
+        "signals":
+            signals,
+
+
+
+        # enriquecimiento SOC
+
+        "observations":
+            observations,
+
+
+        "stimuli":
+            stimuli,
+
+
+        "backend_profile":
+            backend_profile,
+
+
+        "meta":
+
+            {
+
+                "analysis":
+                    "backend_behavior_surface",
+
+
+                "state_change":
+                    False,
+
+
+                "correlation_ready":
+                    True
+
+            }
+
+    }
+
+
+
+# ------------------------ SCORING (ADVANCED) ----------------------------
+def score(sig):
+    """
+    Scoring heurístico multidimensional.
+
+    No mide vulnerabilidades.
+    Mide concentración de señales:
+    - comportamiento HTTP
+    - dinámica temporal
+    - arquitectura frontend
+    - superficie backend
+    - coherencia entre capas
+
+    Filosofía:
+    Una señal aislada es ruido.
+    Varias capas alineadas forman evidencia.
+    """
+
+    score = 0
+    correlations = 0
+
+    http = sig.get("http", {})
+    timing = sig.get("timing", {})
+    dom = sig.get("dom", {})
+    surface = sig.get("surface", {})
+    load = sig.get("load", {})
+
+
+    # =====================================================
+    # HTTP SEMANTICS
+    # =====================================================
+
+    if http.get("hash_change"):
+        score += 3
+
+    if http.get("etag"):
+        score += 1
+
+
+    cache = http.get("cache_signals", {})
+
+    if cache.get("cache_ambiguous"):
+        score += 1
+
+
+    if http.get("semantic_mismatch"):
+        score += 2
+
+
+
+    # =====================================================
+    # TIMING BEHAVIOR
+    # =====================================================
+
+    if timing.get("jitter_high"):
+        score += 2
+
+    if timing.get("method_gap"):
+        score += 2
+
+
+    timing_signals = timing.get("signals", [])
+
+    if "method_processing_gap" in timing_signals:
+        score += 2
+
+
+    if "options_heavy_logic" in timing_signals:
+        score += 1
+
+
+    if "uniform_backend_path" in timing_signals:
+        score += 1
+
+
+    if "heterogeneous_pool" in timing_signals:
+        score += 1
+
+
+
+    # =====================================================
+    # DOM / FRONTEND INTELLIGENCE
+    # =====================================================
+
+    hidden = dom.get("hidden_inputs", 0)
+
+    if hidden:
+        score += 2
+
+
+    if dom.get("hidden_sensitive"):
+        score += 3
+
+
+    if dom.get("js_network"):
+        score += 2
+
+
+    dom_signals = dom.get("signals", [])
+
+
+    if "spa_frontend" in dom_signals:
+        score += 1
+
+
+    if "logic_externalized" in dom_signals:
+        score += 1
+
+
+
+    # =====================================================
+    # BACKEND SURFACE
+    # =====================================================
+
+    unusual = surface.get("unusual", [])
+
+    if unusual:
+        score += 3
+
+
+    risk = surface.get("risk_profile")
+
+
+    if risk == "elevated":
+        score += 2
+
+    elif risk == "moderate":
+        score += 1
+
+
+
+    surface_signals = surface.get("signals", [])
+
+
+    if "method_override_accepted" in surface_signals:
+        score += 3
+
+
+    if "gateway_or_proxy_detected" in surface_signals:
+        score += 1
+
+
+
+    # =====================================================
+    # CURVA DE CARGA
+    # =====================================================
+
+    load_signals = load.get("signals", [])
+
+
+    if "queueing_onset" in load_signals:
+        score += 2
+
+
+    if "throughput_saturation" in load_signals:
+        score += 1
+
+
+    if "overload_under_burst" in load_signals:
+        score += 1
+
+
+
+    # =====================================================
+    # CORRELACIÓN MULTICAPA
+    # =====================================================
+
+    #
+    # No buscamos indicadores.
+    # Buscamos comportamiento coherente.
+    #
+
+
+    if (
+        http.get("hash_change")
+        and dom.get("js_network")
+        and timing.get("method_gap")
+    ):
+        score += 3
+        correlations += 1
+
+
+
+    if (
+        dom.get("hidden_sensitive")
+        and surface.get("methods")
+        and timing.get("method_gap")
+    ):
+        score += 3
+        correlations += 1
+
+
+
+    if (
+        http.get("semantic_mismatch")
+        and dom.get("js_network")
+    ):
+        score += 2
+        correlations += 1
+
+
+
+    #
+    # Jitter alto explicado por cola bajo concurrencia.
+    #
+
+    if (
+        timing.get("jitter_high")
+        and "queueing_onset" in load_signals
+    ):
+        score += 2
+        correlations += 1
+
+
+
+    # =====================================================
+    # CONTEXTO SOC
+    # =====================================================
+
+    if correlations >= 3:
+        score += 3
+
+    elif correlations == 2:
+        score += 2
+
+    elif correlations == 1:
+        score += 1
+
+
+
+    # =====================================================
+    # NORMALIZACIÓN
+    # =====================================================
+
+    if score < 0:
+        score = 0
+
+
+    return score
+
+# ------------------------ INTERPRETACIÓN (ADVANCED) ----------------------
+def insights(sig):
+    """
+    Interpretación cognitiva multidimensional.
+
+    Traduce señales técnicas:
+        evento -> contexto -> significado operacional
+
+    No confirma vulnerabilidades.
+    Explica comportamientos observables.
+
+    Diseñado para:
+    - SOC analysis
+    - threat modeling
+    - arquitectura inversa
+    - lectura de superficie
+    """
+
+    out = []
+
+    http = sig.get("http", {})
+    timing = sig.get("timing", {})
+    dom = sig.get("dom", {})
+    surface = sig.get("surface", {})
+    load = sig.get("load", {})
+
+
+    # =====================================================
+    # HTTP BEHAVIOR
+    # =====================================================
+
+    if http.get("hash_change"):
+        out.append(
+            "Respuesta variable detectada → existe comportamiento dinámico "
+            "(estado interno, personalización, experimentación o generación bajo demanda)."
+        )
+
+
+    if http.get("etag"):
+        out.append(
+            "ETag presente → el sistema mantiene mecanismos de validación "
+            "de representación o cache consciente del recurso."
+        )
+
+
+    cache = http.get("cache_signals", {})
+
+    if cache.get("cache_ambiguous"):
+        out.append(
+            "Política de cache poco evidente → posible lógica intermedia "
+            "entre cliente, proxy y aplicación."
+        )
+
+
+    if http.get("semantic_mismatch"):
+        out.append(
+            "Respuesta declarada y contenido no coinciden → revisar "
+            "coherencia entre capa HTTP y aplicación."
+        )
+
+
+
+    # =====================================================
+    # TEMPORAL INTELLIGENCE
+    # =====================================================
+
+    if timing.get("method_gap"):
+        out.append(
+            "Métodos HTTP presentan comportamiento temporal diferente → "
+            "posibles rutas internas diferenciadas, middleware o controles condicionales."
+        )
+
+
+    if "method_processing_gap" in timing.get("signals", []):
+
+        out.append(
+            "GET y OPTIONS parecen recorrer caminos distintos → "
+            "existe separación lógica entre capas de procesamiento."
+        )
+
+
+    if "options_heavy_logic" in timing.get("signals", []):
+
+        out.append(
+            "OPTIONS muestra procesamiento elevado → "
+            "posible gateway, framework routing o capa intermedia activa."
+        )
+
+
+    if timing.get("jitter_high"):
+
+        out.append(
+            "Variación temporal elevada → comportamiento compatible con "
+            "balanceo, servicios distribuidos, colas o infraestructura dinámica."
+        )
+
+
+    if "heterogeneous_pool" in timing.get("signals", []):
+
+        out.append(
+            f"Backends del pool con latencias distintas (más lento: "
+            f"{(timing.get('backends') or {}).get('slowest')}) → "
+            "parte del jitter viene de un nodo concreto, no del servicio entero."
+        )
+
+
+
+    # =====================================================
+    # FRONTEND / DOM INTELLIGENCE
+    # =====================================================
+
+    if dom.get("hidden_sensitive"):
+
+        out.append(
+            "Elementos ocultos con información sensible aparente → "
+            "la aplicación mantiene estado interno o flujos multi-etapa."
+        )
+
+
+    if dom.get("js_network"):
+
+        out.append(
+            "JavaScript genera comunicación activa → "
+            "la superficie funcional puede extenderse más allá del HTML visible."
+        )
+
+
+    dom_signals = dom.get("signals", [])
+
+
+    if "spa_frontend" in dom_signals:
+
+        out.append(
+            "Frontend SPA detectado → "
+            "la lógica principal probablemente reside en APIs y servicios auxiliares."
+        )
+
+
+    if "logic_externalized" in dom_signals:
+
+        out.append(
+            "Lógica externalizada → arquitectura separada entre presentación y recursos externos."
+        )
+
+
+
+    # =====================================================
+    # BACKEND SURFACE
+    # =====================================================
+
+    if surface.get("unusual"):
+
+        out.append(
+            "Métodos HTTP fuera del patrón común observados → "
+            "la interfaz expuesta merece revisión arquitectónica."
+        )
+
+
+    risk = surface.get("risk_profile")
+
+
+    if risk == "elevated":
+
+        out.append(
+            "Superficie backend con señales elevadas → "
+            "requiere correlación manual antes de sacar conclusiones."
+        )
+
+
+    elif risk == "moderate":
+
+        out.append(
+            "Superficie backend moderada → "
+            "existen componentes adicionales visibles desde fuera."
+        )
+
+
+
+    # =====================================================
+    # CURVA DE CARGA
+    # =====================================================
+
+    load_signals = load.get("signals", [])
+
+
+    if "queueing_onset" in load_signals:
+
+        out.append(
+            f"La latencia crece desde concurrencia {load.get('queueing_onset')} → "
+            "peticiones en cola: pool de workers o conexiones limitado."
+        )
+
+
+    if "throughput_saturation" in load_signals:
+
+        out.append(
+            f"El throughput deja de escalar en concurrencia {load.get('saturation')} → "
+            "capacidad efectiva del backend alcanzada con carga ligera."
+        )
+
+
+    if "overload_under_burst" in load_signals:
+
+        out.append(
+            "Ráfagas cortas provocan 429/5xx → "
+            "rate limiting o protección de carga activa en el camino."
+        )
+
+
+    if "parallel_scaling" in load_signals:
+
+        out.append(
+            "Latencia estable y throughput creciente con la concurrencia → "
+            "backend que procesa en paralelo (balanceo o réplicas)."
+        )
+
+
+
+    # =====================================================
+    # CORRELACIONES PROFUNDAS
+    # =====================================================
+
+
+    if (
+        http.get("hash_change")
+        and dom.get("js_network")
+        and timing.get("method_gap")
+    ):
+
+        out.append(
+            "Frontend dinámico + respuestas variables + diferencias temporales → "
+            "posible arquitectura con lógica condicional no visible."
+        )
+
+
+    if (
+        dom.get("hidden_sensitive")
+        and surface.get("methods")
+        and timing.get("method_gap")
+    ):
+
+        out.append(
+            "Estado interno + métodos expuestos + rutas diferenciadas → "
+            "modelo de aplicación con múltiples capas de decisión."
         )
-    )
+
+
+    if (
+        http.get("etag")
+        and dom.get("js_network")
+    ):
+
+        out.append(
+            "Cache inteligente junto a frontend activo → "
+            "posible optimización para usuarios dinámicos o contenido personalizado."
+        )
+
 
 
     # =====================================================
-    # IDENTIDAD OPERATIVA
+    # LECTURA FINAL
     # =====================================================
 
-    server = h.get(
-        "Server"
-    )
+    if len(out) >= 6:
 
-    powered = h.get(
-        "X-Powered-By"
-    )
+        out.append(
+            "Múltiples capas presentan actividad coherente → "
+            "la superficie observable representa una arquitectura compleja."
+        )
 
 
-    exposure_signals = {
+    if not out:
 
-        "server_visible":
-            bool(server),
+        out.append(
+            "Superficie homogénea → comportamiento consistente, "
+            "sin señales fuertes de complejidad externa."
+        )
 
-        "framework_visible":
-            bool(powered),
 
-        "technology_disclosure":
-            bool(
-                server
-                or powered
-            )
+    return out
 
-    }
 
+# ------------------------ GATING ADAPTATIVO ---------------------------
+#
+# Señales del primer nivel (HTTP + DOM) que justifican
+# pagar las capas caras.
+#
+
+GATE_WARRANTS = {
+
+    "timing": (
+        "dynamic_content",
+        "slow_backend",
+        "response_variance",
+        "active_js_network",
+        "spa_frontend",
+        "hidden_state_tokens",
+    ),
+
+    "surface": (
+        "head_mismatch",
+        "semantic_mismatch",
+        "active_js_network",
+        "hidden_state_tokens",
+        "forms_present",
+    ),
+}
+
+
+#
+# Máximo que cada capa cara podría aportar a score().
+#
+
+TIMING_CEILING = {
+    "jitter_high": True,
+    "method_gap": True,
+    "signals": [
+        "method_processing_gap",
+        "options_heavy_logic",
+        "uniform_backend_path",
+        "heterogeneous_pool",
+    ],
+}
+
+SURFACE_CEILING = {
+    "methods": ["GET"],
+    "unusual": ["DEBUG"],
+    "risk_profile": "elevated",
+    "signals": [
+        "method_override_accepted",
+        "gateway_or_proxy_detected",
+    ],
+}
+
+
+def priority_band(priority):
+    """
+    Banda de salida del score (la misma que usa render).
+    """
 
+    if priority >= PRIORITY_BANDS[1]:
+        return "high"
 
-    # =====================================================
-    # LECTURA INVERSA
-    # =====================================================
+    if priority >= PRIORITY_BANDS[0]:
+        return "medium"
 
-    behavioral = {
+    return "low"
 
-        "dynamic_content":
-            hash_change,
 
-        "unstable_size":
-            size_variation > 512,
+def first_tier_signals(http, dom):
+    """
+    Señales baratas del primer nivel, normalizadas por nombre.
+    """
+
+    behavior = http.get("behavior", {})
+    identity = http.get("delivery_identity", {})
+    dom_signals = dom.get("signals", [])
+
+    present = {
+
+        "dynamic_content":
+            http.get("hash_change"),
 
         "slow_backend":
-            avg_latency is not None
-            and avg_latency > 2000,
+            behavior.get("slow_backend"),
 
         "response_variance":
-            latency_variance > 500,
+            behavior.get("response_variance"),
 
         "possible_edge_layer":
-            bool(age)
-            or bool(vary)
+            behavior.get("possible_edge_layer"),
 
-    }
+        "head_mismatch":
+            http.get("head_mismatch"),
 
+        "semantic_mismatch":
+            http.get("semantic_mismatch"),
 
+        "technology_disclosure":
+            identity.get("technology_disclosure"),
 
-    # =====================================================
-    # RETORNO COMPATIBLE
-    # =====================================================
+        "active_js_network":
+            dom.get("js_network"),
+
+        "spa_frontend":
+            "spa_frontend" in dom_signals,
+
+        "hidden_state_tokens":
+            bool(dom.get("hidden_sensitive")),
+
+        "forms_present":
+            dom.get("forms", 0) > 0,
+    }
 
     return {
+        name
+        for name, value in present.items()
+        if value
+    }
 
-        # originales
-        "status":
-            r1.status_code,
 
-        "len":
-            len(r1.text),
+def gate_layers(http, dom, full=False):
+    """
+    Política de gating del orquestador.
 
-        "hash_change":
-            hash_change,
+    El primer nivel (HTTP + DOM) produce un score parcial.
+    Timing y superficie solo se ejecutan si:
+    - el operador pide escaneo completo
+    - hay señales concretas que los justifican
+    - o su aporte máximo aún puede cambiar la banda de salida
+      y el score parcial no es despreciable
 
-        "etag":
-            bool(etag),
+    Devuelve la decisión y su motivo por capa.
+    """
 
-        "cache":
-            cache_control,
+    partial = score({
+        "http": http,
+        "dom": dom
+    })
 
+    ceiling = score({
+        "http": http,
+        "dom": dom,
+        "timing": TIMING_CEILING,
+        "surface": SURFACE_CEILING
+    })
 
-        # existentes enriquecidos
+    present = first_tier_signals(
+        http,
+        dom
+    )
 
-        "head_mismatch":
-            head_mismatch,
+    decisions = {}
 
-        "semantic_mismatch":
-            semantic_mismatch,
 
-        "cache_signals":
-            cache_signals,
+    for layer, warrants in GATE_WARRANTS.items():
 
-        "vary":
-            vary,
+        matched = sorted(
+            present & set(warrants)
+        )
 
-        "errors":
-            errors,
+        if full:
+            decision = (True, "full_scan_requested")
 
+        elif not http:
+            decision = (True, "first_tier_unavailable")
 
-        # nuevas capas SOC
+        elif matched:
+            decision = (True, "signal:" + ",".join(matched))
 
-        "behavior":
+        elif priority_band(partial) == priority_band(ceiling):
+            decision = (False, "band_locked")
 
-            behavioral,
+        elif partial >= GATE_PARTIAL_THRESHOLD:
+            decision = (True, "partial_score")
 
+        else:
+            decision = (False, "low_signal_static")
 
-        "performance":
 
-            {
-                "samples":
-                    len(responses),
+        decisions[layer] = {
+            "run": decision[0],
+            "reason": decision[1]
+        }
 
-                "latencies_ms":
-                    timestamps,
 
-                "average_ms":
-                    avg_latency,
+    return {
 
-                "variance_ms":
-                    latency_variance
-            },
+        "partial_score":
+            partial,
 
+        "partial_band":
+            priority_band(partial),
 
-        "delivery_identity":
+        "ceiling_band":
+            priority_band(ceiling),
 
-            exposure_signals,
+        "layers":
+            decisions
+    }
 
 
-        "metadata":
+# ------------------------ ORQUESTADOR ---------------------------------
+def scan_iter(url, full=False, deadline=None, resume=None, cancel=None, scope=None,
+              scanner=None, preflight=None):
+    """
+    Orquestador principal de observación web.
 
-            {
-                "body_hashes":
-                    body_hashes,
+    Ejecuta una lectura multicapa:
 
-                "size_variation":
-                    size_variation,
+        HTTP
+          ↓
+        DOM
+          ↓
+        Timing
+          ↓
+        Backend Surface
+          ↓
+        Correlación cognitiva
 
-                "content_type":
-                    content_type,
+    No explota.
+    No modifica estado.
+    Solo observa comportamiento externo.
 
-                "age_header":
-                    age
-            }
+    Diseñado para análisis SOC,
+    threat modeling y arquitectura inversa.
 
-    }, r1
+    Timing y superficie pasan por gate_layers():
+    con `full=True` se ejecutan siempre. La curva de carga
+    (load_curve) solo corre con el ajuste `load_curve`.
 
+    `deadline` (segundos) acota el scan completo: cada fase
+    recibe su parte (PHASE_BUDGETS) y, agotada, sus peticiones
+    se cancelan. El report devuelve lo obtenido, marcado como parcial.
 
-# ------------------------ DOM PROFUNDO --------------------------------
-def dom_deep(html):
-    """
-    Análisis DOM profundo con lectura semántica avanzada.
+    Un 429/503 con Retry-After no bloquea: el scan se detiene,
+    el report lleva `meta.deferred` y puede re-encolarse más tarde
+    con `resume=report`, reutilizando las capas ya completadas.
 
-    Filosofía:
-    - Pasivo
-    - Lectura estructural
-    - Sin ejecución JavaScript
-    - Sin interacción destructiva
+    `cancel` (threading.Event) cancela el scan de forma cooperativa:
+    activado, las peticiones restantes se cortan como presupuesto agotado.
 
-    Observa:
-    - arquitectura frontend
-    - exposición de lógica
-    - estado cliente
-    - comunicación web
-    - madurez tecnológica
+    `scope` agrupa scans bajo una misma cuota de peticiones
+    (por defecto, el host); ver scope_quota().
+
+    Generador: produce eventos a medida que avanzan las capas
+
+        {"type": "layer_started",     "layer": ...}
+        {"type": "layer_completed",   "layer": ..., "state": ..., "result": {...}}
+        {"type": "provisional_score", "layer": ..., "priority": ...}
+        {"type": "report",            "report": {...}}
+
+    El consumidor puede cortar en cualquier momento
+    (p. ej. dominio aparcado visto en http_semantics):
+    las capas restantes no se ejecutan. scan() consume
+    el generador completo y devuelve el report.
+
+    `scanner` aporta ajustes, registros por host y el pool
+    de sesiones (por defecto, default_scanner()).
+
+    `preflight` (snapshot de TrafficMeter) es el tráfico emitido
+    para este target antes del scan (sweep, resolución de
+    redirecciones en batch_scan): se suma a `meta.traffic`
+    y se detalla en `meta.traffic.preflight`.
     """
 
+    scanner = scanner or default_scanner()
+
+    allowlist = scanner.settings["allowlist"]
+
+    if allowlist is not None and not allowlist.allows(url):
+
+        raise ScopeViolation(
+            f"{url} outside authorized scope"
+        )
+
+
+    session = scanner.acquire()
+
     try:
-        soup = BeautifulSoup(
-            html,
-            "html.parser"
+
+        yield from scan_events(
+            session,
+            url,
+            full=full,
+            deadline=deadline,
+            resume=resume,
+            cancel=cancel,
+            scope=scope,
+            preflight=preflight
         )
 
-    except Exception:
+    finally:
+
+        scanner.release(session)
+
+
+def scan_events(session, url, full=False, deadline=None, resume=None, cancel=None,
+                scope=None, preflight=None):
+    """
+    Cuerpo de scan_iter() sobre una sesión ya asignada.
+    """
+
+    session.cancel = cancel
+
+    if preflight:
+        session.meter.merge(preflight)
+
+    scope = scope or (urlparse(url).hostname or "").lower()
+
+    session.quota = session.scanner.quota(scope)
+
+    phase_budgets = session.settings["phase_budgets"]
+
+    phases = {}
+    warnings = []
+    execution = {}
+
+    start_scan = time.time()
+
+    deadline_at = (
+        start_scan + deadline
+        if deadline
+        else None
+    )
+
+
+    def phase_deadline(layer):
+
+        if deadline_at is None:
+            return None
+
+        return min(
+            time.time() + phase_budgets[layer] * deadline,
+            deadline_at
+        )
+
+
+    #
+    # Capas ya completadas en un intento anterior
+    # (scan re-encolado por Retry-After).
+    #
+
+    reused = {}
+
+    if resume:
+
+        for layer, state in resume["meta"]["execution"].items():
+
+            if state in ("completed", "resumed"):
+                reused[layer] = resume["signals"][layer]
+
+        if "http" in reused:
+            reused["http"] = (reused["http"], None)
+
+
+    sig = {
+
+        "http": {},
+
+        "dom": {},
+
+        "timing": {},
+
+        "surface": {},
+
+        "load": {}
+    }
+
+
+    def provisional(layer):
+        """
+        Score con las capas disponibles hasta ahora.
+        """
 
         return {
-            "scripts": 0,
-            "hidden_inputs": 0,
-            "data_actions": 0,
-            "js_network": False,
-            "signals": [
-                "html_parse_error"
-            ]
+            "type": "provisional_score",
+            "layer": layer,
+            "priority": safe(
+                lambda: score(sig),
+                0
+            )
+        }
+
+
+    def run_layer(layer, label, fn, fallback):
+        """
+        Ejecuta una capa con su presupuesto,
+        captura de errores y telemetría.
+
+        Generador: emite layer_started / layer_completed
+        y devuelve el resultado (yield from).
+        """
+
+        yield {
+            "type": "layer_started",
+            "layer": layer
         }
 
+        t0 = time.time()
 
-    # =====================================================
-    # ELEMENTOS BASE
-    # =====================================================
+        session.layer = layer
 
-    scripts = soup.find_all(
-        "script"
-    )
+        session.expires_at = (
+            phase_deadline(layer)
+            if layer in phase_budgets
+            else None
+        )
 
-    hidden = soup.select(
-        "input[type=hidden]"
-    )
 
-    actions = soup.find_all(
-        attrs={
-            "data-action": True
-        }
-    )
+        if layer in reused:
 
+            result = reused[layer]
 
-    forms = soup.find_all(
-        "form"
-    )
+            execution[layer] = "resumed"
 
+        elif session.deferred:
 
-    links = soup.find_all(
-        "a",
-        href=True
-    )
+            result = fallback
 
+            execution[layer] = "deferred"
 
-    # =====================================================
-    # JAVASCRIPT REAL
-    # =====================================================
+        else:
 
-    inline_js = [
+            try:
 
-        s.string
+                result = fn()
 
-        for s in scripts
+                execution[layer] = "completed"
 
-        if s.string
-        and len(s.string.strip()) > 40
+            except Exception as e:
 
-    ]
+                result = fallback
 
+                warnings.append(
+                    f"{label}: {type(e).__name__}"
+                )
 
-    external_scripts = [
+                execution[layer] = "failed"
 
-        s.get("src")
 
-        for s in scripts
+            #
+            # Retry-After durante la capa: su lectura queda incompleta.
+            #
 
-        if s.get("src")
+            if session.deferred:
+                execution[layer] = "deferred"
 
-    ]
 
+        session.expires_at = None
 
-    # =====================================================
-    # COMUNICACIÓN CLIENTE ↔ SERVIDOR
-    # =====================================================
+        phases[layer] = round(
+            time.time() - t0,
+            3
+        )
 
-    network_patterns = (
+        yield {
+            "type": "layer_completed",
+            "layer": layer,
+            "state": execution[layer],
+            "result": (
+                result[0]
+                if layer == "http"
+                else result
+            )
+        }
 
-        "fetch(",
-        "axios",
-        "XMLHttpRequest",
-        "WebSocket",
-        ".send(",
-        "navigator.sendBeacon",
-        "graphql",
-        "/api/",
-        "socket.io"
-    )
+        return result
 
 
-    js_network = any(
+    def skip_layer(layer):
 
-        pattern in js
+        execution[layer] = "skipped"
 
-        for js in inline_js
+        phases[layer] = 0.0
 
-        for pattern in network_patterns
+        return {
+            "type": "layer_completed",
+            "layer": layer,
+            "state": "skipped",
+            "result": {}
+        }
 
-    )
 
 
     # =====================================================
-    # FRAMEWORK INTELLIGENCE
+    # HTTP SEMANTICS
     # =====================================================
 
-    framework_hints = {
-
-        "react":
+    #
+    # La cadena de redirecciones se resuelve una vez (cache del
+    # Scanner) dentro de la capa HTTP; el resto de fases apunta
+    # a la URL final.
+    #
 
-            bool(
-                soup.find(
-                    attrs={
-                        "data-reactroot": True
-                    }
-                )
-            )
+    redirects = dict(
+        (resume or {}).get("meta", {}).get("redirects") or {}
+    )
 
-            or
 
-            "__REACT_DEVTOOLS_GLOBAL_HOOK__"
-            in html,
+    def http_layer():
 
+        redirects.update(
+            session.scanner.redirects(session, url)
+        )
 
-        "vue":
+        return http_semantics(
+            session,
+            redirects["final_url"]
+        )
 
-            "data-v-" in html
 
-            or
+    http, resp = yield from run_layer(
+        "http",
+        "http_semantics_error",
+        http_layer,
+        ({}, None)
+    )
 
-            "__VUE_DEVTOOLS_GLOBAL_HOOK__"
-            in html,
+    target = redirects.get("final_url", url)
 
+    sig["http"] = http
 
-        "angular":
+    yield provisional("http")
 
-            "ng-version" in html
 
-            or
 
-            "angular.module"
-            in html,
+    # =====================================================
+    # DOM DEEP ANALYSIS
+    # =====================================================
 
+    dom = yield from run_layer(
+        "dom",
+        "dom_error",
+        lambda: dom_deep(resp.text if resp else ""),
+        {}
+    )
 
-        "next":
+    sig["dom"] = dom
 
-            "__NEXT_DATA__"
-            in html,
+    yield provisional("dom")
 
 
-        "svelte":
 
-            "svelte"
-            in html.lower()
+    # =====================================================
+    # GATING ADAPTATIVO
+    # =====================================================
 
-    }
+    gating = gate_layers(
+        http,
+        dom,
+        full=full
+    )
 
+    layers = gating["layers"]
 
-    spa_detected = any(
-        framework_hints.values()
-    )
 
 
     # =====================================================
-    # ESTADO OCULTO
+    # TEMPORAL DIFFERENCE
     # =====================================================
 
-    hidden_sensitive = [
+    if layers["timing"]["run"]:
 
-        i.get("name","").lower()
+        timing = yield from run_layer(
+            "timing",
+            "timing_error",
+            lambda: timing_diff(
+                session,
+                target,
+                baseline=safe(
+                    lambda: host_baseline(session, target)
+                )
+            ),
+            {}
+        )
 
-        for i in hidden
+        sig["timing"] = timing
 
-        if any(
+        yield provisional("timing")
 
-            key in (
+    else:
 
-                i.get("name","")
-                +
-                i.get("id","")
+        yield skip_layer("timing")
 
-            ).lower()
 
-            for key in (
 
-                "token",
-                "csrf",
-                "auth",
-                "session",
-                "state",
-                "nonce"
+    # =====================================================
+    # BACKEND SURFACE
+    # =====================================================
 
-            )
+    if layers["surface"]["run"]:
 
+        surface = yield from run_layer(
+            "surface",
+            "surface_error",
+            lambda: backend_surface(session, target),
+            {}
         )
 
-    ]
+        sig["surface"] = surface
+
+        yield provisional("surface")
+
+    else:
+
+        yield skip_layer("surface")
+
 
 
     # =====================================================
-    # INTERACTIVIDAD CLIENTE
+    # CURVA DE CARGA (OPT-IN)
     # =====================================================
 
-    event_attrs = sum(
+    if session.settings["load_curve"]:
 
-        1
+        load = yield from run_layer(
+            "load",
+            "load_curve_error",
+            lambda: load_curve(session, target),
+            {}
+        )
 
-        for tag in soup.find_all()
+        sig["load"] = load
 
-        for attr in tag.attrs
+        yield provisional("load")
 
-        if attr.startswith("on")
+    else:
+
+        yield skip_layer("load")
 
-    )
 
 
     # =====================================================
-    # RECURSOS EXTERNOS
+    # DEADLINE
     # =====================================================
 
-    external_domains = []
+    #
+    # Capas que perdieron peticiones por presupuesto agotado.
+    #
 
-    for src in external_scripts:
+    for layer in session.expired:
 
-        if src:
+        execution[layer] = (
+            "expired"
+            if execution.get(layer) == "failed"
+            else "partial"
+        )
+
+
+    if session.expired:
+
+        warnings.append(
+            "deadline_exceeded: " + ",".join(sorted(session.expired))
+        )
 
-            external_domains.append(
-                src.split("/")[2]
-                if "//" in src
-                else src
-            )
 
 
     # =====================================================
-    # DENSIDAD FRONTEND
+    # CUOTA DEL SCOPE
     # =====================================================
 
-    dom_complexity = {
+    for layer in session.over_quota:
 
-        "html_size":
+        if execution.get(layer) == "completed":
+            execution[layer] = "partial"
 
-            len(html),
 
+    if session.over_quota:
 
-        "tag_count":
+        warnings.append(
+            "quota_exhausted: " + ",".join(sorted(session.over_quota))
+        )
 
-            len(
-                soup.find_all()
-            ),
 
 
-        "script_ratio":
+    # =====================================================
+    # RETRY-AFTER
+    # =====================================================
 
-            len(scripts)
-            /
-            max(
-                len(soup.find_all()),
-                1
+    deferred = None
+
+    if session.deferred:
+
+        deferred = dict(
+            session.deferred,
+            pending=sorted(
+                layer
+                for layer, state in execution.items()
+                if state == "deferred"
             )
+        )
 
-    }
+        warnings.append(
+            f"deferred: retry_after={deferred['retry_after']}s"
+        )
 
 
 
     # =====================================================
-    # SEÑALES INTERPRETADAS
+    # CIRCUIT BREAKER
     # =====================================================
 
-    signals = []
+    #
+    # Capas que perdieron peticiones por breaker abierto.
+    #
 
+    for layer in session.cut_short:
 
-    if js_network:
-        signals.append(
-            "active_js_network"
-        )
+        if execution.get(layer) == "completed":
+            execution[layer] = "cut_short"
 
 
-    if spa_detected:
-        signals.append(
-            "spa_frontend"
-        )
+    circuit = dict(
+        session.scanner.breaker(target).snapshot(),
+        cut_short=sorted(session.cut_short)
+    )
 
+    if circuit["cut_short"]:
 
-    if hidden_sensitive:
-        signals.append(
-            "hidden_state_tokens"
+        warnings.append(
+            "circuit_open: " + ",".join(circuit["cut_short"])
         )
 
 
-    if event_attrs > 20:
-        signals.append(
-            "high_client_interactivity"
-        )
 
+    # =====================================================
+    # COGNITIVE LAYER
+    # =====================================================
 
-    if len(external_scripts) > len(inline_js):
-        signals.append(
-            "logic_externalized"
-        )
+    try:
 
+        priority = score(sig)
 
-    if len(forms) > 5:
-        signals.append(
-            "form_heavy_application"
+    except Exception as e:
+
+        priority = 0
+
+        warnings.append(
+            f"score_error: {type(e).__name__}"
         )
 
 
-    if len(external_domains) > 5:
-        signals.append(
-            "third_party_dependency_heavy"
+    try:
+
+        generated_insights = insights(sig)
+
+    except Exception as e:
+
+        generated_insights = []
+
+        warnings.append(
+            f"insights_error: {type(e).__name__}"
         )
 
 
 
     # =====================================================
-    # LECTURA INVERSA
+    # FINAL OBSERVATION
     # =====================================================
 
-    architecture = {
+    report = {
+
+        "url": url,
+
+
+        "signals": sig,
 
-        "client_heavy":
 
-            len(scripts)
-            >
-            len(forms),
+        "priority": priority,
 
 
-        "backend_hidden":
+        "insights": generated_insights,
 
-            js_network
-            and spa_detected,
 
+        "meta": {
 
-        "simple_site":
+            "phases_sec": phases,
 
-            len(scripts) < 3
-            and not spa_detected,
 
+            "warnings": warnings,
 
-        "complex_frontend":
 
-            len(scripts) > 10
-            or event_attrs > 30
+            "execution": execution,
 
-    }
 
+            "gating": gating,
 
 
-    # =====================================================
-    # RETORNO COMPATIBLE
-    # =====================================================
+            "circuit": circuit,
 
-    return {
 
-        # originales
+            "deadline": (
+                {
+                    "budget_sec": deadline,
+                    "phase_budgets": phase_budgets,
+                    "expired": sorted(session.expired)
+                }
+                if deadline
+                else None
+            ),
 
-        "scripts":
-            len(scripts),
 
-        "hidden_inputs":
-            len(hidden),
+            "deferred": deferred,
 
-        "data_actions":
-            len(actions),
 
-        "js_network":
-            js_network,
+            "redirects": redirects or None,
 
 
-        # profundidad añadida
+            "transport": {
+                "requested": session.settings["transport"],
+                "active": session.scanner.transport,
+                "protocols": session.protocols
+            },
 
-        "inline_js_blocks":
-            len(inline_js),
 
-        "external_scripts":
-            len(external_scripts),
+            "tls": {
+                "handshakes": session.handshakes,
+                "scanner": session.scanner.tls.snapshot()
+            },
 
-        "hidden_sensitive":
-            hidden_sensitive,
 
-        "event_handlers":
-            event_attrs,
+            "dns": session.scanner.dns.report(
+                urlparse(target).hostname,
+                since=start_scan
+            ),
 
-        "framework_hints":
-            framework_hints,
 
-        "signals":
-            signals,
+            "concurrency": dict(
+                session.scanner.limiter(target).snapshot(),
+                scan_peak_in_flight=session.peak_in_flight
+            ),
 
 
-        # nueva lectura SOC
+            "retries": {
+                "total": sum(session.retries.values()),
+                "by_layer": session.retries
+            },
 
-        "forms":
-            len(forms),
 
+            "scope": {
+                "blocked": session.scope_blocked
+            },
 
-        "external_domains":
-            external_domains,
 
+            "traffic": dict(
+                session.meter.snapshot(),
+                retries=sum(session.retries.values()),
+                scope=scope,
+                quota=(
+                    session.quota.snapshot()
+                    if session.quota
+                    else None
+                ),
+                preflight=preflight
+            ),
 
-        "dom_complexity":
-            dom_complexity,
 
+            "partial": any(
+                state in ("partial", "expired", "cut_short", "deferred")
+                for state in execution.values()
+            ),
 
-        "architecture":
 
-            architecture,
+            "runtime_sec": round(
+                time.time() - start_scan,
+                3
+            ),
 
 
-        "meta":
+            "analysis": {
 
-            {
-                "analysis":
-                    "passive_dom_semantics",
+                "layers": [
+                    "http",
+                    "dom",
+                    "timing",
+                    "backend",
+                    "load"
+                ],
 
-                "execution":
-                    False,
+                "mode":
+                    "passive_behavioral_observation",
 
                 "correlation_ready":
                     True
-
             }
-
+        }
     }
 
-# ------------------------ TIMING DIFERENCIAL (ADVANCED) ---------------------------
-def timing_diff(session, url):
-    """
-    Análisis temporal diferencial GET / HEAD / OPTIONS.
 
-    Lectura forense de comportamiento HTTP.
+    yield {
+        "type": "report",
+        "report": report
+    }
 
-    Filosofía:
-    - activo controlado
-    - no intrusivo
-    - orientado a señales
-    - sin explotación
 
-    Observa:
-    - diferencias entre métodos
-    - estabilidad temporal
-    - posibles capas intermedias
-    - coherencia del backend
+def scan(url, full=False, deadline=None, resume=None, cancel=None, scope=None,
+         scanner=None, preflight=None):
+    """
+    Versión bloqueante de scan_iter(): devuelve el report final.
     """
 
-    def measure(method):
-
-        timings = []
+    for event in scan_iter(
+        url,
+        full=full,
+        deadline=deadline,
+        resume=resume,
+        cancel=cancel,
+        scope=scope,
+        scanner=scanner,
+        preflight=preflight
+    ):
 
-        errors = 0
+        if event["type"] == "report":
+            return event["report"]
 
 
-        for _ in range(TIMING_SAMPLES):
+# ------------------------ REGISTROS ACOTADOS ---------------------------------
+class BoundedRegistry:
+    """
+    Registro por clave con tope de entradas (LRU) y TTL.
 
-            try:
+    Un Scanner de larga vida ve miles de hosts y URLs:
+    sus registros no pueden crecer sin límite.
 
-                t0 = time.time()
+    Con `refresh` el TTL cuenta desde el último uso (breakers,
+    controladores, histogramas); sin él, desde que se guardó
+    (líneas base, redirecciones: el valor envejece aunque se lea).
 
-                response = session.request(
-                    method,
-                    url,
-                    timeout=TIMEOUT
-                )
+    Las entradas caducadas se purgan al guardar otras nuevas.
+    `on_evict` recibe cada valor descartado (por tope, TTL
+    o clear()), fuera del lock: p. ej. cerrar un adaptador.
 
-                dt = time.time() - t0
+    Seguro entre hilos.
+    """
 
+    def __init__(self, maxsize=SCANNER_REGISTRY_SIZE, ttl=SCANNER_REGISTRY_TTL,
+                 refresh=True, on_evict=None):
 
-                # =========================
-                # FILTRO SUAVE DE RUIDO
-                # =========================
+        self.maxsize = maxsize
 
-                if (
-                    0 < dt < TIMEOUT
-                ):
-                    timings.append(dt)
+        self.ttl = ttl
 
+        self.refresh = refresh
 
-            except Exception:
+        self.on_evict = on_evict
 
-                errors += 1
+        self._entries = OrderedDict()
 
-                continue
+        self._dropped = []
 
+        self._lock = threading.Lock()
 
-        return timings, errors
 
+    def _drop(self, value):
 
+        if self.on_evict is not None:
+            self._dropped.append(value)
 
-    # =====================================================
-    # WARM-UP
-    # =====================================================
 
-    try:
+    def _evicted(self):
+        """
+        Entrega a `on_evict` lo descartado. Sin el lock tomado.
+        """
 
-        session.get(
-            url,
-            timeout=TIMEOUT
-        )
+        if self.on_evict is None:
+            return
 
-    except Exception:
+        with self._lock:
+            dropped, self._dropped = self._dropped, []
 
-        pass
+        for value in dropped:
+            self.on_evict(value)
 
 
+    def _expired(self, entry, now):
 
-    # =====================================================
-    # MEDICIÓN MULTIMÉTODO
-    # =====================================================
+        return bool(self.ttl) and now - entry[0] > self.ttl
 
-    g, g_errors = measure(
-        "GET"
-    )
 
-    h, h_errors = measure(
-        "HEAD"
-    )
+    def _entry(self, key, now):
+        """
+        (stamp, valor) vigente de `key` o None. Con el lock tomado.
+        """
 
-    o, o_errors = measure(
-        "OPTIONS"
-    )
+        entry = self._entries.get(key)
 
+        if entry is None:
+            return None
 
+        if self._expired(entry, now):
 
-    # =====================================================
-    # FALLBACK SEGURO
-    # =====================================================
+            del self._entries[key]
 
-    if not g or not o:
+            self._drop(entry[1])
 
-        return {
+            return None
 
-            "get_avg": None,
 
-            "head_avg": None,
+        self._entries.move_to_end(key)
 
-            "opt_avg": None,
+        if self.refresh:
+            self._entries[key] = (now, entry[1])
 
-            "jitter": None,
+        return entry
 
-            "jitter_high": False,
 
-            "method_gap": False,
+    def _store(self, key, value, now):
 
-            "signals": [
-                "insufficient_samples"
-            ]
+        old = self._entries.get(key)
 
-        }
+        if old is not None and old[1] is not value:
+            self._drop(old[1])
 
+        self._entries[key] = (now, value)
 
+        self._entries.move_to_end(key)
 
-    # =====================================================
-    # MÉTRICAS BASE
-    # =====================================================
+        #
+        # Las más antiguas van delante: se purgan mientras caduquen
+        # y, después, hasta volver al tope.
+        #
 
-    get_avg = statistics.mean(
-        g
-    )
+        while self._entries:
 
-    opt_avg = statistics.mean(
-        o
-    )
+            oldest = next(iter(self._entries.values()))
 
-    head_avg = (
-        statistics.mean(h)
-        if h
-        else 0
-    )
+            if not (
+                len(self._entries) > self.maxsize
+                or self._expired(oldest, now)
+            ):
+                break
 
+            self._drop(self._entries.popitem(last=False)[1][1])
 
-    jitter = (
 
-        statistics.pstdev(g)
+    def get(self, key, default=None):
 
-        if len(g) > 1
+        with self._lock:
+            entry = self._entry(key, time.time())
 
-        else 0
+        self._evicted()
 
-    )
+        return default if entry is None else entry[1]
 
 
-    gap = abs(
-        get_avg -
-        opt_avg
-    )
+    def __contains__(self, key):
 
+        with self._lock:
+            entry = self._entry(key, time.time())
 
+        self._evicted()
 
-    # =====================================================
-    # DISPERSIÓN TEMPORAL
-    # =====================================================
+        return entry is not None
 
-    get_range = (
 
-        max(g) -
-        min(g)
+    def __setitem__(self, key, value):
 
-        if g
+        with self._lock:
+            self._store(key, value, time.time())
 
-        else 0
+        self._evicted()
 
-    )
 
+    def setdefault(self, key, value):
 
-    method_latency = {
+        with self._lock:
 
-        "GET_vs_HEAD":
+            now = time.time()
 
-            abs(
-                get_avg -
-                head_avg
-            )
-            if head_avg
-            else None,
+            entry = self._entry(key, now)
 
+            if entry is None:
+                self._store(key, value, now)
 
-        "GET_vs_OPTIONS":
+        self._evicted()
 
-            gap
+        return value if entry is None else entry[1]
 
-    }
 
+    def pop(self, key, default=None):
 
+        with self._lock:
 
-    # =====================================================
-    # LECTURA SEMÁNTICA
-    # =====================================================
+            entry = self._entries.pop(key, None)
 
-    signals = []
+            return default if entry is None else entry[1]
 
 
-    if jitter > JITTER_THRESHOLD:
+    def clear(self):
 
-        signals.append(
-            "timing_instability"
-        )
+        with self._lock:
 
+            for _, value in self._entries.values():
+                self._drop(value)
 
-    if gap > 0.6:
+            self._entries.clear()
 
-        signals.append(
-            "method_processing_gap"
-        )
+        self._evicted()
 
 
-    if (
-        head_avg
-        and
-        head_avg < get_avg * 0.5
-    ):
+    def __len__(self):
 
-        signals.append(
-            "head_optimized"
-        )
+        with self._lock:
+            return len(self._entries)
 
 
-    if opt_avg > get_avg * 1.3:
+# ------------------------ SCANNER ---------------------------------
+class Scanner:
+    """
+    Motor reutilizable: ajustes, registros por host y pool de sesiones.
+
+    Pensado para embeberse (workers, notebooks) y para miles de scans:
+    - los ajustes sustituyen a la CONFIG del módulo solo para este
+      Scanner (Scanner(timing_samples=5, timeout=4))
+    - breakers, controladores AIMD, cuotas, líneas base de host,
+      cadenas de redirección, la cache DNS y los histogramas de
+      latencia por URL viven aquí, no en el módulo, acotados
+      (BoundedRegistry: SCANNER_REGISTRY_SIZE entradas,
+      SCANNER_REGISTRY_TTL segundos)
+    - todas sus sesiones comparten un adaptador: el keep-alive
+      y las sesiones TLS sobreviven de un scan a otro
+
+    Seguro entre hilos: cada scan toma su propia sesión del pool.
+    `caches=False` desactiva las caches (líneas base y redirecciones).
+    """
 
-        signals.append(
-            "options_heavy_logic"
-        )
+    def __init__(self, pool_size=SCANNER_POOL_SIZE, caches=True, **settings):
 
+        unknown = set(settings) - set(scanner_defaults())
 
-    if (
-        jitter < 0.15
-        and
-        gap < 0.2
-    ):
+        if unknown:
+            raise TypeError(
+                f"unknown Scanner settings: {', '.join(sorted(unknown))}"
+            )
 
-        signals.append(
-            "uniform_backend_path"
-        )
+        self.overrides = settings
 
+        self.pool_size = pool_size
 
+        self.caches = caches
 
-    # =====================================================
-    # NUEVAS SEÑALES SOC
-    # =====================================================
+        self._breakers = BoundedRegistry()
+        self._limiters = BoundedRegistry()
 
-    behavior = {
+        #
+        # Las cuotas no caducan: expirar una reiniciaría
+        # el presupuesto del scope.
+        #
 
-        "stable_response":
+        self._quotas = {}
 
-            jitter < JITTER_THRESHOLD,
+        self._baselines = BoundedRegistry(refresh=False)
+        self._redirects = BoundedRegistry(refresh=False)
+        self._key_locks = {}
 
+        self._latency = BoundedRegistry()
 
-        "high_variance":
+        #
+        # Adaptadores fijados a un backend: cada uno retiene sus
+        # sockets keep-alive, se cierran al salir del registro.
+        #
 
-            get_range > 1.0,
+        self._pinned = BoundedRegistry(
+            maxsize=SCANNER_PINNED_SIZE,
+            ttl=SCANNER_PINNED_TTL,
+            on_evict=lambda adapter: adapter.close()
+        )
 
+        self._calibration = None
+        self._calibration_lock = threading.Lock()
+        self._loopback = None
 
-        "method_divergence":
+        self.active = 0
 
-            gap > 0.6,
+        self.dns = DNSCache()
 
+        self.tls = TLSSessionCache()
 
-        "possible_cache_layer":
+        self.transport = None
 
-            (
-                head_avg
-                and
-                head_avg < get_avg * 0.5
-            ),
+        self._adapter = None
 
+        self._idle = []
 
-        "backend_consistent":
+        self._lock = threading.Lock()
 
-            (
-                jitter < 0.15
-                and
-                gap < 0.2
-            )
 
-    }
+    @property
+    def adapter(self):
+        """
+        Transporte compartido por las sesiones del Scanner.
 
+        transport="h2" usa HTTP2Adapter; sin httpx[http2] instalado
+        se avisa y se sigue con HTTP/1.1.
+        """
 
+        with self._lock:
 
-    # =====================================================
-    # PERFIL TEMPORAL
-    # =====================================================
+            if self._adapter is None:
 
-    if (
-        jitter < 0.15
-        and gap < 0.2
-    ):
+                self.transport = self.settings["transport"]
 
-        profile = "predictable"
+                if self.transport == "h2" and httpx is None:
 
+                    log.warning(
+                        "transport h2 requires httpx[http2]; falling back to h1"
+                    )
 
-    elif jitter > JITTER_THRESHOLD:
+                    self.transport = "h1"
 
-        profile = "dynamic"
 
+                if self.transport == "h2":
 
-    else:
+                    self._adapter = HTTP2Adapter()
 
-        profile = "mixed"
+                else:
 
+                    self._adapter = DNSCacheAdapter(
+                        self.dns,
+                        tls=self.tls,
+                        max_retries=0,
+                        pool_connections=SCANNER_POOL_HOSTS,
+                        pool_maxsize=SCANNER_POOL_MAXSIZE
+                    )
 
+            return self._adapter
 
-    # =====================================================
-    # RETORNO COMPATIBLE
-    # =====================================================
 
-    return {
+    @property
+    def settings(self):
 
+        return dict(
+            scanner_defaults(),
+            **self.overrides
+        )
 
-        # originales
 
-        "get_avg":
-            round(get_avg, 3),
+    # =====================================================
+    # REGISTROS POR HOST / SCOPE
+    # =====================================================
 
+    def breaker(self, url):
+        """
+        Breaker del origen de `url` (esquema, host, puerto):
+        un puerto caído no corta los demás del mismo host.
+        """
 
-        "head_avg":
-            round(head_avg, 3),
+        key = origin(url)
 
+        with self._lock:
 
-        "opt_avg":
-            round(opt_avg, 3),
+            breaker = self._breakers.get(key)
 
+            if breaker is None:
 
-        "jitter":
-            round(jitter, 3),
+                settings = self.settings
 
+                breaker = self._breakers[key] = CircuitBreaker(
+                    settings["breaker_threshold"],
+                    settings["breaker_cooldown"]
+                )
 
-        "jitter_high":
-            jitter > JITTER_THRESHOLD,
+            return breaker
 
 
-        "method_gap":
-            gap > 0.6,
+    def limiter(self, url):
+        """
+        Controlador AIMD del origen de `url` (esquema, host, puerto).
+        """
 
+        key = origin(url)
 
+        with self._lock:
 
-        "samples":
+            limiter = self._limiters.get(key)
 
-            {
+            if limiter is None:
+                limiter = self._limiters[key] = ConcurrencyController()
 
-                "get":
-                    len(g),
+            return limiter
 
 
-                "head":
-                    len(h),
+    def quota(self, scope, limit=None):
+        """
+        Cuota del scope (una por nombre).
 
+        Sin `limit` ni scope_request_budget no hay tope: devuelve None.
+        """
 
-                "options":
-                    len(o)
+        limit = limit or self.settings["scope_request_budget"]
 
-            },
+        with self._lock:
 
+            if scope not in self._quotas:
 
-        "signals":
-            signals,
+                if not limit:
+                    return None
 
+                self._quotas[scope] = RequestQuota(limit)
 
+            return self._quotas[scope]
 
-        # nuevas capas
 
-        "statistics":
+    def _cached(self, store, key, fn, keep=None):
+        """
+        Valor de `store[key]`, calculado una sola vez aunque
+        varios hilos lo pidan a la vez (lock por clave).
 
-            {
+        Un fallo (None) no se guarda: el siguiente lo reintenta;
+        tampoco un valor que `keep(valor)` rechace.
+        El lock por clave se descarta al terminar el cálculo.
+        """
 
-                "get_range":
-                    round(get_range, 3),
+        if not self.caches:
+            return fn()
 
 
-                "method_latency":
+        value = store.get(key)
 
-                    method_latency
+        if value is not None:
+            return value
 
-            },
 
+        with self._lock:
 
-        "errors":
+            lock = self._key_locks.setdefault(
+                (id(store), key),
+                threading.Lock()
+            )
 
-            {
 
-                "get":
-                    g_errors,
+        with lock:
 
+            try:
 
-                "head":
-                    h_errors,
+                value = store.get(key)
 
+                if value is None:
 
-                "options":
-                    o_errors
+                    value = fn()
 
-            },
+                    if value is not None and (keep is None or keep(value)):
+                        store[key] = value
 
+                return value
 
-        "behavior":
+            finally:
 
-            behavior,
+                with self._lock:
+                    self._key_locks.pop((id(store), key), None)
 
 
-        "profile":
+    def baseline(self, session, url):
+        """
+        Línea base del host, medida una vez y reutilizada.
 
-            profile,
+        No se guarda si la sesión quedó diferida (Retry-After)
+        durante la medición.
+        """
 
+        return self._cached(
+            self._baselines,
+            host_key(url),
+            lambda: measure_host_baseline(session, url),
+            keep=lambda baseline: not session.deferred
+        )
 
-        "meta":
 
-            {
+    def redirects(self, session, url):
+        """
+        Cadena de redirecciones de `url`, resuelta una vez y reutilizada.
 
-                "analysis":
-                    "http_timing_behavior",
+        No se guarda una cadena cortada por un Retry-After diferido
+        o terminada en 429/5xx: su final_url aún no es el destino.
+        """
 
+        def complete(chain):
 
-                "correlation_ready":
-                    True,
+            status = chain["chain"][-1]["status"]
 
+            return (
+                not session.deferred
+                and status != 429
+                and status < 500
+            )
 
-                "execution":
-                    "controlled"
 
-            }
+        return self._cached(
+            self._redirects,
+            url,
+            lambda: resolve_redirects(session, url),
+            keep=complete
+        )
 
-    }
-# ------------------------ SUPERFICIE BACKEND---------------------
-def backend_surface(session, url):
-    """
-    Análisis avanzado de superficie backend.
 
-    Filosofía:
-    - activo controlado
-    - pasivo contextual
-    - sin modificación de estado
+    def pinned(self, address):
+        """
+        Adaptador con las conexiones fijadas a `address` (uno por
+        dirección, reutilizado entre scans; como mucho
+        SCANNER_PINNED_SIZE abiertos). Siempre HTTP/1.1:
+        HTTP2Adapter no pasa por DNSCache.
+        """
 
-    Observa:
-    - métodos declarados
-    - comportamiento real
-    - capas intermedias
-    - coherencia backend
-    - exposición operativa
-    """
+        with self._lock:
 
-    signals = []
-    methods = []
-    unusual = []
+            adapter = self._pinned.get(address)
 
-    observations = {}
-    stimuli = []
+            if adapter is None:
 
+                adapter = self._pinned[address] = DNSCacheAdapter(
+                    PinnedDNS(self.dns, address),
+                    tls=self.tls,
+                    max_retries=0,
+                    pool_connections=SCANNER_POOL_HOSTS,
+                    pool_maxsize=SCANNER_POOL_MAXSIZE
+                )
 
-    # =====================================================
-    # OPTIONS PRIMARIO
-    # =====================================================
+            return adapter
 
-    try:
 
-        opt = session.options(
-            url,
-            timeout=TIMEOUT
-        )
+    def record_latency(self, url, hists):
+        """
+        Funde los histogramas por método de un timing_diff con los
+        acumulados de `url` y devuelve el resumen acumulado.
+        """
 
-        allow = (
-            opt.headers.get("Allow", "")
-            or
-            opt.headers.get("allow", "")
-        )
+        with self._lock:
 
-        observations["options_status"] = (
-            opt.status_code
-        )
+            merged = self._latency.setdefault(url, {})
 
-        observations["allow_header"] = (
-            allow
-        )
+            for method, hist in hists.items():
 
+                if method in merged:
+                    merged[method].merge(hist)
+                else:
+                    merged[method] = hist.copy()
 
-    except Exception:
 
-        return {
+            return {
+                method: hist.summary()
+                for method, hist in merged.items()
+            }
 
-            "methods": [],
-            "unusual": [],
 
-            "risk_profile":
-                "unknown",
+    def latency(self, url):
+        """
+        Histogramas acumulados de `url` (copias), por método.
+        """
 
-            "signals":
-                [
-                    "options_unavailable"
-                ]
+        with self._lock:
 
-        }
+            return {
+                method: hist.copy()
+                for method, hist in self._latency.get(url, {}).items()
+            }
 
 
+    def calibration(self):
+        """
+        Overhead propio por petición (ver calibrate), medido contra
+        un servidor loopback bajo la carga actual del Scanner.
 
-    # =====================================================
-    # NORMALIZACIÓN
-    # =====================================================
+        Se vuelve a medir cuando tiene más de `calibration_interval`
+        segundos: en batch se repite periódicamente con la
+        concurrencia real. Intervalo None / 0 → sin calibración.
+        """
 
-    methods = sorted({
+        interval = self.settings["calibration_interval"]
 
-        m.strip().upper()
+        if not interval:
+            return None
 
-        for m in allow.split(",")
 
-        if m.strip()
+        with self._calibration_lock:
 
-    })
+            if (
+                self._calibration is None
+                or time.time() - self._calibration[0] > interval
+            ):
 
+                try:
 
-    safe_methods = {
+                    if self._loopback is None:
+                        self._loopback = LoopbackServer()
 
-        "GET",
-        "HEAD",
-        "OPTIONS"
+                    result = calibrate(
+                        self.adapter,
+                        self._loopback.url,
+                        self.settings["calibration_samples"],
+                        active=self.active,
+                        timeout=self.settings["timeout"]
+                    )
 
-    }
+                except Exception as e:
 
+                    log.debug("calibration failed: %s", e)
 
-    common_methods = {
+                    result = None
 
-        "POST",
-        "PUT",
-        "DELETE",
-        "PATCH"
 
-    }
+                self._calibration = (time.time(), result)
 
 
-    exotic_methods = {
+            return self._calibration[1]
 
-        "TRACE",
-        "CONNECT",
-        "DEBUG",
-        "PROPFIND",
-        "PROPPATCH",
-        "MKCOL",
-        "COPY",
-        "MOVE",
-        "LOCK",
-        "UNLOCK"
 
-    }
+    def resolve(self, url, cancel=None, scope=None, meter=None):
+        """
+        redirects() con una sesión del pool (fuera de un scan).
 
+        Consume la cuota del scope (por defecto, el host) como
+        cualquier scan; con `meter` (TrafficMeter) su tráfico
+        queda contabilizado ahí.
+        """
 
-    unusual = [
+        session = self.acquire()
 
-        m
+        session.layer = "redirect"
 
-        for m in methods
+        session.cancel = cancel
 
-        if m not in (
-            safe_methods
-            |
-            common_methods
+        session.quota = self.quota(
+            scope or (urlparse(url).hostname or "").lower()
         )
 
-    ]
+        if meter is not None:
+            session.meter = meter
+
+        try:
+            return self.redirects(session, url)
 
+        finally:
+            self.release(session)
 
 
     # =====================================================
-    # LECTURA DE MÉTODOS EXPUESTOS
+    # POOL DE SESIONES
     # =====================================================
 
-    if "TRACE" in methods:
+    def acquire(self):
 
-        signals.append(
-            "trace_enabled"
-        )
+        with self._lock:
 
+            self.active += 1
 
-    if (
-        common_methods
-        &
-        set(methods)
-    ):
+            session = (
+                self._idle.pop()
+                if self._idle
+                else None
+            )
 
-        signals.append(
-            "state_changing_methods"
-        )
 
+        if session is None:
+            return build_session(self)
 
-    if any(
-        m in exotic_methods
-        for m in methods
-    ):
+        session.reset(self)
 
-        signals.append(
-            "exotic_methods_exposed"
-        )
+        return session
 
 
-    if not methods:
+    def release(self, session):
 
-        signals.append(
-            "allow_header_empty"
-        )
+        #
+        # Sin close(): el adaptador (y sus conexiones) es compartido.
+        #
 
+        with self._lock:
 
-    if "OPTIONS" not in methods:
+            self.active -= 1
 
-        signals.append(
-            "options_not_advertised"
-        )
+            if len(self._idle) < self.pool_size:
+                self._idle.append(session)
 
 
+    def close(self):
 
-    # =====================================================
-    # ESTÍMULO HEAD VS GET
-    # =====================================================
+        with self._lock:
 
-    r_get = None
+            self._idle = []
 
-    try:
+            adapter, self._adapter = self._adapter, None
 
-        stimuli.append(
-            "HEAD_GET_COMPARISON"
-        )
 
-        r_head = session.head(
-            url,
-            timeout=TIMEOUT
-        )
+        if adapter is not None:
+            adapter.close()
 
 
-        r_get = session.get(
-            url,
-            timeout=TIMEOUT
-        )
+        self._pinned.clear()
 
 
-        observations["head_status"] = (
-            r_head.status_code
-        )
+        with self._calibration_lock:
 
-        observations["get_status"] = (
-            r_get.status_code
-        )
+            loopback, self._loopback = self._loopback, None
 
+            self._calibration = None
 
-        if (
-            r_head.status_code
-            !=
-            r_get.status_code
-        ):
 
-            signals.append(
-                "method_status_divergence"
-            )
+        if loopback is not None:
+            loopback.close()
 
 
-    except Exception:
+    # =====================================================
+    # SCAN
+    # =====================================================
 
-        pass
+    def scan_iter(self, url, **kwargs):
 
+        return scan_iter(url, scanner=self, **kwargs)
 
 
-    # =====================================================
-    # ESTÍMULO METHOD OVERRIDE
-    # =====================================================
+    def scan(self, url, **kwargs):
 
-    try:
+        return scan(url, scanner=self, **kwargs)
 
-        stimuli.append(
-            "METHOD_OVERRIDE_CHECK"
-        )
 
+    def batch(self, targets, **kwargs):
 
-        r_override = session.post(
+        return batch_scan(targets, scanner=self, **kwargs)
 
-            url,
 
-            headers={
+_default_scanner = None
+_default_scanner_guard = threading.Lock()
 
-                "X-HTTP-Method-Override":
-                    "DELETE"
 
-            },
+def default_scanner():
+    """
+    Scanner compartido por la API de módulo (scan, batch_scan, CLI).
+    Se crea en el primer uso.
+    """
 
-            timeout=TIMEOUT
+    global _default_scanner
 
-        )
+    with _default_scanner_guard:
 
+        if _default_scanner is None:
+            _default_scanner = Scanner()
 
-        observations["override_status"] = (
-            r_override.status_code
-        )
+        return _default_scanner
 
 
-        if r_override.status_code not in (
-            400,
-            405
-        ):
+# ------------------------ JOURNAL DE CHECKPOINT ---------------------------------
+class ScanJournal:
+    """
+    Journal de checkpoint de un lote (NDJSON, solo-append).
 
-            signals.append(
-                "method_override_accepted"
-            )
+    Eventos:
+        started    → target entregado a un worker
+        completed  → report final del target (escritura durable)
 
+    Al reanudar:
+    - los `completed` se saltan
+    - los `started` sin `completed` (interrumpidos) vuelven primero a la cola
 
-    except Exception:
+    Sin `resume`, un journal existente con contenido no se pisa
+    salvo con `overwrite=True` (FileExistsError).
+    """
 
-        pass
+    def __init__(self, path, resume=False, overwrite=False):
 
+        self.path = path
 
+        self.done = set()
 
-    # =====================================================
-    # DETECCIÓN CAPAS INTERMEDIAS
-    # =====================================================
+        self.interrupted = []
 
-    proxy_headers = (
+        self._lock = threading.Lock()
 
-        "Via",
-        "X-Forwarded-For",
-        "X-Proxy",
-        "X-Gateway",
-        "X-Cache",
-        "CF-Ray",
-        "Server-Timing"
 
-    )
+        if resume and os.path.exists(path):
+
+            self._load()
+
+            #
+            # Un crash pudo dejar la última línea a medias.
+            #
 
+            with open(path, "rb") as fh:
 
-    try:
+                fh.seek(0, os.SEEK_END)
 
-        if r_get:
+                if fh.tell():
 
-            detected = [
+                    fh.seek(-1, os.SEEK_END)
 
-                h
+                    truncated = fh.read(1) != b"\n"
 
-                for h in proxy_headers
+                else:
 
-                if h in r_get.headers
+                    truncated = False
 
-            ]
 
+            self._fh = open(path, "a", encoding="utf-8")
 
-            if detected:
+            if truncated:
+                self._fh.write("\n")
 
-                signals.append(
-                    "gateway_or_proxy_detected"
+        else:
+
+            if (
+                not overwrite
+                and os.path.exists(path)
+                and os.path.getsize(path) > 0
+            ):
+                raise FileExistsError(
+                    f"journal {path} already has checkpoints "
+                    "(use --resume to continue or --fresh to overwrite)"
                 )
 
+            self._fh = open(path, "w", encoding="utf-8")
 
-                observations[
-                    "proxy_headers"
-                ] = detected
 
+    def _load(self):
 
-    except Exception:
+        started = {}
 
-        pass
+        with open(self.path, encoding="utf-8") as fh:
 
+            for line in fh:
 
+                try:
+                    entry = json.loads(line)
 
-    # =====================================================
-    # DECLARACIÓN VS REALIDAD
-    # =====================================================
+                except ValueError:
+                    continue
 
-    try:
 
-        if (
+                if entry.get("event") == "started":
+                    started[entry["target"]] = True
 
-            "GET" not in methods
+                elif entry.get("event") == "completed":
+                    self.done.add(entry["target"])
 
-            and
 
-            r_get
+        self.interrupted = [
+            target
+            for target in started
+            if target not in self.done
+        ]
 
-            and
 
-            r_get.status_code < 400
+    def _write(self, entry, durable=False):
 
-        ):
+        with self._lock:
 
-            signals.append(
-                "allow_mismatch_real_behavior"
+            self._fh.write(
+                json.dumps(entry, default=str) + "\n"
             )
 
+            self._fh.flush()
 
-    except Exception:
+            if durable:
+                os.fsync(self._fh.fileno())
 
-        pass
 
+    def started(self, target):
 
+        self._write({
+            "event": "started",
+            "target": target,
+            "ts": time.time()
+        })
 
-    # =====================================================
-    # PERFIL SEMÁNTICO
-    # =====================================================
 
-    if (
+    def completed(self, report):
 
-        any(
-            m in exotic_methods
-            for m in methods
+        self._write(
+            {
+                "event": "completed",
+                "target": report["url"],
+                "ts": time.time(),
+                "report": report
+            },
+            durable=True
         )
 
-        or
+        self.done.add(report["url"])
 
-        "method_override_accepted"
-        in signals
 
-    ):
+    def pending(self, targets):
+        """
+        Cola reanudada: interrumpidos primero,
+        después lo que aún no se completó.
+        """
 
-        risk_profile = (
-            "elevated"
-        )
+        queued = set(self.interrupted)
 
+        yield from self.interrupted
 
-    elif (
+        for target in targets:
 
-        common_methods
-        &
-        set(methods)
+            if target not in self.done and target not in queued:
+                yield target
 
-    ):
 
-        risk_profile = (
-            "moderate"
-        )
+    def close(self):
 
+        with self._lock:
 
-    elif methods:
+            if self._fh.closed:
+                return
 
-        risk_profile = (
-            "low"
-        )
+            self._fh.flush()
 
+            os.fsync(self._fh.fileno())
 
-    else:
+            self._fh.close()
 
-        risk_profile = (
-            "unknown"
-        )
 
+# ------------------------ INGESTA DE TARGETS ---------------------------------
+def canonical_url(url):
+    """
+    validate_url() + forma canónica para deduplicar:
+    esquema y host en minúsculas, sin puerto por defecto.
+    """
 
+    scheme, sep, rest = url.strip().partition("://")
 
-    # =====================================================
-    # LECTURA INVERSA BACKEND
-    # =====================================================
+    parsed = urlparse(validate_url(scheme.lower() + sep + rest))
 
-    backend_profile = {
+    host = parsed.hostname.rstrip(".")
 
-        "method_surface":
+    if ":" in host:
+        host = f"[{host}]"
 
-            len(methods),
+    if parsed.port and parsed.port != default_port(parsed.scheme):
+        host = f"{host}:{parsed.port}"
 
+    return urlunparse(parsed._replace(netloc=host))
 
-        "declared_complexity":
 
-            (
-                "high"
-                if len(methods) > 6
-                else
-                "normal"
-            ),
+def dedupe_key(url):
+    """
+    Clave de deduplicación: sin esquema cuando el puerto es el
+    de por defecto, así los gemelos http/https colapsan.
 
+    `url` en forma canónica (canonical_url): el netloc solo lleva
+    puerto si no es el de por defecto, y entonces el esquema
+    se conserva (http://h:8443 y https://h:8443 son servicios
+    distintos).
+    """
 
-        "stateful_behavior":
+    parsed = urlparse(url)
 
-            bool(
-                common_methods
-                &
-                set(methods)
-            ),
+    prefix = (
+        f"{parsed.scheme}://"
+        if safe(lambda: parsed.port)
+        else ""
+    )
 
+    return hashlib.blake2b(
+        f"{prefix}{parsed.netloc}{parsed.path}?{parsed.query}".encode(),
+        digest_size=16
+    ).digest()
 
-        "intermediate_layer_hint":
 
-            (
-                "possible"
-                if
-                "gateway_or_proxy_detected"
-                in signals
+class SeenSet:
+    """
+    Conjunto de vistos con memoria acotada.
 
-                else
-                "unknown"
-            )
+    Hasta `capacity` claves: conjunto exacto de digests de 16 bytes.
+    Después, las claves nuevas van a un filtro de Bloom dimensionado
+    para `bloom_capacity` con tasa de falsos positivos `error`
+    (un falso positivo descarta un target como duplicado).
+    """
 
-    }
+    def __init__(self, capacity=INGEST_EXACT_CAPACITY,
+                 bloom_capacity=INGEST_BLOOM_CAPACITY, error=INGEST_BLOOM_ERROR):
 
+        self.capacity = capacity
 
+        self.bloom_capacity = bloom_capacity
 
-    # =====================================================
-    # RETORNO COMPATIBLE
-    # =====================================================
+        self.error = error
 
-    return {
+        self._exact = set()
 
+        self._bits = None
 
-        # originales
+        self.spilled = 0
 
-        "methods":
-            methods,
 
+    def _spill(self):
 
-        "unusual":
-            unusual,
+        size = int(
+            -self.bloom_capacity * math.log(self.error)
+            / (math.log(2) ** 2)
+        )
 
+        self._size = max(8, size)
 
-        "risk_profile":
-            risk_profile,
+        self._hashes = max(
+            1,
+            round(self._size / self.bloom_capacity * math.log(2))
+        )
 
+        self._bits = bytearray(self._size // 8 + 1)
 
-        "signals":
-            signals,
 
+    def _positions(self, digest):
 
+        #
+        # Doble hashing (Kirsch–Mitzenmacher) sobre el digest.
+        #
 
-        # enriquecimiento SOC
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
 
-        "observations":
-            observations,
+        for i in range(self._hashes):
+            yield (h1 + i * h2) % self._size
 
 
-        "stimuli":
-            stimuli,
+    def __contains__(self, digest):
 
+        if digest in self._exact:
+            return True
 
-        "backend_profile":
-            backend_profile,
+        if self._bits is None:
+            return False
 
+        return all(
+            self._bits[pos // 8] & (1 << pos % 8)
+            for pos in self._positions(digest)
+        )
 
-        "meta":
 
-            {
+    def add(self, digest):
+        """
+        Añade `digest`; devuelve False si ya estaba (o eso parece).
+        """
 
-                "analysis":
-                    "backend_behavior_surface",
+        if digest in self._exact:
+            return False
 
 
-                "state_change":
-                    False,
+        if len(self._exact) < self.capacity:
 
+            self._exact.add(digest)
 
-                "correlation_ready":
-                    True
+            return True
 
-            }
 
-    }
+        if self._bits is None:
+            self._spill()
 
 
+        new = False
 
-# ------------------------ SCORING (ADVANCED) ----------------------------
-def score(sig):
+        for pos in self._positions(digest):
+
+            byte, bit = divmod(pos, 8)
+
+            if not self._bits[byte] & (1 << bit):
+
+                self._bits[byte] |= 1 << bit
+
+                new = True
+
+
+        self.spilled += new
+
+        return new
+
+
+def ingest_targets(lines, window=INGEST_WINDOW, reject=None, seen=None):
     """
-    Scoring heurístico multidimensional.
+    Ingesta en streaming de una lista de targets.
 
-    No mide vulnerabilidades.
-    Mide concentración de señales:
-    - comportamiento HTTP
-    - dinámica temporal
-    - arquitectura frontend
-    - superficie backend
-    - coherencia entre capas
+    - valida y canoniza cada línea (canonical_url)
+    - descarta duplicados con memoria acotada (SeenSet)
+    - agrupa por host dentro de ventanas de `window` targets,
+      para que los scans del mismo host vayan seguidos
 
-    Filosofía:
-    Una señal aislada es ruido.
-    Varias capas alineadas forman evidencia.
+    `reject(lineno, line, reason)` recibe cada línea descartada
+    (`duplicate` o el motivo de validate_url).
+    Las líneas vacías y los comentarios (#) se ignoran.
     """
 
-    score = 0
-    correlations = 0
+    seen = seen or SeenSet()
 
-    http = sig.get("http", {})
-    timing = sig.get("timing", {})
-    dom = sig.get("dom", {})
-    surface = sig.get("surface", {})
+    batch = {}
+    pending = 0
 
 
-    # =====================================================
-    # HTTP SEMANTICS
-    # =====================================================
+    def flush():
 
-    if http.get("hash_change"):
-        score += 3
+        for urls in batch.values():
+            yield from urls
 
-    if http.get("etag"):
-        score += 1
+        batch.clear()
 
 
-    cache = http.get("cache_signals", {})
+    for lineno, line in enumerate(lines, 1):
 
-    if cache.get("cache_ambiguous"):
-        score += 1
+        line = line.strip()
 
+        if not line or line.startswith("#"):
+            continue
 
-    if http.get("semantic_mismatch"):
-        score += 2
 
+        try:
+            url = canonical_url(line)
 
+        except ValueError as e:
 
-    # =====================================================
-    # TIMING BEHAVIOR
-    # =====================================================
+            if reject:
+                reject(lineno, line, str(e))
 
-    if timing.get("jitter_high"):
-        score += 2
+            continue
 
-    if timing.get("method_gap"):
-        score += 2
 
+        if not seen.add(dedupe_key(url)):
 
-    timing_signals = timing.get("signals", [])
+            if reject:
+                reject(lineno, line, "duplicate")
 
-    if "method_processing_gap" in timing_signals:
-        score += 2
+            continue
 
 
-    if "options_heavy_logic" in timing_signals:
-        score += 1
+        batch.setdefault(
+            urlparse(url).hostname,
+            []
+        ).append(url)
 
+        pending += 1
 
-    if "uniform_backend_path" in timing_signals:
-        score += 1
 
+        if pending >= window:
 
+            yield from flush()
 
-    # =====================================================
-    # DOM / FRONTEND INTELLIGENCE
-    # =====================================================
+            pending = 0
 
-    hidden = dom.get("hidden_inputs", 0)
 
-    if hidden:
-        score += 2
+    yield from flush()
 
 
-    if dom.get("hidden_sensitive"):
-        score += 3
+# ------------------------ SWEEP DE VIDA ---------------------------------
+_sweep_local = threading.local()
 
 
-    if dom.get("js_network"):
-        score += 2
+def sweep_session(scanner=None):
+    """
+    Sesión ligera por hilo (y por Scanner) para el sweep.
 
+    Mismos headers que build_session(), sin reintentos
+    (`retries` = 0 en sus ajustes; los reintentos viven en
+    ObservedSession, no en el adaptador): un host muerto
+    debe costar un solo intento.
 
-    dom_signals = dom.get("signals", [])
+    Se reinicia en cada llamada: el estado del target anterior
+    (p. ej. un Retry-After diferido) no pasa al siguiente.
+    """
 
+    scanner = scanner or default_scanner()
 
-    if "spa_frontend" in dom_signals:
-        score += 1
+    sessions = _sweep_local.__dict__.setdefault("sessions", {})
 
+    session = sessions.get(scanner)
 
-    if "logic_externalized" in dom_signals:
-        score += 1
+    if session is None:
 
+        session = build_session(scanner)
 
+        adapter = DNSCacheAdapter(
+            session.scanner.dns,
+            tls=session.scanner.tls,
+            max_retries=0
+        )
 
-    # =====================================================
-    # BACKEND SURFACE
-    # =====================================================
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
 
-    unusual = surface.get("unusual", [])
+        sessions[scanner] = session
 
-    if unusual:
-        score += 3
 
+    session.reset(scanner)
 
-    risk = surface.get("risk_profile")
+    session.settings = dict(
+        session.scanner.settings,
+        retries=0
+    )
 
+    return session
 
-    if risk == "elevated":
-        score += 2
 
-    elif risk == "moderate":
-        score += 1
+def probe_liveness(url, timeout=SWEEP_TIMEOUT, scanner=None, scope=None):
+    """
+    Clasificación rápida de un target: live / dead / redirected.
 
+    Un 429 (o un Retry-After) es un host vivo que limita:
+    `live` con reason `rate_limited`.
 
+    Coste máximo:
+    - una resolución DNS
+    - un HEAD sin seguir redirecciones
 
-    surface_signals = surface.get("signals", [])
+    El HEAD consume la cuota del scope (por defecto, el host)
+    y su tráfico queda en `traffic` (snapshot de TrafficMeter).
+    """
 
+    parsed = urlparse(url)
 
-    if "method_override_accepted" in surface_signals:
-        score += 3
+    session = sweep_session(scanner)
+
+    session.quota = session.scanner.quota(
+        scope or (parsed.hostname or "").lower()
+    )
 
+    session.meter = TrafficMeter()
 
-    if "gateway_or_proxy_detected" in surface_signals:
-        score += 1
+    result = {
+        "url": url,
+        "state": "dead",
+        "reason": None,
+        "addresses": [],
+        "status": None,
+        "location": None,
+        "elapsed": None,
+        "traffic": None
+    }
 
+    t0 = time.time()
 
 
     # =====================================================
-    # CORRELACIÓN MULTICAPA
+    # DNS
     # =====================================================
 
     #
-    # No buscamos indicadores.
-    # Buscamos comportamiento coherente.
+    # Por la cache DNS compartida: el escaneo profundo
+    # posterior encuentra el host ya resuelto.
     #
 
+    try:
+
+        result["addresses"] = sorted(
+            session.scanner.dns.resolve(parsed.hostname)
+        )
+
+    except Exception:
+
+        result["reason"] = "dns"
+
+        result["elapsed"] = round(time.time() - t0, 3)
+
+        return result
+
+
+    # =====================================================
+    # HEAD ÚNICO
+    # =====================================================
+
+    try:
+
+        response = session.head(
+            url,
+            timeout=timeout,
+            allow_redirects=False
+        )
 
-    if (
-        http.get("hash_change")
-        and dom.get("js_network")
-        and timing.get("method_gap")
-    ):
-        score += 3
-        correlations += 1
+        result["status"] = response.status_code
 
+        location = response.headers.get("Location")
 
+        if response.is_redirect and location:
 
-    if (
-        dom.get("hidden_sensitive")
-        and surface.get("methods")
-        and timing.get("method_gap")
-    ):
-        score += 3
-        correlations += 1
+            result["state"] = "redirected"
 
+            result["location"] = urljoin(
+                url,
+                location
+            )
 
+        else:
 
-    if (
-        http.get("semantic_mismatch")
-        and dom.get("js_network")
-    ):
-        score += 2
-        correlations += 1
+            result["state"] = "live"
 
 
+        if response.status_code == 429 or session.deferred:
+            result["reason"] = "rate_limited"
 
-    # =====================================================
-    # CONTEXTO SOC
-    # =====================================================
 
-    if correlations >= 3:
-        score += 3
+    except requests.exceptions.Timeout:
 
-    elif correlations == 2:
-        score += 2
+        result["reason"] = "timeout"
 
-    elif correlations == 1:
-        score += 1
+    except Exception as e:
 
+        result["reason"] = type(e).__name__
 
 
-    # =====================================================
-    # NORMALIZACIÓN
-    # =====================================================
+    result["elapsed"] = round(time.time() - t0, 3)
 
-    if score < 0:
-        score = 0
+    result["traffic"] = session.meter.snapshot()
 
+    return result
 
-    return score
 
-# ------------------------ INTERPRETACIÓN (ADVANCED) ----------------------
-def insights(sig):
+def sweep_targets(targets, workers=SWEEP_WORKERS, timeout=SWEEP_TIMEOUT, out=None,
+                  scanner=None, scope=None):
     """
-    Interpretación cognitiva multidimensional.
+    Pre-sweep de vida para listas grandes.
 
-    Traduce señales técnicas:
-        evento -> contexto -> significado operacional
+    Concurrencia alta, timeouts cortos y ventana acotada:
+    la lista se consume en streaming, nunca entera en memoria.
 
-    No confirma vulnerabilidades.
-    Explica comportamientos observables.
+    Produce resultados en orden de finalización y,
+    si se indica `out`, escribe cada clasificación como NDJSON.
 
-    Diseñado para:
-    - SOC analysis
-    - threat modeling
-    - arquitectura inversa
-    - lectura de superficie
+    Los HEAD salen por sesiones del `scanner` y consumen
+    la cuota de `scope` (ver probe_liveness()).
     """
 
-    out = []
+    sink = (
+        open(out, "a", encoding="utf-8")
+        if out
+        else None
+    )
 
-    http = sig.get("http", {})
-    timing = sig.get("timing", {})
-    dom = sig.get("dom", {})
-    surface = sig.get("surface", {})
+    pending = set()
 
+    try:
 
-    # =====================================================
-    # HTTP BEHAVIOR
-    # =====================================================
+        with ThreadPoolExecutor(max_workers=workers) as pool:
 
-    if http.get("hash_change"):
-        out.append(
-            "Respuesta variable detectada → existe comportamiento dinámico "
-            "(estado interno, personalización, experimentación o generación bajo demanda)."
-        )
+            for target in targets:
 
+                pending.add(
+                    pool.submit(probe_liveness, target, timeout, scanner, scope)
+                )
 
-    if http.get("etag"):
-        out.append(
-            "ETag presente → el sistema mantiene mecanismos de validación "
-            "de representación o cache consciente del recurso."
-        )
+                if len(pending) < workers * 2:
+                    continue
 
+                done, pending = wait(
+                    pending,
+                    return_when=FIRST_COMPLETED
+                )
 
-    cache = http.get("cache_signals", {})
+                for future in done:
 
-    if cache.get("cache_ambiguous"):
-        out.append(
-            "Política de cache poco evidente → posible lógica intermedia "
-            "entre cliente, proxy y aplicación."
-        )
+                    result = future.result()
 
+                    if sink:
+                        sink.write(json.dumps(result) + "\n")
 
-    if http.get("semantic_mismatch"):
-        out.append(
-            "Respuesta declarada y contenido no coinciden → revisar "
-            "coherencia entre capa HTTP y aplicación."
-        )
+                    yield result
 
 
+            for future in list(pending):
 
-    # =====================================================
-    # TEMPORAL INTELLIGENCE
-    # =====================================================
+                result = future.result()
 
-    if timing.get("method_gap"):
-        out.append(
-            "Métodos HTTP presentan comportamiento temporal diferente → "
-            "posibles rutas internas diferenciadas, middleware o controles condicionales."
-        )
+                if sink:
+                    sink.write(json.dumps(result) + "\n")
 
+                yield result
 
-    if "method_processing_gap" in timing.get("signals", []):
+    finally:
 
-        out.append(
-            "GET y OPTIONS parecen recorrer caminos distintos → "
-            "existe separación lógica entre capas de procesamiento."
-        )
+        if sink:
+            sink.close()
 
 
-    if "options_heavy_logic" in timing.get("signals", []):
+def batch_scan(targets, workers=BATCH_WORKERS, sweep=True, sweep_out=None, full=False,
+               journal=None, stop=None, grace=DRAIN_GRACE, scope=None, scanner=None,
+               deadline=None):
+    """
+    Escaneo por lotes.
 
-        out.append(
-            "OPTIONS muestra procesamiento elevado → "
-            "posible gateway, framework routing o capa intermedia activa."
-        )
+    Con `sweep` los targets pasan primero por sweep_targets()
+    y solo los `live` y `redirected` llegan a la cola del escaneo
+    profundo; los muertos quedan en la clasificación.
 
+    Antes de escanear, cada target resuelve su cadena de
+    redirecciones: los que llegan a una URL final ya reclamada
+    por otro target (en curso o ya entregado) no se escanean
+    y se entregan como
+    `meta.collapsed_into` (report mínimo).
 
-    if timing.get("jitter_high"):
+    El sweep y esa resolución consumen la cuota del scope y
+    su tráfico entra en el report del target
+    (`meta.traffic.preflight`).
 
-        out.append(
-            "Variación temporal elevada → comportamiento compatible con "
-            "balanceo, servicios distribuidos, colas o infraestructura dinámica."
-        )
+    Un target diferido por Retry-After vuelve a la cola cuando
+    vence su espera (hasta MAX_REQUEUES veces), reanudando
+    desde las capas ya completadas.
 
+    Con `journal` (ScanJournal) cada target queda registrado al
+    entregarse y al completarse. Si `stop` se activa, no se entrega
+    más trabajo: los scans en curso tienen `grace` segundos para
+    terminar y el resto se cancela; quedan como interrumpidos
+    en el journal.
 
+    Con la allowlist del Scanner, los targets fuera de scope se
+    descartan (y se registran) antes del sweep.
 
-    # =====================================================
-    # FRONTEND / DOM INTELLIGENCE
-    # =====================================================
+    `deadline` se aplica a cada scan (ver scan()).
 
-    if dom.get("hidden_sensitive"):
+    La calibración del overhead propio (Scanner.calibration) se
+    renueva cada `calibration_interval` segundos con los workers
+    en marcha: refleja la carga real del lote.
 
-        out.append(
-            "Elementos ocultos con información sensible aparente → "
-            "la aplicación mantiene estado interno o flujos multi-etapa."
-        )
+    Produce reports en orden de finalización.
+    """
 
+    scanner = scanner or default_scanner()
 
-    if dom.get("js_network"):
+    #
+    # El journal filtra antes del sweep: los completados
+    # no se vuelven a sondear al reanudar. Los interrumpidos
+    # que devuelve pasan también por el scope.
+    #
 
-        out.append(
-            "JavaScript genera comunicación activa → "
-            "la superficie funcional puede extenderse más allá del HTML visible."
-        )
+    if journal:
+        targets = journal.pending(targets)
 
+    targets = in_scope(targets, scanner)
 
-    dom_signals = dom.get("signals", [])
+    #
+    # Tráfico del sweep por URL, hasta que su scan lo recoge.
+    #
 
+    swept = {}
 
-    if "spa_frontend" in dom_signals:
+    def live(results):
 
-        out.append(
-            "Frontend SPA detectado → "
-            "la lógica principal probablemente reside en APIs y servicios auxiliares."
-        )
+        for result in results:
 
+            if result["state"] not in ("live", "redirected"):
+                continue
 
-    if "logic_externalized" in dom_signals:
+            swept[result["url"]] = result["traffic"]
 
-        out.append(
-            "Lógica externalizada → arquitectura separada entre presentación y recursos externos."
-        )
+            yield result["url"]
 
 
+    if sweep:
 
-    # =====================================================
-    # BACKEND SURFACE
-    # =====================================================
+        queue = live(
+            sweep_targets(targets, out=sweep_out,
+                          scanner=scanner, scope=scope)
+        )
 
-    if surface.get("unusual"):
+    else:
 
-        out.append(
-            "Métodos HTTP fuera del patrón común observados → "
-            "la interfaz expuesta merece revisión arquitectónica."
-        )
+        queue = iter(targets)
 
 
-    risk = surface.get("risk_profile")
+    queue = prefetch_dns(queue, scanner.dns)
 
 
-    if risk == "elevated":
+    pending = set()
 
-        out.append(
-            "Superficie backend con señales elevadas → "
-            "requiere correlación manual antes de sacar conclusiones."
-        )
+    #
+    # Targets diferidos por Retry-After: (not_before, seq, report).
+    # Esperan en el heap, no en un worker.
+    #
 
+    deferred = []
+    requeues = {}
+    exhausted = False
 
-    elif risk == "moderate":
+    cancel = threading.Event()
 
-        out.append(
-            "Superficie backend moderada → "
-            "existen componentes adicionales visibles desde fuera."
-        )
+    pool = ThreadPoolExecutor(max_workers=workers)
 
 
+    #
+    # URL final → primer target que la reclamó (y a la inversa),
+    # mientras ese target no se entrega. Entregado, su URL final
+    # pasa a `scanned` (memoria acotada) y el nombre del target
+    # a `owners` (LRU, solo para el report colapsado).
+    #
 
-    # =====================================================
-    # CORRELACIONES PROFUNDAS
-    # =====================================================
+    claimed = {}
+    finals = {}
+    claimed_lock = threading.Lock()
 
+    scanned = SeenSet()
+    owners = BoundedRegistry(ttl=None)
 
-    if (
-        http.get("hash_change")
-        and dom.get("js_network")
-        and timing.get("method_gap")
-    ):
 
-        out.append(
-            "Frontend dinámico + respuestas variables + diferencias temporales → "
-            "posible arquitectura con lógica condicional no visible."
-        )
+    def final_key(final):
 
+        return hashlib.blake2b(
+            final.encode(),
+            digest_size=16
+        ).digest()
 
-    if (
-        dom.get("hidden_sensitive")
-        and surface.get("methods")
-        and timing.get("method_gap")
-    ):
 
-        out.append(
-            "Estado interno + métodos expuestos + rutas diferenciadas → "
-            "modelo de aplicación con múltiples capas de decisión."
-        )
+    def unclaim(url, done=True):
 
+        with claimed_lock:
 
-    if (
-        http.get("etag")
-        and dom.get("js_network")
-    ):
+            final = finals.pop(url, None)
 
-        out.append(
-            "Cache inteligente junto a frontend activo → "
-            "posible optimización para usuarios dinámicos o contenido personalizado."
-        )
+            if final is None:
+                return
 
+            claimed.pop(final, None)
 
+            if done:
 
-    # =====================================================
-    # LECTURA FINAL
-    # =====================================================
+                scanned.add(final_key(final))
 
-    if len(out) >= 6:
+                owners[final] = url
 
-        out.append(
-            "Múltiples capas presentan actividad coherente → "
-            "la superficie observable representa una arquitectura compleja."
-        )
 
+    def scan_unique(url, resume):
 
-    if not out:
+        preflight = None
 
-        out.append(
-            "Superficie homogénea → comportamiento consistente, "
-            "sin señales fuertes de complejidad externa."
-        )
+        if resume is None:
 
+            meter = TrafficMeter()
 
-    return out
+            traffic = swept.pop(url, None)
 
+            if traffic:
+                meter.merge(traffic)
 
-# ------------------------ ORQUESTADOR ---------------------------------
-def scan(url):
-    """
-    Orquestador principal de observación web.
+            chain = safe(
+                lambda: scanner.resolve(url, cancel=cancel,
+                                        scope=scope, meter=meter)
+            )
 
-    Ejecuta una lectura multicapa:
+            preflight = meter.snapshot()
 
-        HTTP
-          ↓
-        DOM
-          ↓
-        Timing
-          ↓
-        Backend Surface
-          ↓
-        Correlación cognitiva
+            final = (
+                chain["final_url"]
+                if chain
+                else url
+            )
 
-    No explota.
-    No modifica estado.
-    Solo observa comportamiento externo.
+            with claimed_lock:
 
-    Diseñado para análisis SOC,
-    threat modeling y arquitectura inversa.
-    """
+                owner = claimed.setdefault(final, url)
 
-    session = build_session()
+                if owner == url and final_key(final) in scanned:
 
-    phases = {}
-    warnings = []
-    execution = {}
+                    del claimed[final]
 
-    start_scan = time.time()
+                    owner = owners.get(final, final)
 
+                elif owner == url:
 
-    # =====================================================
-    # HTTP SEMANTICS
-    # =====================================================
+                    finals[url] = final
 
-    t0 = time.time()
 
-    try:
+            if owner != url:
 
-        http, resp = http_semantics(
-            session,
-            url
-        )
+                return {
+                    "url": url,
+                    "signals": {},
+                    "priority": None,
+                    "insights": [],
+                    "meta": {
+                        "collapsed_into": owner,
+                        "redirects": chain,
+                        "traffic": {"preflight": preflight},
+                        "warnings": [f"collapsed: same final URL as {owner}"],
+                        "deferred": None,
+                        "partial": False
+                    }
+                }
 
-        execution["http"] = "completed"
 
-    except Exception as e:
+        return scan(url, full, deadline=deadline, resume=resume,
+                    cancel=cancel, scope=scope, scanner=scanner,
+                    preflight=preflight)
 
-        http, resp = {}, None
 
-        warnings.append(
-            f"http_semantics_error: {type(e).__name__}"
-        )
+    def submit(url, resume=None):
 
-        execution["http"] = "failed"
+        if journal and resume is None:
+            journal.started(url)
 
+        pending.add(
+            pool.submit(scan_unique, url, resume)
+        )
 
-    phases["http"] = round(
-        time.time() - t0,
-        3
-    )
 
+    def finish(future, requeue=True):
+        """
+        Report listo para entregar, o None si vuelve a la cola
+        (o queda interrumpido durante el drenado).
+        """
 
+        report = future.result()
 
-    # =====================================================
-    # DOM DEEP ANALYSIS
-    # =====================================================
+        info = report["meta"].get("deferred")
 
-    t0 = time.time()
+        url = report["url"]
 
-    try:
+        if info:
 
-        dom = dom_deep(
-            resp.text if resp else ""
-        )
+            if not requeue:
 
-        execution["dom"] = "completed"
+                unclaim(url, done=False)
 
+                return None
 
-    except Exception as e:
+            if requeues.get(url, 0) < MAX_REQUEUES:
 
-        dom = {}
+                requeues[url] = requeues.get(url, 0) + 1
 
-        warnings.append(
-            f"dom_error: {type(e).__name__}"
-        )
+                heapq.heappush(
+                    deferred,
+                    (info["not_before"], id(report), report)
+                )
 
-        execution["dom"] = "failed"
+                return None
 
 
-    phases["dom"] = round(
-        time.time() - t0,
-        3
-    )
+        unclaim(url)
 
+        requeues.pop(url, None)
 
+        if journal:
+            journal.completed(report)
 
-    # =====================================================
-    # TEMPORAL DIFFERENCE
-    # =====================================================
+        return report
 
-    t0 = time.time()
 
     try:
 
-        timing = timing_diff(
-            session,
-            url
-        )
+        while not (stop is not None and stop.is_set()):
 
-        execution["timing"] = "completed"
+            while deferred and deferred[0][0] <= time.time():
 
+                _, _, report = heapq.heappop(deferred)
 
-    except Exception as e:
+                submit(report["url"], resume=report)
 
-        timing = {}
 
-        warnings.append(
-            f"timing_error: {type(e).__name__}"
-        )
+            while not exhausted and len(pending) < workers * 2:
 
-        execution["timing"] = "failed"
+                target = next(queue, None)
 
+                if target is None:
+                    exhausted = True
+                    break
 
-    phases["timing"] = round(
-        time.time() - t0,
-        3
-    )
+                submit(target)
 
 
+            if not pending:
 
-    # =====================================================
-    # BACKEND SURFACE
-    # =====================================================
+                if not deferred:
+                    break
 
-    t0 = time.time()
+                time.sleep(
+                    min(
+                        STOP_POLL,
+                        max(0.0, deferred[0][0] - time.time())
+                    )
+                )
 
-    try:
+                continue
 
-        surface = backend_surface(
-            session,
-            url
-        )
 
-        execution["surface"] = "completed"
+            timeout = (
+                max(0.0, deferred[0][0] - time.time())
+                if deferred
+                else None
+            )
 
+            if stop is not None:
+                timeout = min(timeout or STOP_POLL, STOP_POLL)
 
-    except Exception as e:
 
-        surface = {}
+            done, pending = wait(
+                pending,
+                timeout=timeout,
+                return_when=FIRST_COMPLETED
+            )
 
-        warnings.append(
-            f"surface_error: {type(e).__name__}"
-        )
+            for future in done:
 
-        execution["surface"] = "failed"
+                report = finish(future)
 
+                if report:
+                    yield report
 
-    phases["surface"] = round(
-        time.time() - t0,
-        3
-    )
 
+        # =====================================================
+        # DRENADO (stop)
+        # =====================================================
 
+        if pending:
 
-    # =====================================================
-    # SIGNAL PACKAGE
-    # =====================================================
+            done, pending = wait(
+                pending,
+                timeout=grace
+            )
 
-    sig = {
+            for future in done:
 
-        "http": http,
+                report = finish(future, requeue=False)
 
-        "dom": dom,
+                if report:
+                    yield report
 
-        "timing": timing,
 
-        "surface": surface
-    }
+    finally:
 
+        #
+        # Lo que no terminó se cancela de forma cooperativa;
+        # en el journal queda como interrumpido.
+        #
 
+        cancel.set()
 
-    # =====================================================
-    # COGNITIVE LAYER
-    # =====================================================
+        pool.shutdown(
+            wait=False,
+            cancel_futures=True
+        )
 
-    try:
 
-        priority = score(sig)
+# ------------------------ PLANIFICADOR ---------------------------------
+def plan_requests(targets, full=True, sweep=True, workers=BATCH_WORKERS, scanner=None):
+    """
+    Dry-run: estima peticiones y duración de un lote
+    con los ajustes efectivos de `scanner` (por defecto,
+    default_scanner()), sin tocar la red.
+
+    - `expected`: cada petición una vez (sin reintentos)
+    - `worst`: todas las peticiones reintentables agotan `retries`
+    - `minimum`: el gating salta timing y superficie en todos los targets
+
+    Por target cuenta todas las capas que el scan ejecutará:
+    HEAD del sweep, GET de la cadena de redirecciones (un salto),
+    HTTP, timing, superficie y, si están activas, backend_timing
+    (`expected`: dos direcciones; `worst`: BACKEND_MAX_ADDRESSES)
+    y la curva de carga (los niveles que caben en
+    `load_request_budget`, sin reintentos). Por host, la línea
+    base (sonda de conexión + `baseline_samples`).
+
+    La duración esperada usa PLAN_LATENCY por petición;
+    la peor, `timeout` por intento más el backoff.
+    """
 
-    except Exception as e:
+    settings = (scanner or default_scanner()).settings
 
-        priority = 0
+    retries = settings["retries"]
 
-        warnings.append(
-            f"score_error: {type(e).__name__}"
-        )
+    http_requests = 3 + 1                      # 3 GET + HEAD
+    redirect_requests = 1                      # GET sin seguir redirecciones
+    surface_requests = 4                       # OPTIONS, HEAD, GET, POST
+    path_timing = settings["path_timing_samples"] * 3      # con base de host
+    baseline_requests = 1 + settings["baseline_samples"]
+    sweep_requests = 1 if sweep else 0
 
+    load = settings["load_curve"]
 
-    try:
+    #
+    # Niveles completos que caben en el tope (como load_curve()).
+    #
 
-        generated_insights = insights(sig)
+    load_requests = 0
 
-    except Exception as e:
+    for level in sorted(settings["load_levels"]) if load else ():
 
-        generated_insights = []
+        burst = level * settings["load_bursts"]
 
-        warnings.append(
-            f"insights_error: {type(e).__name__}"
-        )
+        if load_requests + burst > settings["load_request_budget"]:
+            break
 
+        load_requests += burst
 
+    backend = settings["backend_timing"]
 
-    # =====================================================
-    # FINAL OBSERVATION
-    # =====================================================
+    backend_per_address = 1 + settings["backend_samples"]  # warm-up + muestras
 
-    return {
+    backoff = sum(
+        settings["retry_backoff"] * (2 ** i)
+        for i in range(retries)
+    )
 
-        "url": url,
+    count = 0
+    hosts = set()
 
+    for target in targets:
 
-        "signals": sig,
+        count += 1
 
+        hosts.add(host_key(target))
 
-        "priority": priority,
 
+    always = (
+        sweep_requests + redirect_requests + http_requests + load_requests
+    )
 
-        "insights": generated_insights,
+    per_target = (
+        always + path_timing + surface_requests
+        + (2 * backend_per_address if backend else 0)
+    )
 
+    expected = count * per_target + len(hosts) * baseline_requests
 
-        "meta": {
+    minimum = count * always
 
-            "phases_sec": phases,
+    worst = (
+        expected
+        + (
+            count * (BACKEND_MAX_ADDRESSES - 2) * backend_per_address
+            if backend
+            else 0
+        )
+    )
 
+    #
+    # Sin reintento: el POST de superficie y las ráfagas de carga.
+    #
 
-            "warnings": warnings,
+    retryable = worst - count * (1 + load_requests)
 
+    worst += retryable * retries
 
-            "execution": execution,
+    workers = max(1, workers)
 
 
-            "runtime_sec": round(
-                time.time() - start_scan,
-                3
-            ),
+    return {
 
+        "targets": count,
 
-            "analysis": {
+        "hosts": len(hosts),
 
-                "layers": [
-                    "http",
-                    "dom",
-                    "timing",
-                    "backend"
-                ],
+        "requests": {
+            "minimum": minimum if not full else expected,
+            "expected": expected,
+            "worst": worst
+        },
 
-                "mode":
-                    "passive_behavioral_observation",
+        "duration_sec": {
+            "expected": round(expected * PLAN_LATENCY / workers, 1),
+            "worst": round(
+                (worst * settings["timeout"] + retryable * backoff) / workers,
+                1
+            )
+        },
 
-                "correlation_ready":
-                    True
-            }
+        "settings": {
+            "TIMING_SAMPLES": settings["timing_samples"],
+            "PATH_TIMING_SAMPLES": settings["path_timing_samples"],
+            "BASELINE_SAMPLES": settings["baseline_samples"],
+            "BACKEND_SAMPLES": settings["backend_samples"],
+            "LOAD_REQUEST_BUDGET": settings["load_request_budget"],
+            "RETRIES": retries,
+            "TIMEOUT": settings["timeout"],
+            "workers": workers,
+            "full": full,
+            "sweep": sweep,
+            "backend": backend,
+            "load": load
         }
     }
 
@@ -2854,11 +9781,16 @@ def render(report):
     )
 
 
-    if priority >= 10:
+    band = priority_band(
+        priority
+    )
+
+
+    if band == "high":
 
         style = "bright_red"
 
-    elif priority >= 6:
+    elif band == "medium":
 
         style = "bright_yellow"
 
@@ -2975,7 +9907,321 @@ def graceful_exit(signum, frame):
                   style="bold bright_red")
     sys.exit(130)
 
-signal.signal(signal.SIGINT, graceful_exit)
+
+def build_parser():
+
+    parser = argparse.ArgumentParser(
+        prog="OsintSignals.py",
+        description="OsintSignalsF — modo interactivo o lote con checkpoint"
+    )
+
+    parser.add_argument("--targets", default=None,
+                        help="fichero con un target por línea, '-' para stdin, "
+                             "gzip admitido (activa el modo lote)")
+    parser.add_argument("--headless", action="store_true",
+                        help="sin banner ni rich: NDJSON por stdout, resumen por stderr")
+    parser.add_argument("--scope-file", default=None,
+                        help="allowlist de scope (dominios, *.wildcards, CIDR, prefijos URL)")
+    parser.add_argument("--authorized", action="store_true",
+                        help="modo lote sin --scope-file: declaro autorización "
+                             "sobre todos los targets de la lista")
+    parser.add_argument("--journal", default="osintsignals.journal.ndjson",
+                        help="journal NDJSON de checkpoint")
+    checkpoint = parser.add_mutually_exclusive_group()
+    checkpoint.add_argument("--resume", action="store_true",
+                            help="saltar completados y re-encolar interrumpidos")
+    checkpoint.add_argument("--fresh", action="store_true",
+                            help="empezar de cero aunque el journal ya tenga checkpoints")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--grace", type=float, default=DRAIN_GRACE,
+                        help="segundos de drenado tras SIGINT")
+    parser.add_argument("--no-sweep", action="store_true",
+                        help="no ejecutar el pre-sweep de vida")
+    parser.add_argument("--full", action="store_true",
+                        help="escaneo completo (sin gating)")
+    parser.add_argument("--scope", default=None,
+                        help="nombre del scope para la cuota (por defecto, el host)")
+    parser.add_argument("--budget", type=int, default=None,
+                        help="tope duro de peticiones por scope")
+    parser.add_argument("--transport", choices=("h1", "h2"), default=None,
+                        help="h2: HTTP/2 vía httpx[http2] (ALPN, vuelve a h1 si no hay soporte)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="timeout por petición (segundos)")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="presupuesto total por scan (segundos)")
+    parser.add_argument("--per-backend", action="store_true",
+                        help="timing por dirección A/AAAA del host (pool de balanceo)")
+    parser.add_argument("--load-curve", action="store_true",
+                        help="fase opt-in de ráfagas 1/2/4/8 (tope LOAD_REQUEST_BUDGET)")
+    parser.add_argument("--plan", action="store_true",
+                        help="dry-run: estimar peticiones y duración y salir")
+
+    return parser
+
+
+def open_targets(path):
+    """
+    Líneas de un fichero de targets o de stdin ('-'), en streaming.
+
+    El gzip se detecta por la firma, no por la extensión:
+    `zcat lista.gz | ...` y `--targets lista.gz` funcionan igual.
+    """
+
+    raw = (
+        sys.stdin.buffer
+        if path == "-"
+        else open(path, "rb")
+    )
+
+    try:
+
+        if raw.peek(2)[:2] == b"\x1f\x8b":
+            raw = gzip.GzipFile(fileobj=raw)
+
+        yield from io.TextIOWrapper(
+            raw,
+            encoding="utf-8",
+            errors="replace"
+        )
+
+    finally:
+
+        if path != "-":
+            raw.close()
+
+
+def batch_cli(args):
+    """
+    Modo lote con journal de checkpoint.
+
+    SIGINT no corta en seco: deja de entregar trabajo, drena
+    los scans en curso durante el periodo de gracia y cierra
+    el journal antes de salir. Un segundo SIGINT sale de inmediato.
+
+    Con --headless no hay rich: cada report sale como una línea
+    NDJSON por stdout (orden de finalización) y los avisos y el
+    resumen final van por stderr.
+    """
+
+    stop = threading.Event()
+
+    def notify(message, style=None):
+
+        if args.headless:
+            print(message, file=sys.stderr, flush=True)
+
+        else:
+            console.print(message, style=style)
+
+
+    def drain(signum, frame):
+
+        if stop.is_set():
+            raise KeyboardInterrupt
+
+        notify(
+            f"\n🛑 Interrupción detectada. Drenando scans en curso ({args.grace:.0f}s)…",
+            style="bold bright_red"
+        )
+
+        stop.set()
+
+    signal.signal(signal.SIGINT, drain)
+
+
+    summary = {
+        "scanned": 0,
+        "rejected_lines": 0,
+        "duplicates": 0,
+        "collapsed": 0,
+        "partial": 0,
+        "deferred": 0,
+        "by_priority": {}
+    }
+
+    def reject(lineno, line, reason):
+
+        if reason == "duplicate":
+
+            summary["duplicates"] += 1
+
+            return
+
+        summary["rejected_lines"] += 1
+
+        notify(f"❌ {lineno}: {line}: {reason}", style="bright_red")
+
+
+    def targets():
+
+        return ingest_targets(
+            open_targets(args.targets),
+            reject=reject
+        )
+
+
+    overrides = {}
+
+    if args.timeout:
+        overrides["timeout"] = args.timeout
+
+    if args.budget:
+        overrides["scope_request_budget"] = args.budget
+
+    if args.transport:
+        overrides["transport"] = args.transport
+
+    if args.load_curve:
+        overrides["load_curve"] = True
+
+    if args.per_backend:
+        overrides["backend_timing"] = True
+
+    if args.scope_file:
+        overrides["allowlist"] = ScopeAllowlist.from_file(args.scope_file)
+
+    scanner = Scanner(**overrides)
+
+
+    if args.plan:
+
+        plan = plan_requests(
+            in_scope(targets(), scanner),
+            full=args.full,
+            sweep=not args.no_sweep,
+            workers=args.workers,
+            scanner=scanner
+        )
+
+        if args.headless:
+            print(json.dumps(plan))
+
+        else:
+            console.print_json(data=plan)
+
+        return 0
+
+
+    try:
+
+        journal = ScanJournal(
+            args.journal,
+            resume=args.resume,
+            overwrite=args.fresh
+        )
+
+    except FileExistsError as e:
+
+        notify(f"❌ {e}", style="bold bright_red")
+
+        scanner.close()
+
+        return 2
+
+    if args.resume:
+
+        notify(
+            f"↻ Reanudando: {len(journal.done)} completados, "
+            f"{len(journal.interrupted)} interrumpidos",
+            style="bright_cyan"
+        )
+
+
+    start = time.time()
+
+    try:
+
+        for report in batch_scan(
+            targets(),
+            workers=args.workers,
+            sweep=not args.no_sweep,
+            full=args.full,
+            journal=journal,
+            stop=stop,
+            grace=args.grace,
+            scope=args.scope,
+            deadline=args.deadline,
+            scanner=scanner
+        ):
+
+            meta = report["meta"]
+
+            if meta.get("collapsed_into"):
+
+                summary["collapsed"] += 1
+
+            else:
+
+                summary["scanned"] += 1
+                summary["partial"] += bool(meta.get("partial"))
+                summary["deferred"] += bool(meta.get("deferred"))
+
+                band = str(report["priority"])
+
+                summary["by_priority"][band] = (
+                    summary["by_priority"].get(band, 0) + 1
+                )
+
+
+            if not args.headless:
+
+                if meta.get("collapsed_into"):
+
+                    console.print(
+                        f"↪ {report['url']}  → {meta['collapsed_into']}",
+                        style="bright_black"
+                    )
+
+                else:
+
+                    console.print(
+                        f"✔ {report['url']}  priority={report['priority']}",
+                        style="bright_green"
+                    )
+
+                continue
+
+
+            try:
+
+                sys.stdout.write(
+                    json.dumps(report, default=str) + "\n"
+                )
+
+                sys.stdout.flush()
+
+            except BrokenPipeError:
+
+                #
+                # El consumidor cerró la tubería (p. ej. `| head`):
+                # no hay a quién entregar más resultados.
+                #
+
+                stop.set()
+
+                break
+
+    finally:
+
+        journal.close()
+
+        scanner.close()
+
+
+    if args.headless:
+
+        summary["interrupted"] = stop.is_set()
+
+        summary["runtime_sec"] = round(
+            time.time() - start,
+            3
+        )
+
+        print(json.dumps(summary), file=sys.stderr)
+
+
+    return 130 if stop.is_set() else 0
+
 
 def neon_banner():
     """
@@ -3172,6 +10418,41 @@ def validate_url(url: str) -> str:
 
 
 if __name__ == "__main__":
+    args = build_parser().parse_args()
+
+    #
+    # El modo lote no pregunta target a target: sin allowlist
+    # exige la confirmación ética de forma explícita.
+    # --plan no emite tráfico.
+    #
+
+    if args.targets and not (args.scope_file or args.authorized or args.plan):
+        build_parser().error(
+            "el modo lote requiere --scope-file o --authorized "
+            "(autorización expresa sobre todos los targets)"
+        )
+
+    if args.targets:
+        sys.exit(batch_cli(args))
+
+    if args.headless:
+        build_parser().error("--headless requiere --targets (fichero o '-')")
+
+    #
+    # La allowlist de --scope-file viaja en los settings
+    # del Scanner, como el resto de ajustes de la CLI.
+    #
+
+    if args.scope_file:
+        scanner = Scanner(allowlist=ScopeAllowlist.from_file(args.scope_file))
+
+    else:
+        scanner = default_scanner()
+
+    allowlist = scanner.settings["allowlist"]
+
+    signal.signal(signal.SIGINT, graceful_exit)
+
     neon_banner()
 
     while True:
@@ -3200,7 +10481,18 @@ if __name__ == "__main__":
         # ------------------------------------------------------------
         # CONFIRMACIÓN ÉTICA
         # ------------------------------------------------------------
-        if not Confirm.ask(
+        if allowlist is not None:
+            if not allowlist.allows(target):
+                console.print(
+                    Panel(
+                        f"🚫 {target}\nFuera de la allowlist de scope.",
+                        title="SCOPE",
+                        border_style="bright_red"
+                    )
+                )
+                continue
+
+        elif not Confirm.ask(
             "[bright_yellow]¿Confirmas que este target está dentro de tu scope autorizado?",
             default=False
         ):
@@ -3238,11 +10530,60 @@ if __name__ == "__main__":
                     "Escaneando superficie cognitiva…", total=100
                 )
 
-                for step in (15, 35, 55):
-                    time.sleep(0.15)
-                    progress.update(task, advance=step)
+                #
+                # Progreso real: cada capa completada avanza la barra
+                # y muestra el score provisional.
+                #
+
+                for event in scanner.scan_iter(target):
+
+                    if event["type"] == "layer_started":
+                        progress.update(
+                            task,
+                            description=f"Capa {event['layer']}…"
+                        )
+
+                    elif event["type"] == "layer_completed":
+                        progress.update(task, advance=22)
+
+                        if event["state"] != "skipped":
+                            progress.console.print(
+                                f"  ✔ {event['layer']:<8} {event['state']}",
+                                style="bright_cyan"
+                            )
+
+                    elif event["type"] == "provisional_score":
+                        progress.console.print(
+                            f"    score provisional: {event['priority']}",
+                            style="dim"
+                        )
+
+                    elif event["type"] == "report":
+                        rep = event["report"]
+
+                #
+                # Retry-After: en modo interactivo esperamos
+                # y reanudamos desde las capas completadas.
+                #
+
+                for _ in range(MAX_REQUEUES):
+
+                    deferred = rep["meta"].get("deferred")
+
+                    if not deferred:
+                        break
+
+                    progress.update(
+                        task,
+                        description=f"Retry-After {deferred['retry_after']}s…"
+                    )
+
+                    time.sleep(
+                        max(0.0, deferred["not_before"] - time.time())
+                    )
+
+                    rep = scanner.scan(target, resume=rep)
 
-                rep = scan(target)
                 progress.update(task, completed=100)
 
         except KeyboardInterrupt:
@@ -0,0 +1,244 @@
+"""
+HTTP2Adapter contra un servidor h2 local (hypercorn + TLS autofirmado)
+y su vuelta a HTTP/1.1 (servidor sin h2 en ALPN, httpx ausente).
+
+Requiere httpx[http2], hypercorn y openssl; sin ellos, los tests se saltan.
+"""
+
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("h2")
+pytest.importorskip("hypercorn")
+
+from hypercorn.asyncio import serve
+from hypercorn.config import Config
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import OsintSignals as O
+
+
+# ----------------------------- STAND-IN H2 ---------------------------------
+SEEN = []
+
+
+async def app(scope, receive, send):
+    """
+    Responde con el protocolo negociado y anota cada petición
+    (método, versión HTTP, cabeceras).
+    """
+
+    if scope["type"] != "http":
+        return
+
+    SEEN.append((
+        scope["method"],
+        scope["http_version"],
+        {k.decode().lower(): v.decode() for k, v in scope["headers"]}
+    ))
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/plain"),
+            (b"x-proto", scope["http_version"].encode())
+        ]
+    })
+
+    await send({
+        "type": "http.response.body",
+        "body": b"" if scope["method"] == "HEAD" else b"ok"
+    })
+
+
+@pytest.fixture(scope="module")
+def certs(tmp_path_factory):
+
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl not available")
+
+
+    folder = tmp_path_factory.mktemp("h2")
+
+    cert = str(folder / "cert.pem")
+    key = str(folder / "key.pem")
+
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key, "-out", cert, "-days", "1",
+            "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=DNS:localhost"
+        ],
+        check=True,
+        capture_output=True
+    )
+
+    return cert, key
+
+
+def serve_tls(cert, key, alpn):
+    """
+    Servidor hypercorn en un hilo; devuelve su puerto.
+    """
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.certfile = cert
+    config.keyfile = key
+    config.alpn_protocols = alpn
+    config.loglevel = "ERROR"
+
+    threading.Thread(
+        target=lambda: asyncio.run(serve(
+            app,
+            config,
+            shutdown_trigger=lambda: asyncio.get_running_loop().create_future()
+        )),
+        daemon=True
+    ).start()
+
+
+    for _ in range(50):
+
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            break
+
+        except OSError:
+            time.sleep(0.1)
+
+
+    return port
+
+
+@pytest.fixture(scope="module")
+def h2_server(certs):
+
+    port = serve_tls(*certs, ["h2", "http/1.1"])
+
+    return f"https://localhost:{port}/", certs[0]
+
+
+@pytest.fixture(scope="module")
+def h1_server(certs):
+
+    port = serve_tls(*certs, ["http/1.1"])
+
+    return f"https://localhost:{port}/", certs[0]
+
+
+@pytest.fixture
+def session(h2_server):
+
+    adapter = O.HTTP2Adapter()
+
+    session = requests.Session()
+    session.trust_env = False
+    session.verify = h2_server[1]
+    session.mount("https://", adapter)
+
+    SEEN.clear()
+
+    yield session
+
+    adapter.close()
+
+
+# ----------------------------- TESTS ---------------------------------
+def test_negotiates_h2(session, h2_server):
+
+    response = session.get(h2_server[0], timeout=5)
+
+    assert response.status_code == 200
+    assert response.text == "ok"
+    assert response.raw.protocol == "HTTP/2"
+    assert response.headers["x-proto"] == "2"
+
+
+def test_streamed_body_reads_after_headers(session, h2_server):
+
+    response = session.get(h2_server[0], timeout=5, stream=True)
+
+    assert response.content == b"ok"
+    assert response.raw.tell() == 2
+
+
+def test_bodiless_options_does_not_forward_content_length(session, h2_server):
+
+    #
+    # requests añade Content-Length: 0 a OPTIONS sin cuerpo;
+    # reenviado a h2 rompía la conexión y el HEAD siguiente fallaba.
+    #
+
+    for method in ("OPTIONS", "HEAD", "OPTIONS", "GET"):
+
+        response = session.request(method, h2_server[0], timeout=5)
+
+        assert response.status_code == 200
+
+
+    options = [headers for method, _, headers in SEEN if method == "OPTIONS"]
+
+    assert options
+    assert all("content-length" not in headers for headers in options)
+    assert len(SEEN) == 4
+
+
+def test_body_keeps_content_length(session, h2_server):
+
+    session.post(h2_server[0], data=b"abc", timeout=5)
+
+    assert SEEN[-1][2].get("content-length") == "3"
+
+
+def test_falls_back_to_http11_without_h2_alpn(session, h1_server):
+
+    response = session.get(h1_server[0], timeout=5)
+
+    assert response.status_code == 200
+    assert response.raw.protocol == "HTTP/1.1"
+    assert response.headers["x-proto"] == "1.1"
+
+
+def test_scanner_falls_back_to_h1_without_httpx(monkeypatch, h1_server):
+
+    monkeypatch.setattr(O, "httpx", None)
+
+    scanner = O.Scanner(transport="h2")
+
+    session = scanner.acquire()
+
+    session.trust_env = False
+
+    try:
+
+        response = session.get(h1_server[0], timeout=5, verify=h1_server[1])
+
+        assert scanner.transport == "h1"
+        assert isinstance(scanner.adapter, O.DNSCacheAdapter)
+        assert response.protocol == "HTTP/1.1"
+
+    finally:
+
+        scanner.release(session)
+
+        scanner.close()